@@ -0,0 +1,78 @@
+"""Add assignment results and scoring version
+
+Revision ID: 8d2e4b6f1a90
+Revises: 5c1f2e9a7b3d
+Create Date: 2026-10-17 14:00:12.508731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "8d2e4b6f1a90"
+down_revision = "5c1f2e9a7b3d"
+branch_labels = None
+depends_on = None
+
+# Tables whose changes alter the analytics of the assignments
+SCORING_TABLES = [
+    "output",
+    "module_output_link",
+    "question_output_link",
+    "option_answer",
+    "questionnaire_module_link",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scoring_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO scoring_version (id, version) VALUES (1, 0)")
+    op.create_table(
+        "assignment_result",
+        sa.Column("id_assignment", sa.Integer(), nullable=False),
+        sa.Column("id_module", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("punctuation", sa.Integer(), nullable=False),
+        sa.Column("diagnostic", sa.JSON(), nullable=True),
+        sa.Column("observations", sa.JSON(), nullable=True),
+        sa.Column("scoring_version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["id_assignment"], ["assignment.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["id_module"], ["module.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id_assignment", "id_module"),
+    )
+    op.execute(
+        """
+        CREATE FUNCTION bump_scoring_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE scoring_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in SCORING_TABLES:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_bump_scoring_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_scoring_version()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in SCORING_TABLES:
+        op.execute(f"DROP TRIGGER {table}_bump_scoring_version ON {table}")
+    op.execute("DROP FUNCTION bump_scoring_version()")
+    op.drop_table("assignment_result")
+    op.drop_table("scoring_version")
@@ -0,0 +1,34 @@
+"""Bump the scoring version on structure changes
+
+Revision ID: a3c7e1d9b2f4
+Revises: 8d2e4b6f1a90
+Create Date: 2026-10-17 15:00:41.902117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a3c7e1d9b2f4"
+down_revision = "8d2e4b6f1a90"
+branch_labels = None
+depends_on = None
+
+# Tables of the questionnaire structure cached by the workers
+STRUCTURE_TABLES = ["questionnaire", "module", "question"]
+
+
+def upgrade() -> None:
+    for table in STRUCTURE_TABLES:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_bump_scoring_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_scoring_version()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in STRUCTURE_TABLES:
+        op.execute(f"DROP TRIGGER {table}_bump_scoring_version ON {table}")
@@ -0,0 +1,91 @@
+"""Add question type
+
+Revision ID: c5e8f2a4d7b1
+Revises: a3c7e1d9b2f4
+Create Date: 2026-10-17 16:00:27.318044
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c5e8f2a4d7b1"
+down_revision = "a3c7e1d9b2f4"
+branch_labels = None
+depends_on = None
+
+# Type of a question from its number of options
+QUESTION_TYPE = """
+    CASE WHEN count(*) = 2 THEN 'YesNo' WHEN count(*) > 2 THEN 'multiple'
+    ELSE 'text' END
+"""
+
+
+def upgrade() -> None:
+    op.add_column(
+        "question",
+        sa.Column("type_opt", sa.String(), nullable=False, server_default="text"),
+    )
+    op.execute(
+        f"""
+        UPDATE question SET type_opt = counted.type_opt
+        FROM (
+            SELECT id_question_question_id, id_question_module_id,
+                {QUESTION_TYPE} AS type_opt
+            FROM option_answer
+            GROUP BY id_question_question_id, id_question_module_id
+        ) AS counted
+        WHERE question.id = counted.id_question_question_id
+            AND question.id_module = counted.id_question_module_id
+        """
+    )
+    op.execute(
+        f"""
+        CREATE FUNCTION refresh_question_type(question_id int, module_id int)
+        RETURNS void AS $$
+            UPDATE question SET type_opt = (
+                SELECT {QUESTION_TYPE}
+                FROM option_answer
+                WHERE id_question_question_id = question_id
+                    AND id_question_module_id = module_id
+            )
+            WHERE id = question_id AND id_module = module_id
+        $$ LANGUAGE sql
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION option_answer_question_type() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM refresh_question_type(
+                    OLD.id_question_question_id, OLD.id_question_module_id
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM refresh_question_type(
+                    NEW.id_question_question_id, NEW.id_question_module_id
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER option_answer_question_type
+        AFTER INSERT OR DELETE
+            OR UPDATE OF id_question_question_id, id_question_module_id
+        ON option_answer
+        FOR EACH ROW EXECUTE FUNCTION option_answer_question_type()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER option_answer_question_type ON option_answer")
+    op.execute("DROP FUNCTION option_answer_question_type()")
+    op.execute("DROP FUNCTION refresh_question_type(int, int)")
+    op.drop_column("question", "type_opt")
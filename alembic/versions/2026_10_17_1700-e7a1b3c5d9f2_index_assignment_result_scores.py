@@ -0,0 +1,29 @@
+"""Index the module scores of the assignment results
+
+Revision ID: e7a1b3c5d9f2
+Revises: c5e8f2a4d7b1
+Create Date: 2026-10-17 17:00:08.671245
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e7a1b3c5d9f2"
+down_revision = "c5e8f2a4d7b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_assignment_result_module_punctuation",
+        "assignment_result",
+        ["id_module", "punctuation"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_assignment_result_module_punctuation", table_name="assignment_result"
+    )
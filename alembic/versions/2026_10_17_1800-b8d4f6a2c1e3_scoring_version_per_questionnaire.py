@@ -0,0 +1,164 @@
+"""Version the scoring rules per questionnaire
+
+Revision ID: b8d4f6a2c1e3
+Revises: e7a1b3c5d9f2
+Create Date: 2026-10-17 18:00:27.315902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b8d4f6a2c1e3"
+down_revision = "e7a1b3c5d9f2"
+branch_labels = None
+depends_on = None
+
+# Tables whose statement triggers bump the global version, now the version of
+# the structure cache only
+VERSIONED_TABLES = [
+    "output",
+    "module_output_link",
+    "question_output_link",
+    "option_answer",
+    "questionnaire_module_link",
+    "questionnaire",
+    "module",
+    "question",
+]
+
+# Questionnaires of the modules selected by a query
+_OF_MODULES = (
+    "SELECT id_questionnaire FROM questionnaire_module_link WHERE id_module IN ({})"
+)
+
+# Row triggers bumping the scoring version of the questionnaires a change
+# affects: the columns of an update that change the stored results, and the
+# questionnaires of a row, {row} being OLD or NEW
+SCORING_TRIGGERS = {
+    "option_answer": (
+        "score, id_question_module_id, id_question_question_id",
+        _OF_MODULES.format("{row}.id_question_module_id"),
+    ),
+    "output": (
+        "text, condition_type, condition_value",
+        _OF_MODULES.format(
+            "SELECT id_module FROM module_output_link WHERE id_output = {row}.id"
+            " UNION SELECT id_question_module_id FROM question_output_link"
+            " WHERE id_output = {row}.id"
+        ),
+    ),
+    "module_output_link": (None, _OF_MODULES.format("{row}.id_module")),
+    "question_output_link": (None, _OF_MODULES.format("{row}.id_question_module_id")),
+    # The title of the module is stored with its results
+    "module": ("title", _OF_MODULES.format("{row}.id")),
+    "questionnaire_module_link": (None, "SELECT {row}.id_questionnaire"),
+}
+
+
+def upgrade() -> None:
+    op.rename_table("scoring_version", "structure_version")
+    op.execute("ALTER FUNCTION bump_scoring_version() RENAME TO bump_structure_version")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_structure_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE structure_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in VERSIONED_TABLES:
+        op.execute(
+            f"ALTER TRIGGER {table}_bump_scoring_version ON {table}"
+            f" RENAME TO {table}_bump_structure_version"
+        )
+
+    op.create_table(
+        "scoring_version",
+        sa.Column("id_questionnaire", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id_questionnaire"),
+    )
+    # The stored results were computed at the global version, they stay current
+    op.execute(
+        """
+        INSERT INTO scoring_version (id_questionnaire, version)
+        SELECT questionnaire.id, structure_version.version
+        FROM questionnaire, structure_version
+        WHERE structure_version.id = 1
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION bump_scoring_versions(questionnaires integer[])
+        RETURNS void AS $$
+            INSERT INTO scoring_version (id_questionnaire, version)
+            SELECT DISTINCT id, 1 FROM unnest(questionnaires) AS id
+            WHERE id IS NOT NULL
+            ON CONFLICT (id_questionnaire)
+            DO UPDATE SET version = scoring_version.version + 1
+        $$ LANGUAGE sql
+        """
+    )
+    for table, (columns, questionnaires) in SCORING_TRIGGERS.items():
+        op.execute(
+            f"""
+            CREATE FUNCTION {table}_bump_scoring_version() RETURNS trigger AS $$
+            DECLARE
+                questionnaires integer[] := '{{}}';
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    questionnaires := ARRAY({questionnaires.format(row="OLD")});
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    questionnaires := questionnaires
+                        || ARRAY({questionnaires.format(row="NEW")});
+                END IF;
+                PERFORM bump_scoring_versions(questionnaires);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        if table == "module":
+            events = f"UPDATE OF {columns}"
+        elif columns:
+            events = f"INSERT OR DELETE OR UPDATE OF {columns}"
+        else:
+            events = "INSERT OR DELETE OR UPDATE"
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_bump_scoring_version
+            AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_bump_scoring_version()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in SCORING_TRIGGERS:
+        op.execute(f"DROP TRIGGER {table}_bump_scoring_version ON {table}")
+        op.execute(f"DROP FUNCTION {table}_bump_scoring_version()")
+    op.execute("DROP FUNCTION bump_scoring_versions(integer[])")
+    op.drop_table("scoring_version")
+
+    for table in VERSIONED_TABLES:
+        op.execute(
+            f"ALTER TRIGGER {table}_bump_structure_version ON {table}"
+            f" RENAME TO {table}_bump_scoring_version"
+        )
+    op.execute("ALTER FUNCTION bump_structure_version() RENAME TO bump_scoring_version")
+    op.rename_table("structure_version", "scoring_version")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_scoring_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE scoring_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
@@ -0,0 +1,89 @@
+"""
+Benchmark of the assignment analytics against the per-module implementation
+
+Creates a questionnaire with many modules and questions, with outputs on the
+modules and the questions, answers it and scores the assignment with the
+set-based ``ScoringManager`` and with the previous implementation that ran
+queries per module and per question. It checks both give the same response and
+reports the time and the number of queries of each one.
+
+By default it runs on an in-memory SQLite database. A PostgreSQL URL shows the
+round trips of a real server, it must point to an empty scratch database
+because the tables are created there.
+
+Example
+-------
+    python -m benchmarks.analytics --modules 12 --questions 10 --repeat 20
+    python -m benchmarks.analytics --database-url postgresql://u:p@localhost/bench
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine
+
+from benchmarks.dataset import TABLES, per_module_analytics, seed
+from src.classes.scoring_manager import ScoringManager
+from src.models import Assignment, StructureVersion
+
+
+def measure(engine, id_assignment: int, function, repeat: int) -> tuple:
+    """
+    Run an analytics function in a new session ``repeat`` times
+
+    Returns
+    -------
+    tuple
+        Last result, mean milliseconds and queries of one run
+    """
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    elapsed = 0.0
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            with Session(engine) as session:
+                start = time.perf_counter()
+                assignment = session.get(Assignment, id_assignment)
+                result = function(assignment, session=session)
+                elapsed += time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, elapsed / repeat * 1000, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--modules", type=int, default=12)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    SQLModel.metadata.create_all(
+        engine, tables=[table.__table__ for table in TABLES + [StructureVersion]]
+    )
+    with Session(engine) as session:
+        id_assignment = seed(session, args.modules, args.questions)
+
+    print(f"{args.modules} modules, {args.modules * args.questions} questions")
+    print(f"{'implementation':<16}{'ms':>10}{'queries':>10}")
+    results = []
+    for name, function in (
+        ("per module", per_module_analytics),
+        ("set based", ScoringManager.get_analytics),
+    ):
+        result, ms, queries = measure(engine, id_assignment, function, args.repeat)
+        results.append(json.dumps(result))
+        print(f"{name:<16}{ms:>10.2f}{queries:>10}")
+    print("identical response" if results[0] == results[1] else "DIFFERENT RESPONSE")
+
+
+if __name__ == "__main__":
+    main()
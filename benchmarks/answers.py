@@ -0,0 +1,143 @@
+"""
+Benchmark of the bulk answer submission against one request per answer
+
+Answers every question of a questionnaire twice (a first save and an update)
+with ``AnswerManager.create_or_update_answer``, as one POST to `/answer/` per
+question does, and with ``AnswerManager.save_answers`` as one POST to
+`/answer/bulk` per module does. Reports the answers per second and the number
+of queries of each path.
+
+By default it runs on an in-memory SQLite database. A PostgreSQL URL shows the
+round trips of a real server, it must point to an empty scratch database
+because the tables are created there.
+
+Example
+-------
+    python -m benchmarks.answers --modules 10 --questions 20
+    python -m benchmarks.answers --database-url postgresql://u:p@localhost/bench
+"""
+import argparse
+import time
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from benchmarks.dataset import TABLES, seed
+from src.classes.answer_manager import (
+    AnswerBatch,
+    AnswerInput,
+    AnswerItem,
+    AnswerManager,
+)
+from src.models import (
+    Assignment,
+    AssignmentResult,
+    OptionAnswer,
+    ScoringVersion,
+    StructureVersion,
+)
+
+
+def new_assignment(session: Session, id_questionnaire: int) -> int:
+    assignment = Assignment(id_questionnaire=id_questionnaire)
+    session.add(assignment)
+    session.commit()
+    return assignment.id
+
+
+def per_answer(session: Session, id_assignment: int, options: list[OptionAnswer]):
+    for option in options:
+        AnswerManager.create_or_update_answer(
+            AnswerInput(
+                id_assignment=id_assignment,
+                id_question_question_id=option.id_question_question_id,
+                id_question_module_id=option.id_question_module_id,
+                id_option=option.id,
+            ),
+            session=session,
+        )
+
+
+def per_module(session: Session, id_assignment: int, options: list[OptionAnswer]):
+    modules = {}
+    for option in options:
+        modules.setdefault(option.id_question_module_id, []).append(
+            AnswerItem(
+                id_question_question_id=option.id_question_question_id,
+                id_question_module_id=option.id_question_module_id,
+                id_option=option.id,
+            )
+        )
+    for answers in modules.values():
+        AnswerManager.save_answers(
+            AnswerBatch(id_assignment=id_assignment, answers=answers),
+            session=session,
+        )
+
+
+def measure(engine, id_questionnaire: int, options: list, function) -> tuple:
+    """
+    Answer every question and then change every answer
+
+    Returns
+    -------
+    tuple
+        Answers per second and queries
+    """
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    with Session(engine) as session:
+        id_assignment = new_assignment(session, id_questionnaire)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        start = time.perf_counter()
+        for option_set in options:
+            with Session(engine) as session:
+                function(session, id_assignment, option_set)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    answers = sum(len(option_set) for option_set in options)
+    return answers / elapsed, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            table.__table__
+            for table in TABLES + [AssignmentResult, ScoringVersion, StructureVersion]
+        ],
+    )
+    with Session(engine) as session:
+        id_assignment = seed(session, args.modules, args.questions)
+        id_questionnaire = session.get(Assignment, id_assignment).id_questionnaire
+        all_options = session.exec(select(OptionAnswer).order_by(OptionAnswer.id)).all()
+        session.expunge_all()
+    # The first and the last option of every question
+    first, last = {}, {}
+    for option in all_options:
+        key = (option.id_question_module_id, option.id_question_question_id)
+        first.setdefault(key, option)
+        last[key] = option
+    options = [list(first.values()), list(last.values())]
+
+    print(f"{args.modules} modules, {args.modules * args.questions} questions")
+    print(f"{'path':<12}{'answers/s':>12}{'queries':>10}")
+    for name, function in (("per answer", per_answer), ("bulk", per_module)):
+        rate, queries = measure(engine, id_questionnaire, options, function)
+        print(f"{name:<12}{rate:>12.1f}{queries:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Data shared by the benchmarks and the tests
+
+``seed`` creates an answered questionnaire and ``per_module_analytics`` is the
+previous implementation of the analytics, the reference ``ScoringManager`` is
+compared against.
+"""
+import random
+
+from sqlmodel import Session, select
+
+from src.classes.assignment_manager import get_operation
+from src.models import (
+    Answer,
+    Assignment,
+    Module,
+    ModuleOutputLink,
+    OptionAnswer,
+    Output,
+    Question,
+    QuestionOutputLink,
+    Questionnaire,
+    QuestionnaireModuleLink,
+    QuestionType,
+    TypeCondition,
+)
+
+TABLES = [
+    Questionnaire,
+    Module,
+    QuestionnaireModuleLink,
+    Question,
+    OptionAnswer,
+    Output,
+    ModuleOutputLink,
+    QuestionOutputLink,
+    Assignment,
+    Answer,
+]
+
+
+def seed(
+    session: Session, modules: int, questions: int, options: int = 4, seed_value=0
+) -> int:
+    """
+    Create an answered questionnaire
+
+    Every module has two outputs, every third question has an output and every
+    question is answered with a random option.
+
+    Returns
+    -------
+    int
+        Id of the assignment
+    """
+    rng = random.Random(seed_value)
+    conditions = list(TypeCondition)
+    questionnaire = Questionnaire(title="Benchmark")
+    session.add(questionnaire)
+    session.flush()
+    assignment = Assignment(id_questionnaire=questionnaire.id)
+    session.add(assignment)
+    session.flush()
+    for index in range(modules):
+        module = Module(title=f"Module {index}")
+        session.add(module)
+        session.flush()
+        session.add(
+            QuestionnaireModuleLink(
+                id_questionnaire=questionnaire.id, id_module=module.id
+            )
+        )
+        for output_index in range(2):
+            output = Output(
+                text=f"Module {index} output {output_index}",
+                condition_type=rng.choice(conditions),
+                condition_value=rng.randint(0, questions * options),
+            )
+            session.add(output)
+            session.flush()
+            session.add(ModuleOutputLink(id_module=module.id, id_output=output.id))
+        for id_question in range(1, questions + 1):
+            session.add(
+                Question(
+                    id=id_question,
+                    id_module=module.id,
+                    content="?",
+                    # What the database trigger sets from the options
+                    type_opt=(
+                        QuestionType.YN if options == 2 else QuestionType.MULTIPLE
+                    ).value,
+                )
+            )
+            option_ids = []
+            for score in range(options):
+                option = OptionAnswer(
+                    id_question_question_id=id_question,
+                    id_question_module_id=module.id,
+                    content=str(score),
+                    score=score,
+                )
+                session.add(option)
+                session.flush()
+                option_ids.append(option.id)
+            if id_question % 3 == 0:
+                output = Output(
+                    text=f"Module {index} question {id_question}",
+                    condition_type=rng.choice(conditions),
+                    condition_value=rng.randint(0, options),
+                )
+                session.add(output)
+                session.flush()
+                session.add(
+                    QuestionOutputLink(
+                        id_question_question_id=id_question,
+                        id_question_module_id=module.id,
+                        id_output=output.id,
+                    )
+                )
+            session.add(
+                Answer(
+                    id_assignment=assignment.id,
+                    id_question_question_id=id_question,
+                    id_question_module_id=module.id,
+                    id_option=rng.choice(option_ids),
+                )
+            )
+    session.commit()
+    return assignment.id
+
+
+def per_module_analytics(assignment: Assignment, session: Session) -> list[dict]:
+    """
+    Previous implementation, with queries per module and per question
+    """
+    resume = []
+    for module in assignment.questionnaire.modules:
+        diagnostic = []
+        observations = []
+        answers = session.exec(
+            select(Answer)
+            .where(Answer.id_assignment == assignment.id)
+            .where(Answer.id_question_module_id == module.id)
+        ).all()
+        punctuation = 0
+        for answer in answers:
+            if answer.id_option:
+                punctuation += answer.option.score
+        if module.outputs:
+            diagnostic.append(
+                [
+                    output.text
+                    for output in module.outputs
+                    if get_operation(
+                        output.condition_type, output.condition_value, punctuation
+                    )
+                ]
+            )
+        for question in module.questions:
+            if question.outputs:
+                answer = session.exec(
+                    select(Answer)
+                    .where(Answer.id_assignment == assignment.id)
+                    .where(Answer.id_question_question_id == question.id)
+                    .where(Answer.id_question_module_id == module.id)
+                ).first()
+                if answer:
+                    for output in question.outputs:
+                        if get_operation(
+                            output.condition_type,
+                            output.condition_value,
+                            answer.option.score,
+                        ):
+                            observations.append(output.text)
+        resume.append(
+            {
+                "module": module.title,
+                "diagnostic": {"punctuation": punctuation, "diagnostic": diagnostic},
+                "observations": observations,
+            }
+        )
+    return resume
@@ -0,0 +1,147 @@
+"""
+Latency benchmark of the API under concurrent load
+
+Runs the same authenticated request against a running server at several
+concurrency levels and reports the latency percentiles of each level. Run it
+once with ``DB_ASYNC=false`` and once with ``DB_ASYNC=true`` on the server to
+compare the sync and the asyncpg sessions.
+
+Example
+-------
+    python -m benchmarks.latency --url http://localhost:43000 \\
+        --email admin@example.com --password secret \\
+        --path /questionnaire/ --concurrency 50 100 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    Get the percentile of a list of values with the nearest rank method
+
+    Parameters
+    ----------
+    values
+        Sorted list of values
+    percent
+        Percentile between 0 and 100
+
+    Returns
+    -------
+    float
+        Value at the given percentile
+    """
+    if not values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post(
+        "/api/auth/token", data={"username": email, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    method: str,
+    path: str,
+    headers: dict,
+    concurrency: int,
+    total: int,
+) -> dict:
+    """
+    Send ``total`` requests keeping ``concurrency`` of them in flight
+
+    Returns
+    -------
+    dict
+        Latency percentiles in milliseconds, throughput and error count
+    """
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        headers = {}
+        if args.email:
+            token = await login(client, args.email, args.password)
+            headers["Authorization"] = f"Bearer {token}"
+        # Warm up the connections and the database pool
+        await run_level(client, args.method, args.path, headers, 10, 50)
+
+        print(
+            f"{'concurrency':>11} {'requests':>8} {'errors':>6} {'rps':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for concurrency in args.concurrency:
+            result = await run_level(
+                client,
+                args.method,
+                args.path,
+                headers,
+                concurrency,
+                args.requests or concurrency * 20,
+            )
+            print(
+                f"{result['concurrency']:>11} {result['requests']:>8} "
+                f"{result['errors']:>6} {result['rps']:>8.1f} {result['p50']:>8.1f} "
+                f"{result['p95']:>8.1f} {result['p99']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:43000")
+    parser.add_argument("--path", default="/questionnaire/")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--email", help="User to log in with")
+    parser.add_argument("--password", default="")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[50, 100, 150, 200]
+    )
+    parser.add_argument(
+        "--requests", type=int, help="Requests per level (20 per client by default)"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
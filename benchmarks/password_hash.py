@@ -0,0 +1,92 @@
+"""
+Cost benchmark of the password hash policy
+
+Hashes passwords with each candidate scheme and rounds for a few seconds and
+reports the hashes per second of one core and of all the worker processes. A
+login verifies one hash, so the rate of the workers is the login capacity of
+the server with ``PASSWORD_HASH_WORKERS`` set to the same number.
+
+Example
+-------
+    python -m benchmarks.password_hash --scheme pbkdf2_sha256 \\
+        --rounds 29000 100000 300000 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils.hashing import hash_password
+
+
+def hashes_per_second(scheme: str, rounds: int, seconds: float) -> float:
+    """
+    Hash passwords in the current process during the given time
+
+    Parameters
+    ----------
+    scheme
+        Passlib scheme of the hashes
+    rounds
+        Rounds of the hashes, the passlib default when None
+    seconds
+        Time to keep hashing
+
+    Returns
+    -------
+    float
+        Hashes per second
+    """
+    # The first hash builds the context and loads the backend
+    hash_password("benchmark", scheme, rounds)
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        hash_password("benchmark", scheme, rounds)
+        count += 1
+    return count / elapsed
+
+
+def run(scheme: str, rounds: int, seconds: float, workers: int) -> dict:
+    single = hashes_per_second(scheme, rounds, seconds)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rates = list(
+            executor.map(
+                hashes_per_second,
+                [scheme] * workers,
+                [rounds] * workers,
+                [seconds] * workers,
+            )
+        )
+    return {
+        "scheme": scheme,
+        "rounds": rounds or "default",
+        "per_core": single,
+        "ms_per_hash": 1000 / single if single else float("inf"),
+        "workers": sum(rates),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scheme", default="pbkdf2_sha256")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[None])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print(
+        f"{'scheme':<16}{'rounds':>10}{'ms/hash':>10}"
+        f"{'hash/s core':>14}{f'hash/s x{args.workers}':>14}"
+    )
+    for rounds in args.rounds:
+        result = run(args.scheme, rounds, args.seconds, args.workers)
+        print(
+            f"{result['scheme']:<16}{result['rounds']:>10}"
+            f"{result['ms_per_hash']:>10.1f}{result['per_core']:>14.1f}"
+            f"{result['workers']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
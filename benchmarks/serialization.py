@@ -0,0 +1,140 @@
+"""
+Benchmark of the response serialization of the largest payloads
+
+Renders a page of `/user/list`, the patients of a doctor and the analytics of
+an assignment three ways:
+
+- untyped: as FastAPI did without a response model, with ``jsonable_encoder``
+  and the standard ``JSONResponse``
+- model: validated against the response model of the route, then
+  ``jsonable_encoder`` and ``ORJSONResponse``, the path of most routes now
+- direct: ``model_response``, the models rendered straight with orjson, the
+  path of these three routes now
+
+Reports the milliseconds of each render and the size of the body.
+
+Example
+-------
+    python -m benchmarks.serialization --rows 1000 --repeat 20
+"""
+import argparse
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import parse_obj_as
+
+from src.models import (
+    ModuleAnalytics,
+    PatientOutput,
+    StatusUser,
+    UserBaseWithRole,
+    UserList,
+    UserRoles,
+)
+from src.utils.responses import model_response
+
+
+def payloads(rows: int) -> dict:
+    """
+    Build the payloads of each route, as the routes return them
+
+    Returns
+    -------
+    dict
+        Response model and payload of each route
+    """
+    users = [
+        UserBaseWithRole(
+            email=f"user{index}@example.com",
+            name=f"Name {index}",
+            last_name=f"Last name {index}",
+            status=StatusUser.active,
+            rol=UserRoles.patient,
+        )
+        for index in range(rows)
+    ]
+    patients = [
+        PatientOutput(
+            id_user=f"patient{index}@example.com",
+            email=f"patient{index}@example.com",
+            name=f"Name {index}",
+            last_name=f"Last name {index}",
+            consent=True,
+            gender=index % 2,
+            education_level=index % 4,
+            region=index % 3,
+            zone=index % 2,
+            birth_date=datetime(1950 + index % 50, 1, 1),
+            dni=f"{index:08d}A",
+        )
+        for index in range(rows)
+    ]
+    analytics = [
+        {
+            "module": f"Module {index}",
+            "diagnostic": {
+                "punctuation": index * 3,
+                "diagnostic": [[f"Module {index} output {id}" for id in range(2)]],
+            },
+            "observations": [f"Module {index} question {id}" for id in range(10)],
+        }
+        for index in range(rows // 20 or 1)
+    ]
+    return {
+        "/user/list": (
+            UserList,
+            {"users": users, "total": rows, "next_cursor": None},
+        ),
+        "/doctor/{id}/patients": (list[PatientOutput], patients),
+        "/assignment/{id}/analytics": (list[ModuleAnalytics], analytics),
+    }
+
+
+def untyped(_, payload) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def model(response_model, payload) -> bytes:
+    return ORJSONResponse(jsonable_encoder(parse_obj_as(response_model, payload))).body
+
+
+def direct(response_model, payload) -> bytes:
+    if response_model is UserList:
+        payload = UserList(**payload)
+    return model_response(payload).body
+
+
+def measure(render, response_model, payload, repeat: int) -> tuple:
+    """
+    Render a payload ``repeat`` times
+
+    Returns
+    -------
+    tuple
+        Milliseconds of a render and bytes of the body
+    """
+    body = render(response_model, payload)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(response_model, payload)
+    return (time.perf_counter() - start) * 1000 / repeat, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'route':<28}{'render':<10}{'ms':>10}{'bytes':>10}")
+    for route, (response_model, payload) in payloads(args.rows).items():
+        for render in (untyped, model, direct):
+            name = render.__name__
+            ms, size = measure(render, response_model, payload, args.repeat)
+            print(f"{route:<28}{name:<10}{ms:>10.2f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+import asyncio
+import logging
+import signal
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.exc import OperationalError
 
 from src.routers.auth import router as auth_router
 from src.routers.user_service import router as user_router
@@ -10,8 +17,18 @@ from src.routers.questionnaire_service import router as questionnaire_router
 from src.routers.assignment_service import router as assignments_router
 from src.routers.question_service import router as question_router
 from src.routers.answer_service import router as answer_router
+from src.routers.admin_service import router as admin_router
+from src.routers.metrics_service import router as metrics_router
+from src.database import engine, async_engine, DB_POOL_SIZE
+from src.settings import reload_settings
+from src.utils.answer_buffer import answer_buffer
+from src.utils.hashing import password_hasher
+from src.utils.pool import warm_pool, warm_async_pool
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Responses are rendered with orjson, the routes declare their response model
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Allow CORS
 app.add_middleware(
@@ -31,3 +48,46 @@ app.include_router(questionnaire_router)
 app.include_router(assignments_router)
 app.include_router(question_router)
 app.include_router(answer_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+async def reload_settings_on_sighup():
+    # Rotate the signing keys of a running worker with `kill -HUP`
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+    except (NotImplementedError, RuntimeError, ValueError):
+        # Signals are only available on the main thread of Unix event loops
+        pass
+
+
+@app.on_event("startup")
+async def warm_database_pool():
+    # Open the connections of the pool before the first requests need them
+    try:
+        if async_engine is not None:
+            await warm_async_pool(async_engine, DB_POOL_SIZE)
+        else:
+            await run_in_threadpool(warm_pool, engine, DB_POOL_SIZE)
+    except (OperationalError, OSError) as e:
+        # The database may still be starting, the connections open on demand.
+        # asyncpg raises OSError when it cannot connect
+        logger.warning(f"Could not warm the database pool: {e}")
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+async def start_answer_buffer():
+    if answer_buffer.enabled:
+        answer_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_answer_buffer():
+    if answer_buffer.enabled:
+        await answer_buffer.stop()
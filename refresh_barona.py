@@ -0,0 +1,10 @@
+from sqlmodel import Session
+
+from src.classes.patient_manager import PatientManager
+from src.database import engine
+
+# Compute the CI Barona of every patient with complete demographics, run it
+# once a year so the stored values follow the age of the patients
+with Session(engine) as session:
+    updated = PatientManager.refresh_ci_barona(session=session)
+print(f"CI Barona of {updated} patients updated")
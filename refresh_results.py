@@ -0,0 +1,11 @@
+from sqlmodel import Session
+
+from src.classes.result_manager import ResultManager
+from src.database import engine
+
+# Store the results of the finished assignments without current ones, run it
+# after the upgrade that adds the results and after a change of the scoring
+# rules, the cohort statistics only count current results
+with Session(engine) as session:
+    refreshed = ResultManager.refresh_finished(session=session)
+print(f"Results of {refreshed} assignments refreshed")
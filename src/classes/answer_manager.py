@@ -1,7 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import tuple_
 from sqlmodel import Session, select, SQLModel
 
 from src.classes.assignment_manager import AssignmentManager
-from src.models import Answer, Assignment
+from src.models import (
+    Answer,
+    Assignment,
+    OptionAnswer,
+    Question,
+    QuestionnaireModuleLink,
+    StatusQuestionnaire,
+)
+from src.utils.upsert import upsert
 
 
 class AnswerInput(SQLModel):
@@ -12,6 +24,46 @@ class AnswerInput(SQLModel):
     open_answer: str = None
 
 
+class AnswerItem(SQLModel):
+    id_question_question_id: int
+    id_question_module_id: int
+    id_option: int = None
+    open_answer: str = None
+    # When the answer was given, an older answer does not replace a newer one
+    date: datetime = None
+
+
+class AnswerBatch(SQLModel):
+    id_assignment: int
+    answers: list[AnswerItem]
+
+
+class SavedAnswers(SQLModel):
+    saved: int
+
+
+class AssignmentNotFound(Exception):
+    def __init__(self):
+        self.message = "Assignment not found"
+        self.code = 404
+        super().__init__(self.message)
+
+
+class AssignmentFinished(Exception):
+    def __init__(self):
+        self.message = "Assignment already finished"
+        self.code = 400
+        super().__init__(self.message)
+
+
+class InvalidAnswers(Exception):
+    def __init__(self, errors: list[dict]):
+        self.message = "Invalid answers"
+        self.errors = errors
+        self.code = 400
+        super().__init__(self.message)
+
+
 class AnswerManager:
     @classmethod
     def get_answer(
@@ -27,21 +79,238 @@ class AnswerManager:
 
     @classmethod
     def save_answer(cls, answer: AnswerInput, session: Session):
+        """
+        Add a new answer and set its assignment as draft, the caller commits
+        """
         assignment: Assignment = AssignmentManager.get_assignment(
             answer.id_assignment, session=session
         )
         if not assignment:
-            raise Exception("Assignment not found")
-        if assignment.status == "completed":
-            raise Exception("Assignment already completed")
+            raise AssignmentNotFound()
+        if assignment.status == StatusQuestionnaire.finished:
+            raise AssignmentFinished()
         if assignment.status != "draft":
-            AssignmentManager.update_status(assignment, "draft", session=session)
+            assignment.status = "draft"
+            session.add(assignment)
         answer = Answer(**answer.dict())
         session.add(answer)
-        session.commit()
-        session.refresh(answer)
+        session.flush()
         return answer
 
+    @classmethod
+    def create_or_update_answer(cls, answer: AnswerInput, session: Session) -> Answer:
+        """
+        Validate and save an answer and the results of its module in one
+        transaction
+        """
+        cls.validate_answer(answer, session=session)
+        old_answer = cls.get_answer(
+            answer.id_assignment,
+            answer.id_question_module_id,
+            answer.id_question_question_id,
+            session=session,
+        )
+        now = datetime.utcnow()
+        if old_answer:
+            saved = old_answer
+            # Same rule as the bulk upsert, a newer stored answer is kept
+            if old_answer.date is None or old_answer.date <= now:
+                old_answer.id_option = answer.id_option
+                old_answer.open_answer = answer.open_answer
+                old_answer.date = now
+                session.add(old_answer)
+        else:
+            saved = cls.save_answer(answer, session=session)
+        cls.update_results(saved.id_assignment, saved.id_question_module_id, session)
+        session.commit()
+        session.refresh(saved)
+        return saved
+
+    @classmethod
+    def validate_answer(cls, answer: AnswerInput, session: Session) -> Assignment:
+        """
+        Check a single answer as an answer of a batch
+
+        Returns
+        -------
+        Assignment
+            Assignment of the answer
+
+        Raises
+        ------
+        AssignmentNotFound
+            If the assignment does not exist
+        AssignmentFinished
+            If the assignment is finished
+        InvalidAnswers
+            If the question is not in the questionnaire of the assignment or
+            the option is not of the question
+        """
+        assignment = AssignmentManager.get_assignment(
+            answer.id_assignment, session=session
+        )
+        if not assignment:
+            raise AssignmentNotFound()
+        if assignment.status == StatusQuestionnaire.finished:
+            raise AssignmentFinished()
+        cls.validate_batch(
+            assignment,
+            [AnswerItem(**answer.dict(exclude={"id_assignment"}))],
+            session=session,
+        )
+        return assignment
+
+    @classmethod
+    def validate_batch(cls, assignment: Assignment, answers: list[AnswerItem], session):
+        """
+        Check every answer of a batch with two queries
+
+        Raises
+        ------
+        InvalidAnswers
+            With the questions that are not in the questionnaire of the
+            assignment and the options that are not of their question
+        """
+        pairs = {
+            (answer.id_question_module_id, answer.id_question_question_id)
+            for answer in answers
+        }
+        questions = set(
+            session.exec(
+                select(Question.id_module, Question.id)
+                .join(
+                    QuestionnaireModuleLink,
+                    QuestionnaireModuleLink.id_module == Question.id_module,
+                )
+                .where(
+                    QuestionnaireModuleLink.id_questionnaire
+                    == assignment.id_questionnaire
+                )
+                .where(tuple_(Question.id_module, Question.id).in_(pairs))
+            ).all()
+        )
+        option_ids = {answer.id_option for answer in answers if answer.id_option}
+        options = {
+            id_option: (id_module, id_question)
+            for id_option, id_module, id_question in session.exec(
+                select(
+                    OptionAnswer.id,
+                    OptionAnswer.id_question_module_id,
+                    OptionAnswer.id_question_question_id,
+                ).where(OptionAnswer.id.in_(option_ids))
+            ).all()
+        }
+        errors = []
+        for answer in answers:
+            pair = (answer.id_question_module_id, answer.id_question_question_id)
+            if pair not in questions:
+                errors.append(
+                    {
+                        "id_module": pair[0],
+                        "id_question": pair[1],
+                        "detail": "Question not in the questionnaire",
+                    }
+                )
+            elif answer.id_option and options.get(answer.id_option) != pair:
+                errors.append(
+                    {
+                        "id_module": pair[0],
+                        "id_question": pair[1],
+                        "detail": "Option not in the question",
+                    }
+                )
+        if errors:
+            raise InvalidAnswers(errors)
+
+    @classmethod
+    def save_answers(cls, batch: AnswerBatch, session: Session) -> int:
+        """
+        Validate and save a batch of answers of an assignment, with their
+        results, in one transaction
+
+        The answers are written with a single ``INSERT ... ON CONFLICT DO
+        UPDATE`` on the primary key. When a question is repeated in the batch
+        the last answer wins, a stored answer newer than the one of the batch is
+        kept.
+
+        Returns
+        -------
+        int
+            Number of answers saved
+        """
+        assignment = AssignmentManager.get_assignment(
+            batch.id_assignment, session=session
+        )
+        if not assignment:
+            raise AssignmentNotFound()
+        if assignment.status == StatusQuestionnaire.finished:
+            raise AssignmentFinished()
+        answers = {
+            (answer.id_question_module_id, answer.id_question_question_id): answer
+            for answer in batch.answers
+        }
+        if not answers:
+            return 0
+        cls.validate_batch(assignment, list(answers.values()), session=session)
+
+        now = datetime.utcnow()
+        statement = upsert(session, Answer).values(
+            [
+                {
+                    "id_assignment": assignment.id,
+                    "id_question_module_id": answer.id_question_module_id,
+                    "id_question_question_id": answer.id_question_question_id,
+                    "id_option": answer.id_option,
+                    "open_answer": answer.open_answer,
+                    "date": answer.date or now,
+                }
+                for answer in answers.values()
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                Answer.id_assignment,
+                Answer.id_question_question_id,
+                Answer.id_question_module_id,
+            ],
+            set_={
+                "id_option": statement.excluded.id_option,
+                "open_answer": statement.excluded.open_answer,
+                "date": statement.excluded.date,
+            },
+            where=Answer.__table__.c.date <= statement.excluded.date,
+        )
+        session.execute(statement)
+        if assignment.status != "draft":
+            assignment.status = "draft"
+            session.add(assignment)
+        session.flush()
+        # Answers loaded before in the session are stale after the upsert
+        session.expire_all()
+
+        modules = {id_module for id_module, _ in answers}
+        cls.update_results(
+            assignment.id,
+            modules.pop() if len(modules) == 1 else None,
+            session=session,
+        )
+        session.commit()
+        return len(answers)
+
+    @classmethod
+    def update_results(
+        cls, id_assignment: int, id_module: Optional[int], session: Session
+    ):
+        """
+        Update the stored analytics of a draft assignment, only of ``id_module``
+        when it is given, the caller commits them
+        """
+        from src.classes.result_manager import ResultManager
+
+        assignment = AssignmentManager.get_assignment(id_assignment, session=session)
+        if assignment and assignment.status != "finished":
+            ResultManager.refresh(assignment, session=session, id_module=id_module)
+
     @classmethod
     def get_punctuation_per_module(
         cls, id_assignment: int, id_module: int, session: Session
@@ -1,6 +1,16 @@
 from pydantic import EmailStr
-from sqlmodel import Session, SQLModel
-from src.models import Assignment, Questionnaire, Patient, Doctor, TypeCondition
+from sqlalchemy import exists
+from sqlmodel import Session, SQLModel, select
+from src.models import (
+    Answer,
+    Assignment,
+    Questionnaire,
+    QuestionnaireModuleLink,
+    Question,
+    Patient,
+    Doctor,
+    TypeCondition,
+)
 
 
 class AssignmentInput(SQLModel):
@@ -9,6 +19,14 @@ class AssignmentInput(SQLModel):
     doctor_id: EmailStr
 
 
+class UnansweredQuestions(Exception):
+    def __init__(self, missing: list[tuple[int, int]]):
+        self.message = "Not all questions are answered"
+        self.missing = missing
+        self.code = 400
+        super().__init__(self.message)
+
+
 class AssignmentManager:
     @classmethod
     def create_assignment(
@@ -45,82 +63,57 @@ class AssignmentManager:
         return assignment
 
     @classmethod
-    def finish_assignment(cls, assignment: Assignment, session: Session) -> Assignment:
-        # Check if all modules are finished
-        from src.classes.answer_manager import AnswerManager
-
-        questions_answered = []
-        for answer in assignment.answers:
-            answer_bd = AnswerManager.get_answer(
-                answer.id_assignment,
-                answer.id_question_module_id,
-                answer.id_question_question_id,
-                session=session,
+    def get_unanswered_questions(
+        cls, assignment: Assignment, session: Session
+    ) -> list[tuple[int, int]]:
+        """
+        Get the questions of the questionnaire without an answer in the assignment
+
+        Returns
+        -------
+        list[tuple[int, int]]
+            Module id and question id of every unanswered question
+        """
+        answered = exists().where(
+            Answer.id_assignment == assignment.id,
+            Answer.id_question_module_id == Question.id_module,
+            Answer.id_question_question_id == Question.id,
+        )
+        rows = session.exec(
+            select(Question.id_module, Question.id)
+            .join(
+                QuestionnaireModuleLink,
+                QuestionnaireModuleLink.id_module == Question.id_module,
+            )
+            .where(
+                QuestionnaireModuleLink.id_questionnaire == assignment.id_questionnaire
             )
-            if answer_bd:
-                questions_answered.append(answer_bd.id_question_question_id)
+            .where(~answered)
+            .order_by(Question.id_module, Question.id)
+        ).all()
+        return [(id_module, id_question) for id_module, id_question in rows]
 
-        for module in assignment.questionnaire.modules:
-            all_questions_per_module = [questions.id for questions in module.questions]
+    @classmethod
+    def finish_assignment(cls, assignment: Assignment, session: Session) -> Assignment:
+        from src.classes.result_manager import ResultManager
 
-            if not all(
-                questions in questions_answered
-                for questions in all_questions_per_module
-            ):
-                raise Exception("Not all questions are answered")
+        missing = cls.get_unanswered_questions(assignment, session=session)
+        if missing:
+            raise UnansweredQuestions(missing)
 
         assignment.status = "finished"
         session.add(assignment)
+        # The analytics of a finished assignment are served from its results
+        ResultManager.refresh(assignment, session=session)
         session.commit()
         session.refresh(assignment)
         return assignment
 
     @classmethod
     def get_assignment_analytics(cls, assignment, session):
-        resume = []
-        for module in assignment.questionnaire.modules:
-            from src.classes.answer_manager import AnswerManager
-
-            diagnostic = []
-            observations = []
-            punctuation = AnswerManager.get_punctuation_per_module(
-                assignment.id, module.id, session=session
-            )
-            # Get diagnostic
-            if module.outputs:
-                module_outputs = []
-                for output in module.outputs:
-                    if get_operation(
-                        output.condition_type,
-                        output.condition_value,
-                        punctuation,
-                    ):
-                        module_outputs.append(output.text)
-                diagnostic.append(module_outputs)
-            total_diagnostic = {"punctuation": punctuation, "diagnostic": diagnostic}
-            # Get observations
-            for question in module.questions:
-                if question.outputs:
-                    answer = AnswerManager.get_answer(
-                        assignment.id, module.id, question.id, session=session
-                    )
-                    if answer:
-                        for output in question.outputs:
-                            if get_operation(
-                                output.condition_type,
-                                output.condition_value,
-                                answer.option.score,
-                            ):
-                                observations.append(output.text)
-
-            resume.append(
-                {
-                    "module": module.title,
-                    "diagnostic": total_diagnostic,
-                    "observations": observations,
-                }
-            )
-        return resume
+        from src.classes.result_manager import ResultManager
+
+        return ResultManager.get_analytics(assignment, session=session)
 
 
 def get_operation(type: TypeCondition, expected_value: int, actual_value: int) -> bool:
@@ -1,9 +1,13 @@
-import jwt
-from sqlmodel import Session, select
+from datetime import datetime, timedelta
 
+from sqlmodel import Session
+
+from src.classes.user_manager import UserManager, Principal
 from src.database import engine
-from src.models import User, StatusUser
-from src.settings import Settings
+from src.models import StatusUser
+from src.settings import get_settings, get_key_ring
+from src.utils.hashing import password_hasher
+from src.utils.reuse import run_db
 
 
 class UserNotFound(Exception):
@@ -29,15 +33,50 @@ class UserNotStatusValid(Exception):
 
 class Auth:
     @classmethod
-    def login(cls, email, password):
-        with Session(engine) as session:
-            user = session.exec(select(User).where(User.email == email)).first()
-            if not user:
-                raise UserNotFound(email)
-            if not user.verify_password(password):
-                raise IncorrectPassword()
-            if user.status != StatusUser.active:
-                raise UserNotStatusValid()
-            payload = {"email": user.email}
-            token = jwt.encode(payload, Settings().token_secret, algorithm="HS256")
-            return {"access_token": token}
+    def create_access_token(cls, principal: Principal, token_version: int) -> str:
+        """
+        Sign an access token with the roles and the token version of the user
+
+        Parameters
+        ----------
+        principal
+            Principal of the user
+        token_version
+            Current token version of the user, a later version revokes the token
+
+        Returns
+        -------
+        str
+            Signed access token
+        """
+        settings = get_settings()
+        payload = {
+            "email": principal.email,
+            "roles": sorted(principal.roles),
+            "ver": token_version,
+            "exp": datetime.utcnow()
+            + timedelta(minutes=settings.access_token_expire_minutes),
+        }
+        return get_key_ring().encode(payload)
+
+    @classmethod
+    async def login(cls, email, password, *, session=None):
+        if session is None:
+            with Session(engine) as session:
+                return await cls.login(email, password, session=session)
+        principal = await run_db(session, UserManager.get_principal, email)
+        if not principal:
+            raise UserNotFound(email)
+        user = principal.user
+        verified, new_hash = await password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not verified:
+            raise IncorrectPassword()
+        if user.status != StatusUser.active:
+            raise UserNotStatusValid()
+        if new_hash:
+            # The hash policy changed since the password was set
+            await run_db(session, UserManager.update_password_hash, user, new_hash)
+        token = cls.create_access_token(principal, user.token_version)
+        return {"access_token": token}
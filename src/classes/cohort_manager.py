@@ -0,0 +1,299 @@
+import math
+from bisect import bisect_right
+from typing import Optional
+
+from sqlalchemy import extract, func
+from sqlmodel import Session, SQLModel, select
+
+from src.models import (
+    Assignment,
+    AssignmentResult,
+    Patient,
+    QuestionnaireModuleLink,
+    ScoringVersion,
+    StatusQuestionnaire,
+)
+from src.settings import get_settings
+from src.utils.ttl_cache import TTLCache
+
+PERCENTILES = (25, 50, 75, 90)
+
+cohort_cache = TTLCache(ttl=get_settings().cohort_cache_ttl)
+
+
+class CohortFilters(SQLModel):
+    """
+    Demographics of the patients the cohort is made of, every filter is
+    optional
+    """
+
+    id_questionnaire: Optional[int] = None
+    gender: Optional[int] = None
+    education_level: Optional[int] = None
+    region: Optional[int] = None
+    zone: Optional[int] = None
+    birth_year_from: Optional[int] = None
+    birth_year_to: Optional[int] = None
+
+    def key(self) -> tuple:
+        return tuple(self.dict().values())
+
+
+class HistogramBin(SQLModel):
+    start: float
+    end: float
+    count: int
+
+
+class ModuleCohort(SQLModel):
+    id_module: int
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+    p25: Optional[float] = None
+    p50: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+    histogram: list[HistogramBin] = []
+    # Score of the assignment compared, and the percent of the cohort below it
+    punctuation: Optional[int] = None
+    percentile_rank: Optional[float] = None
+
+
+def _score_at(scores: list[int], cumulative: list[int], rank: int) -> int:
+    """
+    Score of the ``rank``-th patient of the cohort, sorted by score
+    """
+    return scores[bisect_right(cumulative, rank)]
+
+
+def describe(frequencies: list[tuple[int, int]], bins: int) -> dict:
+    """
+    Statistics of a score distribution given as a frequency table
+
+    Every loop runs over the distinct scores, not over the patients.
+
+    Parameters
+    ----------
+    frequencies
+        Score and number of patients with it, sorted by score
+    bins
+        Number of equal width bins of the histogram
+
+    Returns
+    -------
+    dict
+        Count, mean, sample standard deviation, range, percentiles with linear
+        interpolation and histogram
+    """
+    count = sum(number for _, number in frequencies)
+    if not count:
+        return {"count": 0, "histogram": []}
+    scores = [score for score, _ in frequencies]
+    cumulative = []
+    total = 0
+    for _, number in frequencies:
+        total += number
+        cumulative.append(total)
+    mean = sum(score * number for score, number in frequencies) / count
+    variance = (
+        sum(number * (score - mean) ** 2 for score, number in frequencies) / (count - 1)
+        if count > 1
+        else 0.0
+    )
+    statistics = {
+        "count": count,
+        "mean": mean,
+        "stddev": math.sqrt(variance),
+        "min": scores[0],
+        "max": scores[-1],
+    }
+    for percentile in PERCENTILES:
+        # Same interpolation as percentile_cont in SQL
+        position = percentile / 100 * (count - 1)
+        lower = _score_at(scores, cumulative, math.floor(position))
+        upper = _score_at(scores, cumulative, math.ceil(position))
+        statistics[f"p{percentile}"] = lower + (upper - lower) * (
+            position - math.floor(position)
+        )
+
+    low, high = scores[0], scores[-1]
+    if low == high:
+        statistics["histogram"] = [{"start": low, "end": high, "count": count}]
+        return statistics
+    width = (high - low) / bins
+    counts = [0] * bins
+    for score, number in frequencies:
+        counts[min(int((score - low) / width), bins - 1)] += number
+    statistics["histogram"] = [
+        {
+            "start": low + index * width,
+            "end": low + (index + 1) * width,
+            "count": number,
+        }
+        for index, number in enumerate(counts)
+    ]
+    return statistics
+
+
+def percentile_rank(frequencies: list[tuple[int, int]], punctuation: int):
+    """
+    Percent of the cohort with a lower score, counting half of the ties
+    """
+    count = sum(number for _, number in frequencies)
+    if not count:
+        return None
+    below = sum(number for score, number in frequencies if score < punctuation)
+    equal = sum(number for score, number in frequencies if score == punctuation)
+    return (below + equal / 2) / count * 100
+
+
+class CohortManager:
+    """
+    Score distribution of the modules across the finished assignments
+
+    The scores are the stored results of the assignments of patients who gave
+    consent, computed with the current scoring version of their questionnaire.
+    ``refresh_results.py`` stores the missing and outdated ones. The database
+    groups them by module and score, so only the frequency table of each
+    module is fetched whatever the size of the cohort. The frequency tables are
+    cached for ``cohort_cache_ttl`` seconds, a new finished assignment is
+    counted once they expire.
+    """
+
+    @staticmethod
+    def get_frequencies(
+        id_modules: list[int], filters: CohortFilters, session: Session
+    ) -> dict[int, list[tuple[int, int]]]:
+        """
+        Get the frequency table of the scores of several modules in one query
+
+        Returns
+        -------
+        dict[int, list[tuple[int, int]]]
+            Score and number of assignments with it of each module, sorted by
+            score
+        """
+        statement = (
+            select(
+                AssignmentResult.id_module,
+                AssignmentResult.punctuation,
+                func.count(),
+            )
+            .join(Assignment, Assignment.id == AssignmentResult.id_assignment)
+            .join(Patient, Patient.id_user == Assignment.id_patient)
+            .outerjoin(
+                ScoringVersion,
+                ScoringVersion.id_questionnaire == Assignment.id_questionnaire,
+            )
+            .where(AssignmentResult.id_module.in_(id_modules))
+            .where(Assignment.status == StatusQuestionnaire.finished)
+            .where(Patient.consent.is_(True))
+            # Results of older scoring rules are left out until refreshed
+            .where(
+                AssignmentResult.scoring_version
+                == func.coalesce(ScoringVersion.version, 0)
+            )
+            .group_by(AssignmentResult.id_module, AssignmentResult.punctuation)
+            .order_by(AssignmentResult.id_module, AssignmentResult.punctuation)
+        )
+        if filters.id_questionnaire is not None:
+            statement = statement.where(
+                Assignment.id_questionnaire == filters.id_questionnaire
+            )
+        for name in ("gender", "education_level", "region", "zone"):
+            value = getattr(filters, name)
+            if value is not None:
+                statement = statement.where(getattr(Patient, name) == value)
+        birth_year = extract("year", Patient.birth_date)
+        if filters.birth_year_from is not None:
+            statement = statement.where(birth_year >= filters.birth_year_from)
+        if filters.birth_year_to is not None:
+            statement = statement.where(birth_year <= filters.birth_year_to)
+
+        frequencies = {id_module: [] for id_module in id_modules}
+        for id_module, punctuation, number in session.exec(statement):
+            frequencies[id_module].append((punctuation, number))
+        return frequencies
+
+    @classmethod
+    def get_cached_frequencies(
+        cls, id_modules: list[int], filters: CohortFilters, session: Session
+    ) -> dict[int, list[tuple[int, int]]]:
+        key = filters.key()
+        values = cohort_cache.get_many(
+            [(id_module, key) for id_module in id_modules],
+            lambda missing: {
+                (id_module, key): frequencies
+                for id_module, frequencies in cls.get_frequencies(
+                    [id_module for id_module, _ in missing], filters, session=session
+                ).items()
+            },
+        )
+        return {id_module: values[(id_module, key)] for id_module in id_modules}
+
+    @classmethod
+    def get_module_cohort(
+        cls, id_module: int, filters: CohortFilters, bins: int, session: Session
+    ) -> dict:
+        """
+        Get the score statistics of a module
+
+        Parameters
+        ----------
+        id_module
+            Module id
+        filters
+            Demographics of the cohort
+        bins
+            Number of bins of the histogram
+
+        Returns
+        -------
+        dict
+            Statistics of the module, as ``ModuleCohort``
+        """
+        frequencies = cls.get_cached_frequencies([id_module], filters, session=session)
+        return {"id_module": id_module, **describe(frequencies[id_module], bins)}
+
+    @classmethod
+    def get_assignment_cohort(
+        cls, assignment: Assignment, filters: CohortFilters, bins: int, session: Session
+    ) -> list[dict]:
+        """
+        Compare the scores of an assignment with the cohort of each module
+
+        Returns
+        -------
+        list[dict]
+            Statistics of each module of the questionnaire of the assignment,
+            with the score of the assignment and its percentile rank
+        """
+        id_modules = session.exec(
+            select(QuestionnaireModuleLink.id_module)
+            .where(
+                QuestionnaireModuleLink.id_questionnaire == assignment.id_questionnaire
+            )
+            .order_by(QuestionnaireModuleLink.id_module)
+        ).all()
+        scores = dict(
+            session.exec(
+                select(AssignmentResult.id_module, AssignmentResult.punctuation).where(
+                    AssignmentResult.id_assignment == assignment.id
+                )
+            ).all()
+        )
+        frequencies = cls.get_cached_frequencies(id_modules, filters, session=session)
+        cohorts = []
+        for id_module in id_modules:
+            cohort = {"id_module": id_module, **describe(frequencies[id_module], bins)}
+            punctuation = scores.get(id_module)
+            if punctuation is not None:
+                cohort["punctuation"] = punctuation
+                cohort["percentile_rank"] = percentile_rank(
+                    frequencies[id_module], punctuation
+                )
+            cohorts.append(cohort)
+        return cohorts
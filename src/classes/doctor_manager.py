@@ -1,8 +1,18 @@
-from typing import List
+from typing import List, Optional
 
+from sqlalchemy.orm import contains_eager
 from sqlmodel import Session, select
 
-from src.models import Doctor, Patient, Assignment
+from src.classes.patient_manager import PatientManager
+from src.models import (
+    Doctor,
+    Patient,
+    Assignment,
+    ListParams,
+    User,
+    StatusQuestionnaire,
+)
+from src.utils.listing import Page, paginate
 
 
 class DoctorManager:
@@ -34,6 +44,52 @@ class DoctorManager:
             patients.append(assignment.patient)
         return patients
 
+    @staticmethod
+    def list_patients_output(
+        *,
+        doctor: Doctor,
+        params: ListParams = None,
+        status: Optional[StatusQuestionnaire] = None,
+        session: Session,
+    ) -> Page:
+        """
+        Get a page of the distinct patients of a doctor with their user fields
+
+        The patients and their users are read with a single joined query, the
+        cost depends on the page size and not on the assignments of the doctor.
+
+        Parameters
+        ----------
+        doctor : Doctor
+            Doctor
+        params : ListParams
+            Sort, page size and cursor of the listing
+        status : StatusQuestionnaire
+            Only patients with an assignment of the doctor in this status
+        session : Session
+            SQLAlchemy session
+
+        Returns
+        -------
+        Page
+            Patients of the page, total of patients and cursor of the next page
+
+        """
+        assigned = select(Assignment.id_patient).where(
+            Assignment.id_doctor == doctor.id_user
+        )
+        if status:
+            assigned = assigned.where(Assignment.status == status)
+        statement = (
+            select(Patient)
+            .join(User, User.email == Patient.id_user)
+            .options(contains_eager(Patient.user))
+            .where(Patient.id_user.in_(assigned))
+        )
+        page = paginate(statement, Patient, params, session=session)
+        page.items = [PatientManager.to_output(patient) for patient in page.items]
+        return page
+
     @staticmethod
     def get_doctor(id_doctor: str, session: Session) -> Doctor:
         """
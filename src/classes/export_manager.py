@@ -0,0 +1,383 @@
+import csv
+import hashlib
+import hmac
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Iterator, Optional
+
+import orjson
+from sqlalchemy import and_, extract, tuple_
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import Session, select
+
+from src.models import Answer, Assignment, OptionAnswer, Patient, Question
+from src.settings import get_settings
+from src.utils.listing import decode_cursor, encode_cursor
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    parquet = "parquet"
+    arrow = "arrow"
+
+
+# Formats written column by column with pyarrow
+COLUMNAR_FORMATS = {ExportFormat.parquet, ExportFormat.arrow}
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+
+
+def pseudonym(id_patient: str) -> str:
+    """
+    Stable pseudonym of a patient, the email never leaves the database
+    """
+    key = get_settings().token_secret.encode()
+    return hmac.new(key, id_patient.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def _enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+class Dataset:
+    """
+    Table of the export
+
+    Parameters
+    ----------
+    keys
+        Columns the rows are sorted by, the cursor of a row holds their values
+    fields
+        Name and type of each exported value, the type is a model column or a
+        Python type
+    statement
+        Select of the rows, called with the key values to start after
+    values
+        Exported values of a row, by field name
+    """
+
+    def __init__(
+        self,
+        keys: list,
+        fields: list[tuple[str, object]],
+        statement: Callable,
+        values: Callable,
+    ):
+        self.keys = keys
+        self.fields = fields
+        self.statement = statement
+        self.values = values
+
+    @property
+    def columns(self) -> list[str]:
+        return [name for name, _ in self.fields]
+
+
+def _answer_statement():
+    return (
+        select(
+            Answer.id_assignment,
+            Assignment.id_questionnaire,
+            Answer.id_question_module_id,
+            Answer.id_question_question_id,
+            Question.content,
+            Answer.id_option,
+            OptionAnswer.score,
+            Answer.open_answer,
+            Answer.date,
+            Assignment.status,
+            Assignment.id_patient,
+            Patient.gender,
+            Patient.education_level,
+            Patient.region,
+            Patient.zone,
+            extract("year", Patient.birth_date).label("birth_year"),
+            Patient.ci_barona,
+        )
+        .join(Assignment, Assignment.id == Answer.id_assignment)
+        .join(Patient, Patient.id_user == Assignment.id_patient)
+        .join(
+            Question,
+            and_(
+                Question.id == Answer.id_question_question_id,
+                Question.id_module == Answer.id_question_module_id,
+            ),
+        )
+        .outerjoin(OptionAnswer, OptionAnswer.id == Answer.id_option)
+        .where(Patient.consent.is_(True))
+    )
+
+
+def _demographics(row) -> dict:
+    return {
+        "gender": row.gender,
+        "education_level": row.education_level,
+        "region": row.region,
+        "zone": row.zone,
+        "birth_year": int(row.birth_year) if row.birth_year is not None else None,
+        "ci_barona": row.ci_barona,
+    }
+
+
+DEMOGRAPHIC_FIELDS = [
+    ("gender", Patient.gender),
+    ("education_level", Patient.education_level),
+    ("region", Patient.region),
+    ("zone", Patient.zone),
+    ("birth_year", int),
+    ("ci_barona", Patient.ci_barona),
+]
+
+# Every answer of a patient who gave consent, with the demographics of the
+# patient so a single file is enough for the CSV and NDJSON exports
+ANSWERS = Dataset(
+    keys=[
+        (Answer.id_assignment, False),
+        (Answer.id_question_question_id, False),
+        (Answer.id_question_module_id, False),
+    ],
+    fields=[
+        ("id_assignment", Answer.id_assignment),
+        ("id_questionnaire", Assignment.id_questionnaire),
+        ("id_module", Answer.id_question_module_id),
+        ("id_question", Answer.id_question_question_id),
+        ("question", Question.content),
+        ("id_option", Answer.id_option),
+        ("score", OptionAnswer.score),
+        ("open_answer", Answer.open_answer),
+        ("date", Answer.date),
+        ("status", str),
+        ("patient", str),
+        *DEMOGRAPHIC_FIELDS,
+    ],
+    statement=_answer_statement,
+    values=lambda row: {
+        "id_assignment": row.id_assignment,
+        "id_questionnaire": row.id_questionnaire,
+        "id_module": row.id_question_module_id,
+        "id_question": row.id_question_question_id,
+        "question": row.content,
+        "id_option": row.id_option,
+        "score": row.score,
+        "open_answer": row.open_answer,
+        "date": row.date,
+        "status": _enum_value(row.status),
+        "patient": pseudonym(row.id_patient),
+        **_demographics(row),
+    },
+)
+
+# Columnar exports keep the answers as a fact table, the demographics are in
+# the patient dimension joined by the pseudonym
+ANSWER_FACTS = Dataset(
+    keys=ANSWERS.keys,
+    fields=ANSWERS.fields[: -len(DEMOGRAPHIC_FIELDS)],
+    statement=_answer_statement,
+    values=ANSWERS.values,
+)
+
+PATIENTS = Dataset(
+    keys=[(Patient.id_user, False)],
+    fields=[("patient", str), *DEMOGRAPHIC_FIELDS],
+    statement=lambda: select(
+        Patient.id_user,
+        Patient.gender,
+        Patient.education_level,
+        Patient.region,
+        Patient.zone,
+        extract("year", Patient.birth_date).label("birth_year"),
+        Patient.ci_barona,
+    ).where(Patient.consent.is_(True)),
+    values=lambda row: {"patient": pseudonym(row.id_user), **_demographics(row)},
+)
+
+
+class _ChunkSink:
+    """
+    Output file of the pyarrow writers whose bytes are sent as they are written
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_schema(dataset: Dataset):
+    """
+    Arrow schema of a dataset, typed from the columns of the models
+    """
+    import pyarrow as pa
+
+    types = {
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        bool: pa.bool_(),
+        datetime: pa.timestamp("us"),
+    }
+    fields = []
+    for name, source in dataset.fields:
+        if isinstance(source, type):
+            python_type = source
+        else:
+            column_type = source.type
+            if isinstance(column_type, TypeDecorator):
+                # AutoString of SQLModel has no Python type, its String has
+                column_type = column_type.impl
+            python_type = column_type.python_type
+        if issubclass(python_type, Enum):
+            python_type = str
+        fields.append(pa.field(name, types[python_type]))
+    return pa.schema(fields)
+
+
+class ExportManager:
+    """
+    Research export of the answers and the patients who gave consent
+
+    The patients are identified by a pseudonym and only the birth year is
+    exported. Rows are sorted by the keys of the dataset and read through a
+    server-side cursor in chunks, so memory does not grow with the export. CSV
+    and NDJSON rows carry the cursor token that resumes the export after them.
+    """
+
+    @staticmethod
+    def decode_cursor(dataset: Dataset, cursor: Optional[str]) -> Optional[list]:
+        """
+        Get the key values of a cursor token
+
+        Raises
+        ------
+        InvalidCursor
+            If the token is not a cursor of the dataset
+        """
+        return decode_cursor(cursor, dataset.keys) if cursor else None
+
+    @staticmethod
+    def statement(dataset: Dataset, after: Optional[list] = None):
+        key_columns = [column for column, _ in dataset.keys]
+        statement = dataset.statement().order_by(*key_columns)
+        if after is not None:
+            # Row value comparison, resolved with the primary key index
+            statement = statement.where(tuple_(*key_columns) > tuple_(*after))
+        return statement
+
+    @classmethod
+    def iter_rows(
+        cls, dataset: Dataset, after: Optional[list], chunk_size: int, session: Session
+    ) -> Iterator[list]:
+        """
+        Read a dataset in chunks of ``chunk_size`` rows
+        """
+        result = session.exec(
+            cls.statement(dataset, after).execution_options(
+                stream_results=True, max_row_buffer=chunk_size
+            )
+        )
+        yield from result.partitions(chunk_size)
+
+    @staticmethod
+    def to_record(dataset: Dataset, row) -> dict:
+        values = dataset.values(row)
+        if isinstance(values.get("date"), datetime):
+            values["date"] = values["date"].isoformat()
+        return {"cursor": encode_cursor(row, dataset.keys), **values}
+
+    @classmethod
+    def stream(
+        cls,
+        dataset: Dataset,
+        export_format: ExportFormat,
+        after: Optional[list],
+        chunk_size: int,
+        engine,
+    ) -> Iterator[bytes]:
+        """
+        Render a dataset as CSV or NDJSON, one chunk of rows at a time
+
+        The session is opened here and lives as long as the response is being
+        sent, so it does not use the session of the request.
+        """
+        with Session(engine) as session:
+            if export_format == ExportFormat.csv:
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=["cursor", *dataset.columns])
+                writer.writeheader()
+                yield buffer.getvalue().encode()
+            for rows in cls.iter_rows(dataset, after, chunk_size, session=session):
+                records = [cls.to_record(dataset, row) for row in rows]
+                if export_format == ExportFormat.csv:
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(records)
+                    yield buffer.getvalue().encode()
+                else:
+                    yield b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+    @classmethod
+    def stream_columnar(
+        cls,
+        dataset: Dataset,
+        export_format: ExportFormat,
+        after: Optional[list],
+        row_group_size: int,
+        engine,
+    ) -> Iterator[bytes]:
+        """
+        Render a dataset as Parquet or as an Arrow IPC stream
+
+        Every chunk of ``row_group_size`` rows becomes an Arrow record batch,
+        written as one Parquet row group, and its bytes are sent before the
+        next chunk is read.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema(dataset)
+        sink = _ChunkSink()
+        output = pa.PythonFile(sink, mode="w")
+        if export_format == ExportFormat.parquet:
+            writer = pq.ParquetWriter(output, schema)
+        else:
+            writer = pa.ipc.new_stream(output, schema)
+        with Session(engine) as session, writer:
+            for rows in cls.iter_rows(dataset, after, row_group_size, session=session):
+                values = [dataset.values(row) for row in rows]
+                batch = pa.RecordBatch.from_pydict(
+                    {name: [value[name] for value in values] for name in schema.names},
+                    schema=schema,
+                )
+                if export_format == ExportFormat.parquet:
+                    writer.write_table(pa.Table.from_batches([batch]))
+                else:
+                    writer.write_batch(batch)
+                yield sink.drain()
+        yield sink.drain()
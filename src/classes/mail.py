@@ -6,7 +6,7 @@ from email.mime.application import MIMEApplication
 from jinja2 import Template
 
 from src.database import smtp_server, smtp_port, smtp_username, smtp_password
-from src.settings import FrontURL
+from src.settings import get_front_url
 
 
 class EmailManager:
@@ -64,7 +64,7 @@ class EmailManager:
         # Renderizar la plantilla con los valores personalizados
         subject = "Activación de cuenta en PsicoSalud"
         # Load url from .env
-        base = FrontURL().ACTIVATE_ACCOUNT_URL
+        base = get_front_url().ACTIVATE_ACCOUNT_URL
         url = base + f"?token={token}"
         content = template.render(url=url)
 
@@ -79,7 +79,7 @@ class EmailManager:
         # Renderizar la plantilla con los valores personalizados
         subject = "Restauración de contraseña en PsicoSalud"
         # Load url from .env
-        base = FrontURL().RESET_PASSWORD_URL
+        base = get_front_url().RESET_PASSWORD_URL
         url = base + f"?token={token}"
         content = template.render(url=url)
 
@@ -5,6 +5,7 @@ from fastapi import HTTPException
 from pydantic import BaseModel
 from sqlmodel import select
 from src.models import Module, Question
+from src.utils.structure_cache import detach, structure_cache
 
 ModuleNotFound = partial(HTTPException, status_code=404, detail="Module not found")
 
@@ -30,7 +31,12 @@ class ModuleManager:
         Module
             Object if module exists, None otherwise
         """
-        return session.exec(select(Module).where(Module.id == id_module)).first()
+
+        def load():
+            module = session.exec(select(Module).where(Module.id == id_module)).first()
+            return detach(module) if module else None
+
+        return structure_cache.get(("module", id_module), load, session=session)
 
     @classmethod
     def get_modules(cls, *, session) -> list[Module]:
@@ -67,8 +73,15 @@ class ModuleManager:
 
         if module:
             # Fetch the associated questions for the module
-            return session.exec(
-                select(Question).where(Question.id_module == id_module)
-            ).all()
+            return structure_cache.get(
+                ("module_questions", id_module),
+                lambda: [
+                    detach(question)
+                    for question in session.exec(
+                        select(Question).where(Question.id_module == id_module)
+                    ).all()
+                ],
+                session=session,
+            )
 
         raise ModuleNotFound()
@@ -1,13 +1,23 @@
 from datetime import datetime
+from typing import Optional
 
 from pydantic import EmailStr
-from sqlmodel import Session, select
+from sqlalchemy import Integer, and_, case, cast, extract, update
+from sqlmodel import Session, SQLModel, select
 
 from src.models import (
     Patient,
     PatientOutput,
     User,
+    BaronaInput,
+    Assignment,
+    ListParams,
 )
+from src.utils.listing import Page, paginate
+
+
+class BaronaRefresh(SQLModel):
+    updated: int
 
 
 class PatientManager:
@@ -55,17 +65,57 @@ class PatientManager:
     def get_patient_output(cls, id_patient, session: Session) -> PatientOutput:
         patient = cls.get_patient(id_patient, session=session)
         if patient:
-            # Serialize as PatientOutput with the date from user inside the patient
-            data = PatientOutput(**patient.__dict__)
-            data.email = patient.user.email
-            data.name = patient.user.name
-            data.last_name = patient.user.last_name
-            return data
+            return cls.to_output(patient)
+
+    @staticmethod
+    def to_output(patient: Patient) -> PatientOutput:
+        # Serialize as PatientOutput with the date from user inside the patient
+        return PatientOutput(
+            **patient.dict(),
+            email=patient.user.email,
+            name=patient.user.name,
+            last_name=patient.user.last_name,
+        )
+
+    @classmethod
+    def update_demographics(
+        cls, id_patient, data: BaronaInput, session: Session
+    ) -> Patient:
+        patient = cls.get_patient(id_patient, session=session)
+        values = {
+            "gender": data.gender,
+            "birth_date": data.age,
+            "education_level": data.education_level,
+            "region": data.region,
+            "zone": data.zone,
+        }
+        if any(getattr(patient, name) != value for name, value in values.items()):
+            # Computed again on the next read
+            patient.has_ci_barona = False
+            patient.ci_barona = None
+        for name, value in values.items():
+            setattr(patient, name, value)
+        session.add(patient)
+        session.commit()
+        return patient
 
     @classmethod
     def get_assignments(cls, id_patient, session):
         return cls.get_patient(id_patient, session=session).assignments
 
+    @classmethod
+    def list_assignments(cls, id_patient, params: ListParams, session) -> Page:
+        """
+        Get a page of the assignments of a patient
+
+        Returns
+        -------
+        Page
+            Assignments of the page, total and cursor of the next page
+        """
+        statement = select(Assignment).where(Assignment.id_patient == id_patient)
+        return paginate(statement, Assignment, params, session=session)
+
     @classmethod
     def get_ci_barona(cls, id_patient, session):
         patient = cls.get_patient(id_patient, session=session)
@@ -89,29 +139,98 @@ class PatientManager:
                 # Range of age
                 age_level = _get_age_group(age)
 
-                if age <= 65:
-                    ci = (
-                        75.927
-                        + (15.519 * patient.education_level)
-                        + (4.260 * age_level)
-                        - (2.050 * patient.region)
-                        - (3.3793 * patient.gender)
-                        - (1.838 * patient.zone)
-                    )
-                else:
-                    ci = (
-                        63.488
-                        + (13.015 * patient.education_level)
-                        + (28.568 * age_level)
-                        - (1.647 * age)
-                        - (6.642 * patient.gender)
-                    )
+                young, old = _barona(
+                    patient.education_level,
+                    age_level,
+                    age,
+                    patient.region,
+                    patient.gender,
+                    patient.zone,
+                )
+                ci = young if age <= 65 else old
                 patient.has_ci_barona = True
                 patient.ci_barona = ci
                 session.add(patient)
                 session.commit()
+                return ci
         return None
 
+    @staticmethod
+    def refresh_ci_barona(session: Session, year: Optional[int] = None) -> int:
+        """
+        Compute the CI Barona of every patient with complete demographics
+
+        A single ``UPDATE`` evaluates the formula in the database, the patients
+        are not loaded. Run it to refresh the values stored before a change of
+        the formula or as the patients get older.
+
+        Parameters
+        ----------
+        year
+            Year the ages are computed at, the current one by default
+
+        Returns
+        -------
+        int
+            Number of patients updated
+        """
+        year = year or datetime.now().year
+        age = year - cast(extract("year", Patient.birth_date), Integer)
+        age_level = case(
+            (age < 19, 1),
+            (age <= 24, 2),
+            (age <= 34, 3),
+            (age <= 54, 4),
+            (age <= 69, 5),
+            else_=6,
+        )
+        young, old = _barona(
+            Patient.education_level,
+            age_level,
+            age,
+            Patient.region,
+            Patient.gender,
+            Patient.zone,
+        )
+        # Same checks as get_ci_barona, a NULL compared to 0 leaves the row out
+        complete = and_(
+            Patient.birth_date.is_not(None),
+            Patient.gender != 0,
+            Patient.education_level != 0,
+            Patient.region != 0,
+            Patient.zone != 0,
+        )
+        result = session.execute(
+            update(Patient)
+            .where(complete)
+            .values(ci_barona=case((age <= 65, young), else_=old), has_ci_barona=True)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return result.rowcount
+
+
+def _barona(education_level, age_level, age, region, gender, zone):
+    """
+    CI Barona up to 65 years old and over 65, of numbers or of SQL expressions
+    """
+    young = (
+        75.927
+        + (15.519 * education_level)
+        + (4.260 * age_level)
+        - (2.050 * region)
+        - (3.3793 * gender)
+        - (1.838 * zone)
+    )
+    old = (
+        63.488
+        + (13.015 * education_level)
+        + (28.568 * age_level)
+        - (1.647 * age)
+        - (6.642 * gender)
+    )
+    return young, old
+
 
 def _get_age_group(age):
     if age < 19:
@@ -1,14 +1,9 @@
-from enum import Enum
+from collections import defaultdict
 
 from sqlmodel import Session, select, SQLModel
 
-from src.models import Question, OptionAnswer
-
-
-class QuestionType(str, Enum):
-    YN = "YesNo"
-    MULTIPLE = "multiple"
-    TEXT = "text"
+from src.models import Question, OptionAnswer, QuestionType
+from src.utils.structure_cache import detach, structure_cache
 
 
 class QuestionOption(SQLModel):
@@ -16,15 +11,19 @@ class QuestionOption(SQLModel):
     options: list[OptionAnswer] or None
 
 
+class ModuleQuestionOption(QuestionOption):
+    id_question: int
+
+
 class QuestionManager:
     @classmethod
     def get_question(
         cls, id_question: int, id_module: int, session: Session
     ) -> Question:
         return session.exec(
-            select(Question).where(
-                Question.id == id_question and Question.id_module == id_module
-            )
+            select(Question)
+            .where(Question.id == id_question)
+            .where(Question.id_module == id_module)
         ).first()
 
     @classmethod
@@ -37,14 +36,59 @@ class QuestionManager:
     def get_question_options(
         cls, id_question: int, id_module: int, session: Session
     ) -> QuestionOption or None:
-        question = cls.get_question(id_question, id_module, session=session)
-        if question:
-            options = question.options
-            type_opt = QuestionType.TEXT
-            if len(options) == 2:
-                type_opt = QuestionType.YN
-            elif len(options) > 2:
-                type_opt = QuestionType.MULTIPLE
-            return QuestionOption(type_opt=type_opt, options=options)
-        else:
-            return None
+        def load():
+            question = cls.get_question(id_question, id_module, session=session)
+            if question:
+                return QuestionOption(
+                    type_opt=question.type_opt,
+                    options=[detach(option) for option in question.options],
+                )
+            else:
+                return None
+
+        return structure_cache.get(
+            ("question_options", id_module, id_question), load, session=session
+        )
+
+    @classmethod
+    def get_module_question_options(
+        cls, id_module: int, session: Session
+    ) -> list[ModuleQuestionOption]:
+        """
+        Get the type and the options of every question of a module with one
+        query
+
+        Returns
+        -------
+        list[ModuleQuestionOption]
+            Type and options of each question, in the order of the questions
+        """
+
+        def load():
+            rows = session.exec(
+                select(Question.id, Question.type_opt, OptionAnswer)
+                .outerjoin(
+                    OptionAnswer,
+                    (OptionAnswer.id_question_module_id == Question.id_module)
+                    & (OptionAnswer.id_question_question_id == Question.id),
+                )
+                .where(Question.id_module == id_module)
+                .order_by(Question.id, OptionAnswer.id)
+            ).all()
+            types, options = {}, defaultdict(list)
+            for id_question, type_opt, option in rows:
+                types[id_question] = type_opt
+                if option:
+                    options[id_question].append(detach(option))
+            return [
+                ModuleQuestionOption(
+                    id_question=id_question,
+                    type_opt=type_opt,
+                    options=options[id_question],
+                )
+                for id_question, type_opt in types.items()
+            ]
+
+        return structure_cache.get(
+            ("module_question_options", id_module), load, session=session
+        )
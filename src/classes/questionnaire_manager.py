@@ -1,10 +1,20 @@
+from collections import defaultdict
+from datetime import datetime
 from typing import Optional, List
 
 from pydantic import Field
 from sqlmodel import Session, select, SQLModel
 
 from src.classes.modules_manager import ModuleManager
-from src.models import Questionnaire, QuestionnaireModuleLink, Module
+from src.models import (
+    Module,
+    OptionAnswer,
+    Question,
+    Questionnaire,
+    QuestionnaireModuleLink,
+    QuestionType,
+)
+from src.utils.structure_cache import detach, structure_cache
 
 
 class QuestionnaireInput(SQLModel):
@@ -13,6 +23,32 @@ class QuestionnaireInput(SQLModel):
     modules: List[Module] = Field(default=None)
 
 
+class QuestionBundle(SQLModel):
+    id: int
+    id_module: int
+    content: Optional[str]
+    parent_question_id_question: Optional[int]
+    parent_question_id_module: Optional[int]
+    type_opt: QuestionType
+    options: List[OptionAnswer]
+
+
+class ModuleBundle(SQLModel):
+    id: int
+    title: Optional[str]
+    description: Optional[str]
+    questions: List[QuestionBundle]
+
+
+class QuestionnaireBundle(SQLModel):
+    id: int
+    title: Optional[str]
+    description: Optional[str]
+    created_at: datetime
+    created_by: Optional[str]
+    modules: List[ModuleBundle]
+
+
 class QuestionnaireManager:
     @staticmethod
     def get_questionnaires(session: Session) -> list[Questionnaire]:
@@ -43,23 +79,106 @@ class QuestionnaireManager:
 
         session.commit()
         session.refresh(questionnaire)
+        structure_cache.invalidate(
+            ("questionnaire", questionnaire.id),
+            ("questionnaire_modules", questionnaire.id),
+            ("questionnaire_bundle", questionnaire.id),
+        )
         return questionnaire
 
     @staticmethod
     def get_modules_from_questionnaire(
         id_questionnaire: int, session: Session
     ) -> list[Module]:
-        return [
-            ModuleManager.get_module(link.id_module, session=session)
-            for link in session.exec(
-                select(QuestionnaireModuleLink).where(
-                    QuestionnaireModuleLink.id_questionnaire == id_questionnaire
-                )
-            ).all()
-        ]
+        return structure_cache.get(
+            ("questionnaire_modules", id_questionnaire),
+            lambda: [
+                detach(module)
+                for module in session.exec(
+                    select(Module)
+                    .join(
+                        QuestionnaireModuleLink,
+                        QuestionnaireModuleLink.id_module == Module.id,
+                    )
+                    .where(QuestionnaireModuleLink.id_questionnaire == id_questionnaire)
+                ).all()
+            ],
+            session=session,
+        )
 
     @staticmethod
     def get_questionnaire(id_questionnaire: int, session: Session) -> Questionnaire:
-        return session.exec(
-            select(Questionnaire).where(Questionnaire.id == id_questionnaire)
-        ).first()
+        def load():
+            questionnaire = session.exec(
+                select(Questionnaire).where(Questionnaire.id == id_questionnaire)
+            ).first()
+            return detach(questionnaire) if questionnaire else None
+
+        return structure_cache.get(
+            ("questionnaire", id_questionnaire), load, session=session
+        )
+
+    @staticmethod
+    def get_bundle(
+        id_questionnaire: int, session: Session
+    ) -> Optional[QuestionnaireBundle]:
+        """
+        Get a questionnaire with its modules, questions, options and question
+        types, everything needed to render it
+
+        Loaded with four queries whatever the size of the questionnaire, and
+        cached with the questionnaire structure.
+
+        Returns
+        -------
+        QuestionnaireBundle | None
+            Questionnaire bundle, None if the questionnaire does not exist
+        """
+
+        def load():
+            questionnaire = session.get(Questionnaire, id_questionnaire)
+            if not questionnaire:
+                return None
+            modules = session.exec(
+                select(Module)
+                .join(
+                    QuestionnaireModuleLink,
+                    QuestionnaireModuleLink.id_module == Module.id,
+                )
+                .where(QuestionnaireModuleLink.id_questionnaire == id_questionnaire)
+                .order_by(Module.id)
+            ).all()
+            module_ids = [module.id for module in modules]
+            questions = session.exec(
+                select(Question)
+                .where(Question.id_module.in_(module_ids))
+                .order_by(Question.id_module, Question.id)
+            ).all()
+            options = defaultdict(list)
+            for option in session.exec(
+                select(OptionAnswer)
+                .where(OptionAnswer.id_question_module_id.in_(module_ids))
+                .order_by(OptionAnswer.id)
+            ).all():
+                options[
+                    (option.id_question_module_id, option.id_question_question_id)
+                ].append(detach(option))
+            module_questions = defaultdict(list)
+            for question in questions:
+                module_questions[question.id_module].append(
+                    QuestionBundle(
+                        **question.dict(),
+                        options=options[(question.id_module, question.id)],
+                    )
+                )
+            return QuestionnaireBundle(
+                **questionnaire.dict(),
+                modules=[
+                    ModuleBundle(**module.dict(), questions=module_questions[module.id])
+                    for module in modules
+                ],
+            )
+
+        return structure_cache.get(
+            ("questionnaire_bundle", id_questionnaire), load, session=session
+        )
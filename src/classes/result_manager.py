@@ -0,0 +1,189 @@
+from typing import Optional
+
+from sqlalchemy import exists, func, or_
+from sqlmodel import Session, select
+
+from src.classes.scoring_manager import ScoringManager
+from src.models import (
+    Assignment,
+    AssignmentResult,
+    ScoringVersion,
+    StatusQuestionnaire,
+)
+from src.utils.structure_cache import structure_cache
+from src.utils.upsert import upsert
+
+
+class ResultManager:
+    """
+    Stored analytics of the assignments
+
+    The analytics of every module are stored in ``assignment_result`` with the
+    scoring version of the questionnaire they were computed with. They are
+    served from there while the version is current, a change of the scoring
+    rules of one questionnaire does not touch the results of the others. A
+    draft assignment updates the result of a module when one of its answers
+    changes.
+    """
+
+    @staticmethod
+    def get_scoring_version(id_questionnaire: int, session: Session) -> int:
+        scoring_version = session.get(ScoringVersion, id_questionnaire)
+        return scoring_version.version if scoring_version else 0
+
+    @staticmethod
+    def get_results(id_assignment: int, session: Session) -> list[AssignmentResult]:
+        return session.exec(
+            select(AssignmentResult)
+            .where(AssignmentResult.id_assignment == id_assignment)
+            .order_by(AssignmentResult.position)
+        ).all()
+
+    @classmethod
+    def get_analytics(cls, assignment: Assignment, session: Session) -> list[dict]:
+        """
+        Get the analytics of an assignment from its stored results
+
+        The results are computed and stored first when they are missing or
+        were computed with an older scoring version.
+
+        Returns
+        -------
+        list[dict]
+            Analytics of each module of the questionnaire of the assignment
+        """
+        version = cls.get_scoring_version(assignment.id_questionnaire, session=session)
+        results = cls.get_results(assignment.id, session=session)
+        if results and all(result.scoring_version == version for result in results):
+            return [result.as_analytics() for result in results]
+        analytics = cls.refresh(assignment, session=session)
+        session.commit()
+        return analytics
+
+    @classmethod
+    def refresh(
+        cls, assignment: Assignment, session: Session, id_module: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Compute and store the results of an assignment, in the transaction of
+        the caller, which commits them
+
+        The results are upserted, a result stored meanwhile by a concurrent
+        refresh of the same assignment is replaced instead of failing the
+        transaction.
+
+        Parameters
+        ----------
+        assignment
+            Assignment to score
+        id_module
+            Only recompute this module, when the other results are current
+
+        Returns
+        -------
+        list[dict]
+            Analytics of each module of the questionnaire of the assignment
+        """
+        version = cls.get_scoring_version(assignment.id_questionnaire, session=session)
+        # Read the structure version again, so the outputs scored are not older
+        # than the scoring version the results are stored with
+        structure_cache.version(session, fresh=True)
+        results = {
+            result.id_module: result
+            for result in cls.get_results(assignment.id, session=session)
+        }
+        positions = {
+            module.id: (position, module)
+            for position, module in enumerate(assignment.questionnaire.modules)
+        }
+        partial = (
+            id_module in positions
+            and results.keys() == positions.keys()
+            and all(result.scoring_version == version for result in results.values())
+        )
+        if partial:
+            targets = [positions[id_module]]
+        else:
+            targets = list(positions.values())
+            for id_stale in results.keys() - positions.keys():
+                session.delete(results.pop(id_stale))
+
+        analytics = ScoringManager.score_modules(
+            assignment, [module for _, module in targets], session=session
+        )
+        rows = []
+        for (position, module), module_analytics in zip(targets, analytics):
+            if module.id in results:
+                # Replaced by the upsert
+                session.expire(results[module.id])
+            results[module.id] = AssignmentResult(
+                id_assignment=assignment.id,
+                id_module=module.id,
+                position=position,
+                title=module_analytics["module"],
+                punctuation=module_analytics["diagnostic"]["punctuation"],
+                diagnostic=module_analytics["diagnostic"]["diagnostic"],
+                observations=module_analytics["observations"],
+                scoring_version=version,
+            )
+            rows.append(results[module.id].dict())
+        session.flush()
+        if rows:
+            # Two first views or autosaves of an assignment can store its
+            # results at the same time, the last one wins
+            statement = upsert(session, AssignmentResult).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=[
+                    AssignmentResult.id_assignment,
+                    AssignmentResult.id_module,
+                ],
+                set_={
+                    column: getattr(statement.excluded, column)
+                    for column in rows[0]
+                    if column not in ("id_assignment", "id_module")
+                },
+            )
+            session.execute(statement)
+        return [
+            result.as_analytics()
+            for result in sorted(results.values(), key=lambda result: result.position)
+        ]
+
+    @classmethod
+    def refresh_finished(cls, session: Session, batch_size: int = 100) -> int:
+        """
+        Store the results of the finished assignments that have none, such as
+        the ones finished before the results were stored, or that were computed
+        with an older scoring version
+
+        The cohort statistics only count current results. Each batch of
+        assignments is committed on its own.
+
+        Returns
+        -------
+        int
+            Number of assignments refreshed
+        """
+        current = func.coalesce(ScoringVersion.version, 0)
+        results = exists().where(AssignmentResult.id_assignment == Assignment.id)
+        id_assignments = session.exec(
+            select(Assignment.id)
+            .outerjoin(
+                ScoringVersion,
+                ScoringVersion.id_questionnaire == Assignment.id_questionnaire,
+            )
+            .where(Assignment.status == StatusQuestionnaire.finished)
+            .where(
+                or_(
+                    ~results,
+                    results.where(AssignmentResult.scoring_version != current),
+                )
+            )
+            .order_by(Assignment.id)
+        ).all()
+        for index, id_assignment in enumerate(id_assignments, start=1):
+            cls.refresh(session.get(Assignment, id_assignment), session=session)
+            if index % batch_size == 0:
+                session.commit()
+        session.commit()
+        return len(id_assignments)
@@ -0,0 +1,226 @@
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from src.classes.assignment_manager import get_operation
+from src.models import (
+    Answer,
+    Assignment,
+    Module,
+    ModuleOutputLink,
+    OptionAnswer,
+    Output,
+    QuestionOutputLink,
+)
+from src.utils.structure_cache import detach, structure_cache
+
+
+class ScoringManager:
+    """
+    Score assignments with a fixed number of queries
+
+    The scores are read with aggregate queries over ``answer`` joined to
+    ``option_answer`` and the ``Output`` rules are evaluated in memory, so the
+    cost does not grow with the number of modules or questions.
+    """
+
+    @staticmethod
+    def get_module_scores(
+        id_assignment: int, module_ids: list[int], session: Session
+    ) -> dict[int, int]:
+        """
+        Get the sum of the option scores of each module of an assignment
+
+        Returns
+        -------
+        dict[int, int]
+            Score of each module id with answers
+        """
+        rows = session.exec(
+            select(
+                Answer.id_question_module_id,
+                func.coalesce(func.sum(OptionAnswer.score), 0),
+            )
+            .join(OptionAnswer, OptionAnswer.id == Answer.id_option)
+            .where(Answer.id_assignment == id_assignment)
+            .where(Answer.id_question_module_id.in_(module_ids))
+            .group_by(Answer.id_question_module_id)
+        ).all()
+        return {id_module: int(score) for id_module, score in rows}
+
+    @staticmethod
+    def get_question_scores(
+        id_assignment: int, module_ids: list[int], session: Session
+    ) -> dict[tuple[int, int], int]:
+        """
+        Get the score of the option answered to each question of an assignment
+
+        Returns
+        -------
+        dict[tuple[int, int], int]
+            Score of each (module id, question id) answered with an option
+        """
+        rows = session.exec(
+            select(
+                Answer.id_question_module_id,
+                Answer.id_question_question_id,
+                OptionAnswer.score,
+            )
+            .join(OptionAnswer, OptionAnswer.id == Answer.id_option)
+            .where(Answer.id_assignment == id_assignment)
+            .where(Answer.id_question_module_id.in_(module_ids))
+        ).all()
+        return {
+            (id_module, id_question): score for id_module, id_question, score in rows
+        }
+
+    @staticmethod
+    def get_module_outputs(
+        module_ids: list[int], session: Session
+    ) -> dict[int, list[Output]]:
+        """
+        Get the outputs of many modules, in the order they were linked
+        """
+
+        def load(missing: list[int]) -> dict[int, list[Output]]:
+            rows = session.exec(
+                select(ModuleOutputLink.id_module, Output)
+                .join(Output, Output.id == ModuleOutputLink.id_output)
+                .where(ModuleOutputLink.id_module.in_(missing))
+                .order_by(ModuleOutputLink.id)
+            ).all()
+            outputs = defaultdict(list)
+            for id_module, output in rows:
+                outputs[id_module].append(detach(output))
+            return outputs
+
+        return structure_cache.get_many(
+            "module_outputs", module_ids, load, [], session=session
+        )
+
+    @staticmethod
+    def get_question_outputs(
+        module_ids: list[int], session: Session
+    ) -> dict[int, list[tuple[int, list[Output]]]]:
+        """
+        Get the outputs of the questions of many modules
+
+        Returns
+        -------
+        dict[int, list[tuple[int, list[Output]]]]
+            Question ids with outputs of each module and their outputs, in the
+            order of the questions
+        """
+
+        def load(missing: list[int]) -> dict[int, list[tuple[int, list[Output]]]]:
+            rows = session.exec(
+                select(
+                    QuestionOutputLink.id_question_module_id,
+                    QuestionOutputLink.id_question_question_id,
+                    Output,
+                )
+                .join(Output, Output.id == QuestionOutputLink.id_output)
+                .where(QuestionOutputLink.id_question_module_id.in_(missing))
+                .order_by(
+                    QuestionOutputLink.id_question_question_id, QuestionOutputLink.id
+                )
+            ).all()
+            outputs = defaultdict(dict)
+            for id_module, id_question, output in rows:
+                outputs[id_module].setdefault(id_question, []).append(detach(output))
+            return {
+                id_module: list(questions.items())
+                for id_module, questions in outputs.items()
+            }
+
+        return structure_cache.get_many(
+            "question_outputs", module_ids, load, [], session=session
+        )
+
+    @classmethod
+    def get_analytics(cls, assignment: Assignment, session: Session) -> list[dict]:
+        """
+        Get the punctuation, diagnostic and observations of every module
+
+        Parameters
+        ----------
+        assignment
+            Assignment to score
+
+        Returns
+        -------
+        list[dict]
+            Analytics of each module of the questionnaire of the assignment
+        """
+        return cls.score_modules(
+            assignment, assignment.questionnaire.modules, session=session
+        )
+
+    @classmethod
+    def score_modules(
+        cls, assignment: Assignment, modules: list[Module], session: Session
+    ) -> list[dict]:
+        """
+        Get the punctuation, diagnostic and observations of some modules
+
+        Parameters
+        ----------
+        assignment
+            Assignment to score
+        modules
+            Modules of the questionnaire to score
+
+        Returns
+        -------
+        list[dict]
+            Analytics of each module, in the same order
+        """
+        module_ids = [module.id for module in modules]
+        module_scores = cls.get_module_scores(
+            assignment.id, module_ids, session=session
+        )
+        question_scores = cls.get_question_scores(
+            assignment.id, module_ids, session=session
+        )
+        module_outputs = cls.get_module_outputs(module_ids, session=session)
+        question_outputs = cls.get_question_outputs(module_ids, session=session)
+
+        resume = []
+        for module in modules:
+            punctuation = module_scores.get(module.id, 0)
+            diagnostic = []
+            if module_outputs.get(module.id):
+                diagnostic.append(
+                    [
+                        output.text
+                        for output in module_outputs[module.id]
+                        if get_operation(
+                            output.condition_type, output.condition_value, punctuation
+                        )
+                    ]
+                )
+            observations = []
+            for id_question, outputs in question_outputs.get(module.id, []):
+                score = question_scores.get((module.id, id_question))
+                if score is None:
+                    # Not answered, or answered without an option
+                    continue
+                observations.extend(
+                    output.text
+                    for output in outputs
+                    if get_operation(
+                        output.condition_type, output.condition_value, score
+                    )
+                )
+            resume.append(
+                {
+                    "module": module.title,
+                    "diagnostic": {
+                        "punctuation": punctuation,
+                        "diagnostic": diagnostic,
+                    },
+                    "observations": observations,
+                }
+            )
+        return resume
@@ -1,14 +1,17 @@
 from functools import partial
-from typing import Any
 
-import jwt
 from fastapi import HTTPException
 from psycopg2 import IntegrityError
-from sqlalchemy import desc, asc
 from sqlmodel import select
 
 from src.models import User, Patient, UserRoles, Doctor, Admin, StatusUser, ListParams
-from src.settings import Settings
+from src.settings import get_settings, get_key_ring
+from src.utils.hashing import UNUSABLE_PASSWORD
+from src.utils.listing import Page, paginate
+from src.utils.token_versions import TokenVersions
+
+# Current token version of the users, to check access tokens without a query
+token_versions = TokenVersions(ttl=get_settings().token_version_ttl)
 
 # Create an exception for when a user is not found
 UserNotFound = partial(HTTPException, status_code=404, detail="User not found")
@@ -18,6 +21,72 @@ UserAlreadyExists = partial(
 )
 
 
+class Principal:
+    """
+    Authenticated user of a request with its role memberships
+
+    It is resolved once per request by ``get_principal`` and shared by every
+    authorization dependency and router of the request. When it comes from the
+    claims of an access token only the email and the roles are known, the rows
+    are loaded on demand.
+    """
+
+    def __init__(
+        self,
+        email: str,
+        roles,
+        user: User = None,
+        doctor: Doctor = None,
+        patient: Patient = None,
+    ):
+        self.email = email
+        self.roles = frozenset(roles)
+        self.user = user
+        self.doctor = doctor
+        self.patient = patient
+
+    @classmethod
+    def from_rows(
+        cls, user: User, admin: Admin = None, doctor: Doctor = None, patient=None
+    ) -> "Principal":
+        rows = {
+            UserRoles.admin.name: admin,
+            UserRoles.doctor.name: doctor,
+            UserRoles.patient.name: patient,
+        }
+        roles = [role for role, row in rows.items() if row is not None]
+        return cls(user.email, roles, user=user, doctor=doctor, patient=patient)
+
+    @property
+    def is_admin(self) -> bool:
+        return UserRoles.admin.name in self.roles
+
+    @property
+    def is_doctor(self) -> bool:
+        return UserRoles.doctor.name in self.roles
+
+    @property
+    def is_patient(self) -> bool:
+        return UserRoles.patient.name in self.roles
+
+    @property
+    def role(self) -> UserRoles:
+        """
+        Main role of the user, with the same precedence as ``get_role_user``
+        """
+        if self.is_doctor:
+            return UserRoles.doctor
+        if self.is_admin:
+            return UserRoles.admin
+        if self.is_patient:
+            return UserRoles.patient
+        return UserRoles.user
+
+
+def _bump_token_version(user: User):
+    user.token_version = (user.token_version or 0) + 1
+
+
 def _set_role(user, role_model, role_name, *, session):
     user_role = role_model(id_user=user.email)
     existing_role = session.exec(
@@ -25,9 +94,11 @@ def _set_role(user, role_model, role_name, *, session):
     ).first()
     if not existing_role:
         user.status = StatusUser.active
+        _bump_token_version(user)
         session.add(user)
         session.add(user_role)
         session.commit()
+        token_versions.set(user.email, user.token_version)
     else:
         raise UserNotFound()
 
@@ -37,6 +108,7 @@ class UserManager:
     def delete_user(cls, user: User, *, session):
         session.delete(user)
         session.commit()
+        token_versions.set(user.email, None)
 
     @classmethod
     def get_user(cls, email: str, *, session) -> User:
@@ -53,6 +125,88 @@ class UserManager:
         """
         return session.exec(select(User).where(User.email == email)).first()
 
+    @classmethod
+    def get_principal(cls, email: str, *, session) -> Principal | None:
+        """
+        Get the user and all its role memberships with a single query
+
+        Parameters
+        ----------
+        email
+            User email address
+
+        Returns
+        -------
+        Principal
+            Principal of the user if user exists, None otherwise
+        """
+        row = session.exec(
+            select(User, Admin, Doctor, Patient)
+            .outerjoin(Admin, Admin.id_user == User.email)
+            .outerjoin(Doctor, Doctor.id_user == User.email)
+            .outerjoin(Patient, Patient.id_user == User.email)
+            .where(User.email == email)
+        ).first()
+        if not row:
+            return None
+        return Principal.from_rows(*row)
+
+    @classmethod
+    def get_roles(cls, emails: list[str], *, session) -> dict[str, UserRoles]:
+        """
+        Get the main role of many users with a single query
+
+        Parameters
+        ----------
+        emails
+            User email addresses
+
+        Returns
+        -------
+        dict[str, UserRoles]
+            Main role of each user, with the precedence of ``get_role_user``
+        """
+        if not emails:
+            return {}
+        rows = session.exec(
+            select(User.email, Admin.id_user, Doctor.id_user, Patient.id_user)
+            .outerjoin(Admin, Admin.id_user == User.email)
+            .outerjoin(Doctor, Doctor.id_user == User.email)
+            .outerjoin(Patient, Patient.id_user == User.email)
+            .where(User.email.in_(emails))
+        ).all()
+        roles = {}
+        for email, admin, doctor, patient in rows:
+            memberships = {
+                UserRoles.admin.name: admin,
+                UserRoles.doctor.name: doctor,
+                UserRoles.patient.name: patient,
+            }
+            principal = Principal(
+                email, [role for role, row in memberships.items() if row is not None]
+            )
+            roles[email] = principal.role
+        return roles
+
+    @classmethod
+    def get_token_version(cls, email: str, *, session) -> int | None:
+        """
+        Get the current token version of a user
+
+        Parameters
+        ----------
+        email
+            User email address
+
+        Returns
+        -------
+        int
+            Token version if user exists, None otherwise
+        """
+        return session.exec(
+            select(User.token_version).where(User.email == email)
+        ).first()
+
     @classmethod
     def activate_pending_user(cls, email: str, *, session):
         """
@@ -85,7 +239,7 @@ class UserManager:
     def create_user(
         cls,
         email,
-        password="temp",
+        hashed_password=UNUSABLE_PASSWORD,
         name=None,
         last_name=None,
         status=StatusUser.disabled,
@@ -98,14 +252,14 @@ class UserManager:
         Parameters
         ----------
         email   :   User email address
-        password: User password
+        hashed_password: User password hashed by the password hasher, invited
+            users get an unusable password until they activate the account
         name : Username
         last_name: User last name
         status: User status
 
         """
         try:
-            hashed_password = User.hash_password(password)
             user = User(
                 email=email,
                 hashed_password=hashed_password,
@@ -124,37 +278,52 @@ class UserManager:
             raise HTTPException(status_code=400, detail=f"Error creating user: {e}")
 
     @classmethod
-    def activate_user_to_patient(cls, data, *, session):
-        email = jwt.decode(data.token, Settings().token_secret, algorithms=["HS256"])[
-            "email"
-        ]
+    def get_user_to_activate(cls, token: str, *, session) -> User:
+        """
+        Get the user an activation token belongs to, checked before the
+        password of the account is hashed
+
+        Raises
+        ------
+        HTTPException
+            If the token is not the current token of the user, or the user is
+            already active or a patient
+        """
+        email = get_key_ring().decode(token)["email"]
         user = session.exec(select(User).where(User.email == email)).first()
+        if not user or user.token != token:
+            raise HTTPException(status_code=400, detail="Invalid token")
         existing_patient = session.exec(
             select(Patient).where(Patient.id_user == user.email)
         ).first()
-        if user.token != data.token:
-            raise HTTPException(status_code=400, detail="Invalid token")
-        if user and user.status == StatusUser.disabled and not existing_patient:
-            user.status = StatusUser.active
-            user.name = data.name if data.name else None
-            user.last_name = data.last_name if data.last_name else None
-            user.hashed_password = User.hash_password(data.password)
-            user.token = None
-            session.add(user)
-            # Check if is an admin or doctor
-            is_doctor = session.exec(
-                select(Doctor).where(Doctor.id_user == user.email)
-            ).first()
-            is_admin = session.exec(
-                select(Admin).where(Admin.id_user == user.email)
-            ).first()
-            if not is_doctor and not is_admin:
-                patient = Patient(id_user=user.email)
-                session.add(patient)
-                session.commit()
+        if user.status != StatusUser.disabled or existing_patient:
+            raise HTTPException(status_code=400, detail="Error activating user")
+        return user
 
-            return user
-        raise HTTPException(status_code=400, detail="Error activating user")
+    @classmethod
+    def activate_user_to_patient(cls, data, hashed_password: str, *, session):
+        user = cls.get_user_to_activate(data.token, session=session)
+        user.status = StatusUser.active
+        user.name = data.name if data.name else None
+        user.last_name = data.last_name if data.last_name else None
+        user.hashed_password = hashed_password
+        user.token = None
+        session.add(user)
+        # Check if is an admin or doctor
+        is_doctor = session.exec(
+            select(Doctor).where(Doctor.id_user == user.email)
+        ).first()
+        is_admin = session.exec(
+            select(Admin).where(Admin.id_user == user.email)
+        ).first()
+        if not is_doctor and not is_admin:
+            patient = Patient(id_user=user.email)
+            _bump_token_version(user)
+            session.add(patient)
+            session.commit()
+            token_versions.set(user.email, user.token_version)
+
+        return user
 
     @classmethod
     def set_user_role(cls, user: User, role: UserRoles, *, session):
@@ -173,6 +342,70 @@ class UserManager:
         session.refresh(user)
         return user
 
+    @classmethod
+    def refresh_token(cls, user: User, *, session) -> User:
+        """
+        Create a new token for the user, used to restore the password
+
+        Parameters
+        ----------
+        user
+            User to update
+
+        Returns
+        -------
+        User
+            User object with the new token
+        """
+        user.create_activation_token()
+        session.add(user)
+        session.commit()
+        return user
+
+    @classmethod
+    def change_password(cls, user: User, hashed_password: str, *, session) -> User:
+        """
+        Set a new password for the user and consume its token
+
+        Parameters
+        ----------
+        user
+            User to update
+        hashed_password
+            New password hashed by the password hasher
+
+        Returns
+        -------
+        User
+            User object with the new password
+        """
+        user.hashed_password = hashed_password
+        user.token = None
+        # Changing the password logs out the sessions of the user
+        _bump_token_version(user)
+        session.add(user)
+        session.commit()
+        token_versions.set(user.email, user.token_version)
+        return user
+
+    @classmethod
+    def update_password_hash(cls, user: User, hashed_password: str, *, session):
+        """
+        Store the hash of the same password under the current hash policy
+
+        Unlike ``change_password`` the sessions of the user stay valid.
+
+        Parameters
+        ----------
+        user
+            User to update
+        hashed_password
+            Password of the user hashed again by the password hasher
+        """
+        user.hashed_password = hashed_password
+        session.add(user)
+        session.commit()
+
     @classmethod
     def get_role_user(cls, user: User, *, session) -> UserRoles:
         role_checks = [
@@ -186,36 +419,16 @@ class UserManager:
         return UserRoles.user
 
     @classmethod
-    def list_users(cls, params: ListParams, *, session) -> tuple[Any, int]:
-        statement_count = statement = select(User)
-        if params:
-            if params.filters:
-                for filter_item in params.filters:
-                    if hasattr(User, filter_item.field):
-                        statement = statement.where(
-                            getattr(User, filter_item.field) == filter_item.value
-                        )
-            statement_count = statement
-
-            if params.page >= 0 and params.per_page > 0:
-                statement = statement.offset(params.page * params.per_page).limit(
-                    params.per_page
-                )
-            if params.sort:
-                descending = params.sort[0] == "-"
-                if descending:
-                    params.sort = params.sort[1:]
-                if hasattr(User, params.sort):
-                    statement = statement.order_by(
-                        desc(getattr(User, params.sort))
-                        if descending
-                        else asc(getattr(User, params.sort))
-                    )
+    def list_users(cls, params: ListParams, *, session) -> Page:
+        """
+        Get a page of users with the filters and the sort of the parameters
 
-        return (
-            session.exec(statement).all(),
-            len(session.exec(statement_count).all()),
-        )
+        Returns
+        -------
+        Page
+            Users of the page, total of users and cursor of the next page
+        """
+        return paginate(select(User), User, params, session=session)
 
     @classmethod
     def is_admin(cls, user: User, *, session):
@@ -239,7 +452,7 @@ class UserManager:
         )
 
     @classmethod
-    def request_activate(cls, data, session):
+    def request_activate(cls, data, hashed_password, session):
         # Check if the user exists
         user = cls.get_user(data.email, session=session)
         if user:
@@ -247,7 +460,7 @@ class UserManager:
         # Creates the user with the status pending
         return cls.create_user(
             email=data.email,
-            password=data.password,
+            hashed_password=hashed_password,
             name=data.name if data.name else None,
             last_name=data.last_name if data.last_name else None,
             status=StatusUser.pending_activate,
@@ -1,8 +1,12 @@
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlmodel import create_engine
 
 import os
 from dotenv import load_dotenv
 
+from src.utils.pool import timed_pool, track_pool
+
 load_dotenv()
 
 DB_USER = os.getenv("DB_USER", "")
@@ -10,6 +14,27 @@ DB_PWD = os.getenv("DB_PASSWORD", "")
 DB_DEFAULT_DB = os.getenv("DB_DEFAULT_DB", "")
 DB_HOST = os.getenv("DB_HOST", "")
 DB_PORT = os.getenv("DB_PORT", "")
+# Use the asyncpg engine and AsyncSession for the requests
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+# Connections kept open, extra connections under load and seconds waiting for one
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a connection is replaced, -1 keeps them forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# Test connections before using them, drops the ones closed by the server
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Milliseconds a statement may run on the server, 0 disables the limit
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+# Read replica of the read-only routes, the primary serves them when unset
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", "") or DB_PORT
+# Seconds the reads of a user go to the primary after one of its writes
+DB_READ_YOUR_WRITES = float(os.getenv("DB_READ_YOUR_WRITES", "5"))
 
 smtp_server = os.getenv("SMTP_SERVER", "")
 smtp_port = os.getenv("SMTP_PORT", "")
@@ -18,9 +43,81 @@ smtp_password = os.getenv("SMTP_PASSWORD", "")
 
 # Database URL
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PWD}@{DB_HOST}:{DB_PORT}/{DB_DEFAULT_DB}"
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PWD}@{DB_HOST}:{DB_PORT}/{DB_DEFAULT_DB}"
+)
+REPLICA_DATABASE_URL = (
+    f"postgresql://{DB_USER}:{DB_PWD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}"
+    f"/{DB_DEFAULT_DB}"
+)
+ASYNC_REPLICA_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PWD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}"
+    f"/{DB_DEFAULT_DB}"
+)
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
+def _server_settings(read_only: bool) -> dict[str, str]:
+    server_settings = {}
+    if DB_STATEMENT_TIMEOUT:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT)
+    if read_only:
+        # A write sent to the replica fails instead of being lost
+        server_settings["default_transaction_read_only"] = "on"
+    return server_settings
+
+
+def _create_engine(url: str, name: str, read_only: bool = False):
+    server_settings = _server_settings(read_only)
+    options = " ".join(f"-c {key}={value}" for key, value in server_settings.items())
+    new_engine = create_engine(
+        url,
+        poolclass=timed_pool(QueuePool, name),
+        connect_args={"options": options} if options else {},
+        **POOL_OPTIONS,
+    )
+    track_pool(new_engine.pool, name)
+    return new_engine
+
+
+def _create_async_engine(url: str, name: str, read_only: bool = False):
+    server_settings = _server_settings(read_only)
+    new_engine = create_async_engine(
+        url,
+        poolclass=timed_pool(AsyncAdaptedQueuePool, name),
+        connect_args={"server_settings": server_settings} if server_settings else {},
+        **POOL_OPTIONS,
+    )
+    track_pool(new_engine.sync_engine.pool, name)
+    return new_engine
+
 
 # Create database engine
-engine = create_engine(DATABASE_URL)
+engine = _create_engine(DATABASE_URL, "primary")
+
+# Create the async database engine, only when the async mode is enabled so
+# asyncpg is not required otherwise
+async_engine = None
+if DB_ASYNC:
+    async_engine = _create_async_engine(ASYNC_DATABASE_URL, "primary_async")
+
+# Engines of the read-only routes, the same as the primary without a replica.
+# Pointing DB_REPLICA_HOST to the primary host gives a read-only pool on it.
+read_engine = engine
+async_read_engine = async_engine
+if DB_REPLICA_HOST:
+    read_engine = _create_engine(REPLICA_DATABASE_URL, "replica", read_only=True)
+    if DB_ASYNC:
+        async_read_engine = _create_async_engine(
+            ASYNC_REPLICA_DATABASE_URL, "replica_async", read_only=True
+        )
 
 # Perform database migrations
 # SQLModel.metadata.create_all(engine)
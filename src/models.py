@@ -1,21 +1,23 @@
 from enum import Enum
 
-import jwt
 from typing import Optional, List
 from pydantic import EmailStr, conint
-from sqlalchemy import ForeignKeyConstraint
+from sqlalchemy import ForeignKeyConstraint, Column, Index, JSON, String
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime
 
-from passlib.hash import pbkdf2_sha256
-
-from src.settings import Settings
+from src.settings import get_key_ring
+from src.utils.hashing import hash_password, verify_password, get_policy
 
 
 class Token(SQLModel):
     access_token: str
 
 
+class Message(SQLModel):
+    message: str
+
+
 class StatusQuestionnaire(str, Enum):
     active = "active"
     inactive = "inactive"
@@ -49,6 +51,12 @@ class UserBaseWithRole(UserBase):
     rol: Optional[UserRoles] = Field(default=UserRoles.user)
 
 
+class UserList(SQLModel):
+    users: List[UserBaseWithRole]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+
 class DocOrAdminInput(SQLModel):
     email: EmailStr = Field(description="User email", nullable=False)
     name: Optional[str] = Field(description="User name", nullable=True)
@@ -69,6 +77,8 @@ class User(UserBase, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     token: Optional[str] = Field(default=None)
+    # Bumped when the roles change, access tokens of other versions are revoked
+    token_version: int = Field(default=0, nullable=False)
 
     doctors: Optional[List["Doctor"]] = Relationship(
         back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
@@ -82,18 +92,16 @@ class User(UserBase, table=True):
 
     @staticmethod
     def hash_password(password: str):
-        return pbkdf2_sha256.hash(password)
+        return hash_password(password, *get_policy())
 
     def verify_password(self, password: str):
-        return pbkdf2_sha256.verify(password, self.hashed_password)
+        return verify_password(password, self.hashed_password, *get_policy())
 
     def create_activation_token(self):
         """
         Create a new activation token to send on email
         """
-        self.token = jwt.encode(
-            {"email": self.email}, Settings().token_secret, algorithm="HS256"
-        )
+        self.token = get_key_ring().encode({"email": self.email})
 
 
 class Doctor(SQLModel, table=True):
@@ -226,12 +234,25 @@ class Module(SQLModel, table=True):
     )
 
 
+class QuestionType(str, Enum):
+    YN = "YesNo"
+    MULTIPLE = "multiple"
+    TEXT = "text"
+
+
 class Question(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     id_module: Optional[int] = Field(
         default=None, foreign_key="module.id", primary_key=True
     )
     content: str = Field(default=None)
+    # Kept by a database trigger from the number of options of the question
+    type_opt: QuestionType = Field(
+        default=QuestionType.TEXT,
+        sa_column=Column(
+            String, nullable=False, server_default=QuestionType.TEXT.value
+        ),
+    )
 
     parent_question_id_question: Optional[int] = Field(default=None, nullable=True)
     parent_question_id_module: Optional[int] = Field(default=None, nullable=True)
@@ -327,6 +348,76 @@ class Output(SQLModel, table=True):
     )
 
 
+class StructureVersion(SQLModel, table=True):
+    """
+    Version of the questionnaire structure cached by the workers
+
+    Database triggers bump it on any change of the questionnaires, modules,
+    questions, options, outputs or their links, so cached structure is
+    reloaded.
+    """
+
+    __tablename__ = "structure_version"
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0, nullable=False)
+
+
+class ScoringVersion(SQLModel, table=True):
+    """
+    Version of the rules scoring the assignments of a questionnaire
+
+    Database triggers bump it when an option score, an output, an output link,
+    a module title or the modules of the questionnaire change, so its stored
+    results are recomputed. A questionnaire without a row is at version 0.
+    """
+
+    __tablename__ = "scoring_version"
+    id_questionnaire: int = Field(primary_key=True)
+    version: int = Field(default=0, nullable=False)
+
+
+class AssignmentResult(SQLModel, table=True):
+    """
+    Stored analytics of a module of an assignment
+    """
+
+    __tablename__ = "assignment_result"
+    # Score distribution of a module read from the index alone
+    __table_args__ = (
+        Index("ix_assignment_result_module_punctuation", "id_module", "punctuation"),
+    )
+    id_assignment: int = Field(foreign_key="assignment.id", primary_key=True)
+    id_module: int = Field(foreign_key="module.id", primary_key=True)
+    # Position of the module in the analytics of the assignment
+    position: int = Field(nullable=False)
+    title: Optional[str] = Field(default=None)
+    punctuation: int = Field(default=0, nullable=False)
+    diagnostic: list = Field(default_factory=list, sa_column=Column(JSON))
+    observations: list = Field(default_factory=list, sa_column=Column(JSON))
+    scoring_version: int = Field(default=0, nullable=False)
+
+    def as_analytics(self) -> dict:
+        return {
+            "module": self.title,
+            "diagnostic": {
+                "punctuation": self.punctuation,
+                "diagnostic": self.diagnostic,
+            },
+            "observations": self.observations,
+        }
+
+
+class ModuleDiagnostic(SQLModel):
+    punctuation: int
+    diagnostic: list
+
+
+class ModuleAnalytics(SQLModel):
+    module: Optional[str]
+    diagnostic: ModuleDiagnostic
+    observations: List[str]
+
+
 class ListParams(SQLModel):
     sort: str = Field(
         description="Sort by field String with a list of sort fields separated by `|`."
@@ -334,10 +425,21 @@ class ListParams(SQLModel):
         "Example:  `+address|-name|-year`",
         default=None,
     )
-    page: int = Field(default=0, description="Page number to retrieve. First page is 0")
+    page: int = Field(
+        default=0,
+        description="Page number to retrieve. First page is 0. Ignored with a cursor",
+    )
     per_page: int = Field(
         default=0, description="Number of items per page. Default is not limit"
     )
+    cursor: str = Field(
+        default=None,
+        description="Cursor of the next page returned by the previous page",
+    )
+    estimate_total: bool = Field(
+        default=False,
+        description="Estimate the total of an unfiltered listing instead of counting",
+    )
     filters: list[QueryFilterSchema] = Field(
         description="List of boolean filters to apply to the query", default=None
     )
@@ -0,0 +1,152 @@
+import importlib.util
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from src.classes.export_manager import (
+    ANSWER_FACTS,
+    ANSWERS,
+    COLUMNAR_FORMATS,
+    MEDIA_TYPES,
+    PATIENTS,
+    ExportFormat,
+    ExportManager,
+)
+from src.classes.patient_manager import BaronaRefresh, PatientManager
+from src.database import read_engine
+from src.models import Message
+from src.settings import reload_settings
+from src.utils.authorization import is_admin
+from src.utils.reuse import get_session, run_db
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.post("/reload-settings", response_model=Message)
+async def reload(_=Depends(is_admin)):
+    """
+    Read the settings and the signing keys again without a restart
+
+    Only the process serving the request reloads, send `SIGHUP` to reload every
+    worker.
+
+    Returns
+    -------
+    dict
+        Message confirming the reload
+    """
+    reload_settings()
+    return {"message": "Settings reloaded"}
+
+
+@router.post("/barona/refresh", response_model=BaronaRefresh)
+async def refresh_barona(session=Depends(get_session), _=Depends(is_admin)):
+    """
+    Compute the CI Barona of every patient with complete demographics
+
+    Returns
+    -------
+    BaronaRefresh
+        Number of patients updated
+    """
+    updated = await run_db(session, PatientManager.refresh_ci_barona)
+    return {"updated": updated}
+
+
+def _columnar_available():
+    if importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(
+            status_code=501, detail="Columnar exports need pyarrow installed"
+        )
+
+
+def _export_response(name: str, export_format: ExportFormat, content):
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename={name}.{export_format.value}"
+        },
+    )
+
+
+@router.get("/export/answers", response_class=StreamingResponse)
+async def export_answers(
+    export_format: ExportFormat = Query(default=ExportFormat.csv, alias="format"),
+    cursor: Optional[str] = None,
+    chunk_size: int = Query(default=1000, ge=1, le=100000),
+    _=Depends(is_admin),
+):
+    """
+    Stream the answers of the patients who gave consent
+
+    Read from the replica when there is one. CSV and NDJSON rows have the
+    demographics of the patient and a `cursor` column, an interrupted export
+    resumes after the last row received by passing its cursor. Parquet and
+    Arrow exports are a fact table joined to `/admin/export/patients` by the
+    `patient` pseudonym, written one record batch of `chunk_size` rows at a
+    time.
+
+    Parameters
+    ----------
+    export_format
+        `csv`, `ndjson`, `parquet` or `arrow`
+    cursor
+        Cursor of the last row received
+    chunk_size
+        Rows fetched from the database at a time, the row group size of Parquet
+
+    Returns
+    -------
+    StreamingResponse
+        Rows of the answers in the format
+    """
+    after = ExportManager.decode_cursor(ANSWERS, cursor)
+    if export_format in COLUMNAR_FORMATS:
+        _columnar_available()
+        content = ExportManager.stream_columnar(
+            ANSWER_FACTS, export_format, after, chunk_size, read_engine
+        )
+    else:
+        content = ExportManager.stream(
+            ANSWERS, export_format, after, chunk_size, read_engine
+        )
+    return _export_response("answers", export_format, content)
+
+
+@router.get("/export/patients", response_class=StreamingResponse)
+async def export_patients(
+    export_format: ExportFormat = Query(default=ExportFormat.parquet, alias="format"),
+    chunk_size: int = Query(default=10000, ge=1, le=100000),
+    _=Depends(is_admin),
+):
+    """
+    Stream the demographics of the patients who gave consent, the dimension of
+    the columnar answers export
+
+    Parameters
+    ----------
+    export_format
+        `parquet` or `arrow`
+    chunk_size
+        Rows fetched from the database at a time, the row group size of Parquet
+
+    Returns
+    -------
+    StreamingResponse
+        Patient pseudonym and demographics
+    """
+    if export_format not in COLUMNAR_FORMATS:
+        # The cursor of a patient row would hold the email of the patient
+        raise HTTPException(
+            status_code=400, detail="The patients are exported as parquet or arrow"
+        )
+    _columnar_available()
+    return _export_response(
+        "patients",
+        export_format,
+        ExportManager.stream_columnar(
+            PATIENTS, export_format, None, chunk_size, read_engine
+        ),
+    )
@@ -1,11 +1,26 @@
-from fastapi import APIRouter, Depends
-from src.classes.answer_manager import AnswerInput, AnswerManager
-from src.utils.reuse import get_session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from src.classes.answer_manager import (
+    AnswerInput,
+    AnswerManager,
+    AnswerBatch,
+    AssignmentFinished,
+    AssignmentNotFound,
+    InvalidAnswers,
+    SavedAnswers,
+)
+from src.models import Answer
+from src.utils.answer_buffer import answer_buffer
+from src.utils.reuse import get_session, run_db
 
 router = APIRouter(prefix="/answer", tags=["Answer"])
 
 
-@router.get("/{id_assignment}/{id_module}/{id_question}")
+@router.get(
+    "/{id_assignment}/{id_module}/{id_question}", response_model=Optional[Answer]
+)
 async def get_answer(
     id_assignment: int, id_module: int, id_question: int, session=Depends(get_session)
 ):
@@ -14,38 +29,57 @@ async def get_answer(
 
     # Check the module exists
     # Check the question exists
-    return AnswerManager.get_answer(
-        id_assignment, id_module, id_question, session=session
+    if answer_buffer.enabled:
+        # An autosaved answer not written yet is the current one
+        pending = answer_buffer.get(id_assignment, id_module, id_question)
+        if pending:
+            return Answer(**pending.dict())
+    return await run_db(
+        session, AnswerManager.get_answer, id_assignment, id_module, id_question
     )
 
 
-@router.post("/")
+@router.post("/", response_model=Answer)
 async def create_answer(answer: AnswerInput, session=Depends(get_session)):
-    # Check the assignment exists
-
     # Check the patient is related to the assignment
 
-    # Check the module exists
-    # Check the question exists
-    # Check the question if is option set the option exists
     # Check the question if is open_text set the option is None
 
-    old_answer = AnswerManager.get_answer(
-        answer.id_assignment,
-        answer.id_question_module_id,
-        answer.id_question_question_id,
-        session=session,
-    )
-    if old_answer:
-        old_answer.id_option = (
-            answer.id_option if answer.id_option else answer.id_option
+    try:
+        if answer_buffer.enabled:
+            # Rejected now, as the bulk route does, not dropped when flushed
+            await run_db(session, AnswerManager.validate_answer, answer)
+            # Acknowledged once journaled, written with the next flush
+            await run_in_threadpool(answer_buffer.put, answer)
+            return Answer(**answer.dict())
+        return await run_db(session, AnswerManager.create_or_update_answer, answer)
+    except InvalidAnswers as e:
+        raise HTTPException(
+            status_code=e.code, detail={"message": e.message, "errors": e.errors}
         )
-        old_answer.open_answer = (
-            answer.open_answer if answer.open_answer else answer.open_answer
-        )
-        session.add(old_answer)
-        session.commit()
-        session.refresh(old_answer)
-        return old_answer
+    except (AssignmentNotFound, AssignmentFinished) as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+
+@router.post("/bulk", response_model=SavedAnswers)
+async def create_answers(batch: AnswerBatch, session=Depends(get_session)):
+    """
+    Save the answers of a module or of a whole assignment at once
 
-    return AnswerManager.save_answer(answer, session=session)
+    The batch is validated as a whole and written in a single transaction, an
+    invalid answer rejects the batch.
+
+    Returns
+    -------
+    SavedAnswers
+        Number of answers saved
+    """
+    try:
+        saved = await run_db(session, AnswerManager.save_answers, batch)
+    except InvalidAnswers as e:
+        raise HTTPException(
+            status_code=e.code, detail={"message": e.message, "errors": e.errors}
+        )
+    except (AssignmentNotFound, AssignmentFinished) as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+    return SavedAnswers(saved=saved)
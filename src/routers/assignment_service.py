@@ -1,28 +1,36 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 
-from src.classes.assignment_manager import AssignmentInput, AssignmentManager
+from src.classes.assignment_manager import (
+    AssignmentInput,
+    AssignmentManager,
+    UnansweredQuestions,
+)
+from src.classes.cohort_manager import CohortFilters, CohortManager, ModuleCohort
 from src.classes.doctor_manager import DoctorManager
 from src.classes.patient_manager import PatientManager
 from src.classes.questionnaire_manager import QuestionnaireManager
-from src.classes.user_manager import UserManager
-from src.models import User, Patient, Doctor
+from src.classes.user_manager import Principal
+from src.models import Assignment, Doctor, ModuleAnalytics, Patient
+from src.utils.answer_buffer import answer_buffer
 from src.utils.authorization import (
     is_doctor_or_admin,
-    get_current_user,
+    get_principal,
     get_current_patient,
     get_current_doctor,
 )
-from src.utils.reuse import get_session
+from src.utils.responses import model_response
+from src.utils.reuse import get_session, get_read_session, run_db
 
 router = APIRouter(prefix="/assignment", tags=["Assignment"])
 
 
-@router.post("/")
+@router.post("/", response_model=Assignment)
 async def create_assignment(
     data: AssignmentInput,
     *,
     _=Depends(is_doctor_or_admin),
-    current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     session=Depends(get_session)
 ):
     """
@@ -38,50 +46,46 @@ async def create_assignment(
     Assignment
         Assignment object
     """
-    patient = PatientManager.get_patient(data.patient_id, session=session)
+    patient = await run_db(session, PatientManager.get_patient, data.patient_id)
     if not patient:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=404, detail="Patient not found")
-    is_admin = UserManager.is_admin(current_user, session=session)
-    if not is_admin:
-        if current_user.email != data.doctor_id:
-            from fastapi import HTTPException
-
+    if not principal.is_admin:
+        if principal.email != data.doctor_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    doctor = DoctorManager.get_doctor(data.doctor_id, session=session)
+    doctor = await run_db(session, DoctorManager.get_doctor, data.doctor_id)
 
-    questionnaire = QuestionnaireManager.get_questionnaire(
-        data.questionnaire_id, session=session
+    questionnaire = await run_db(
+        session, QuestionnaireManager.get_questionnaire, data.questionnaire_id
     )
 
-    return AssignmentManager.create_assignment(
-        patient=patient, doctor=doctor, questionnaire=questionnaire, session=session
+    return await run_db(
+        session,
+        AssignmentManager.create_assignment,
+        patient=patient,
+        doctor=doctor,
+        questionnaire=questionnaire,
     )
 
 
-@router.get("/{id_assignment}")
+@router.get("/{id_assignment}", response_model=Assignment)
 async def get_assignment(
     id_assignment: int,
-    session=Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session=Depends(get_read_session),
+    principal: Principal = Depends(get_principal),
 ):
     """
     Get an assignment by id
     """
+    assignment = await run_db(session, AssignmentManager.get_assignment, id_assignment)
     #     Check user is admin
-    have_access = UserManager.is_admin(current_user, session=session)
-    if not have_access:
+    if not principal.is_admin:
         # Check is related to the assignment
-        assignment = AssignmentManager.get_assignment(id_assignment, session=session)
         if (
-            current_user.email != assignment.doctor.id_user
-            and current_user.email != assignment.patient.id_user
+            principal.email != assignment.id_doctor
+            and principal.email != assignment.id_patient
         ):
-            from fastapi import HTTPException
-
             raise HTTPException(status_code=401, detail="Unauthorized")
-    return AssignmentManager.get_assignment(id_assignment, session=session)
+    return assignment
 
 
 @router.put("/{id_assignment}/finish")
@@ -93,25 +97,33 @@ async def finish_assignment(
     """
     Finish an assignment by id
     """
-    assignment = AssignmentManager.get_assignment(id_assignment, session=session)
-    if assignment.patient.id_user != current_patient.id_user:
-        from fastapi import HTTPException
-
+    assignment = await run_db(session, AssignmentManager.get_assignment, id_assignment)
+    if assignment.id_patient != current_patient.id_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     # Check if the assignment is already finished
     if assignment.status == "finished":
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=400, detail="Assignment already finished")
     try:
-        AssignmentManager.finish_assignment(assignment, session=session)
+        if answer_buffer.enabled:
+            # Write the autosaved answers of every worker before checking them
+            await run_in_threadpool(answer_buffer.flush, id_assignment)
+        await run_db(session, AssignmentManager.finish_assignment, assignment)
+    except UnansweredQuestions as e:
+        raise HTTPException(
+            status_code=e.code,
+            detail={
+                "message": e.message,
+                "missing": [
+                    {"id_module": id_module, "id_question": id_question}
+                    for id_module, id_question in e.missing
+                ],
+            },
+        )
     except Exception as e:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/{id_assignment}/analytics")
+@router.get("/{id_assignment}/analytics", response_model=list[ModuleAnalytics])
 async def get_assignment_analitics(
     id_assignment: int,
     get_current_doctor: Doctor = Depends(get_current_doctor),
@@ -119,14 +131,52 @@ async def get_assignment_analitics(
 ):
     """
     Get an assignment analitics by id
+
+    Served from the stored results, which are written on the first view, so
+    it runs on the primary session.
     """
-    assignment = AssignmentManager.get_assignment(id_assignment, session=session)
+    assignment = await run_db(session, AssignmentManager.get_assignment, id_assignment)
     if not assignment:
-        from fastapi import HTTPException
-
         raise HTTPException(status_code=404, detail="Assignment not found")
-    if assignment.doctor.id_user != get_current_doctor.id_user:
-        from fastapi import HTTPException
+    if assignment.id_doctor != get_current_doctor.id_user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    analytics = await run_db(
+        session, AssignmentManager.get_assignment_analytics, assignment
+    )
+    return model_response(analytics)
+
 
+@router.get("/{id_assignment}/cohort", response_model=list[ModuleCohort])
+async def get_assignment_cohort(
+    id_assignment: int,
+    filters: CohortFilters = Depends(),
+    bins: int = Query(default=10, ge=1, le=100),
+    get_current_doctor: Doctor = Depends(get_current_doctor),
+    session=Depends(get_read_session),
+):
+    """
+    Compare the scores of an assignment with the cohort of each module
+
+    Parameters
+    ----------
+    id_assignment
+        Assignment id
+    filters
+        Questionnaire and demographics of the patients of the cohort
+    bins
+        Number of bins of the histogram
+
+    Returns
+    -------
+    list[ModuleCohort]
+        Score distribution of each module, with the score of the assignment and
+        its percentile rank
+    """
+    assignment = await run_db(session, AssignmentManager.get_assignment, id_assignment)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if assignment.id_doctor != get_current_doctor.id_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return AssignmentManager.get_assignment_analytics(assignment, session=session)
+    return await run_db(
+        session, CohortManager.get_assignment_cohort, assignment, filters, bins
+    )
@@ -2,16 +2,21 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlmodel import Session
 
 from src.classes.auth import IncorrectPassword, UserNotFound, Auth, UserNotStatusValid
 from src.models import Token
+from src.utils.reuse import get_session
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 @router.post("/token", response_model=Token)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    session: Session = Depends(get_session),
+):
     try:
-        return Auth.login(form_data.username, form_data.password)
+        return await Auth.login(form_data.username, form_data.password, session=session)
     except (UserNotFound, IncorrectPassword, UserNotStatusValid) as e:
         raise HTTPException(status_code=401, detail=str(e))
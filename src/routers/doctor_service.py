@@ -1,15 +1,19 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
 
-from src.classes.patient_manager import PatientManager
+from src.classes.doctor_manager import DoctorManager
 from src.models import (
     PatientOutput,
     Doctor,
+    ListParams,
+    StatusQuestionnaire,
 )
 from src.utils.authorization import (
     get_current_doctor,
 )
-from src.utils.reuse import get_session
+from src.utils.listing import list_params, set_page_headers
+from src.utils.responses import model_response
+from src.utils.reuse import get_read_session, run_db
 
 router = APIRouter(prefix="/doctor", tags=["doctor"])
 
@@ -17,20 +21,27 @@ router = APIRouter(prefix="/doctor", tags=["doctor"])
 @router.get("/{id_doctor}/patients", response_model=list[PatientOutput])
 async def get_patients(
     id_doctor: str,
+    status: StatusQuestionnaire = None,
+    params: ListParams = Depends(list_params),
     current_doctor: Doctor = Depends(get_current_doctor),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
     """
-    Get all patients of a doctor
+    Get the patients of a doctor
+
+    Only the patients with an assignment in ``status`` are listed when it is
+    given. The `X-Total-Count` and `X-Next-Cursor` headers carry the total and
+    the cursor of the next page.
     """
     if current_doctor.id_user != id_doctor:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    patients = list(
-        dict.fromkeys(
-            [assignment.patient.id_user for assignment in current_doctor.assignments]
-        )
+    page = await run_db(
+        session,
+        DoctorManager.list_patients_output,
+        doctor=current_doctor,
+        params=params,
+        status=status,
     )
-    return [
-        PatientManager.get_patient_output(id_patient, session=session)
-        for id_patient in patients
-    ]
+    response = model_response(page.items)
+    set_page_headers(response, page)
+    return response
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
+from src.classes.cohort_manager import CohortFilters, CohortManager, ModuleCohort
 from src.classes.modules_manager import ModuleManager, ModuleNotFound
+from src.classes.question_manager import QuestionManager, ModuleQuestionOption
+from src.models import Module, Question
 from src.utils.authorization import is_doctor_or_admin
-from src.utils.reuse import get_session
+from src.utils.etag import conditional
+from src.utils.reuse import get_read_session, run_db
 
 router = APIRouter(prefix="/module", tags=["Modules"])
 
 
-@router.get("/")
+@router.get("/", response_model=list[Module])
 async def get_modules(
-    session=Depends(get_session), is_admin_or_doctor=Depends(is_doctor_or_admin)
+    session=Depends(get_read_session), is_admin_or_doctor=Depends(is_doctor_or_admin)
 ):
     """
     Get all-modules
@@ -19,16 +23,72 @@ async def get_modules(
     list[Module]
         List of all modules
     """
-    return ModuleManager.get_modules(session=session)
+    return await run_db(session, ModuleManager.get_modules)
 
 
-@router.get("/{id_module}/questions")
-async def get_questions(id_module: int, session=Depends(get_session)):
-    return ModuleManager.get_module_with_questions(id_module, session=session)
+@router.get(
+    "/{id_module}/questions",
+    response_model=list[Question],
+    dependencies=[Depends(conditional("module-questions", "private, max-age=60"))],
+)
+async def get_questions(id_module: int, session=Depends(get_read_session)):
+    return await run_db(session, ModuleManager.get_module_with_questions, id_module)
 
 
-@router.get("/{id_module}")
-async def get_module(id_module: int, session=Depends(get_session)):
+@router.get(
+    "/{id_module}/types",
+    response_model=list[ModuleQuestionOption],
+    dependencies=[Depends(conditional("module-types", "private, max-age=60"))],
+)
+async def get_question_types(id_module: int, session=Depends(get_read_session)):
+    """
+    Get the type and the options of every question of a module
+
+    Replaces a call to `/question/{id_question}/{id_module}/type` per question.
+
+    Returns
+    -------
+    list[ModuleQuestionOption]
+        Type and options of each question of the module
+    """
+    return await run_db(session, QuestionManager.get_module_question_options, id_module)
+
+
+@router.get("/{id_module}/cohort", response_model=ModuleCohort)
+async def get_module_cohort(
+    id_module: int,
+    filters: CohortFilters = Depends(),
+    bins: int = Query(default=10, ge=1, le=100),
+    session=Depends(get_read_session),
+    _=Depends(is_doctor_or_admin),
+):
+    """
+    Get the score distribution of a module across the finished assignments
+
+    Computed from the stored results of the patients who gave consent, and
+    cached for `cohort_cache_ttl` seconds.
+
+    Parameters
+    ----------
+    id_module
+        Module id
+    filters
+        Questionnaire and demographics of the patients of the cohort
+    bins
+        Number of bins of the histogram
+
+    Returns
+    -------
+    ModuleCohort
+        Count, mean, standard deviation, percentiles and histogram of the scores
+    """
+    return await run_db(
+        session, CohortManager.get_module_cohort, id_module, filters, bins
+    )
+
+
+@router.get("/{id_module}", response_model=Module)
+async def get_module(id_module: int, session=Depends(get_read_session)):
     """
     Get a module by id
 
@@ -47,7 +107,7 @@ async def get_module(id_module: int, session=Depends(get_session)):
     ModuleNotFound
         If module does not exist
     """
-    module = ModuleManager.get_module(id_module, session=session)
+    module = await run_db(session, ModuleManager.get_module, id_module)
     if module:
         return module
     raise ModuleNotFound()
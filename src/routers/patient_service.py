@@ -1,31 +1,33 @@
-from typing import Annotated
+from typing import Annotated, Optional, Union
 
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Response
 from pydantic import EmailStr
 from sqlmodel import Session
 
 from src.classes.assignment_manager import AssignmentManager
 from src.classes.patient_manager import PatientManager
-from src.classes.user_manager import UserManager
+from src.classes.user_manager import UserManager, Principal
 from src.models import (
     Patient,
     Token,
     ConsentField,
-    User,
     PatientOutput,
     Assignment,
     BaronaInput,
+    ListParams,
+    UserBase,
 )
 from src.utils.authorization import (
     get_current_patient,
-    get_current_user,
+    get_principal,
 )
-from src.utils.reuse import get_session
+from src.utils.listing import list_params, set_page_headers
+from src.utils.reuse import get_session, get_read_session, run_db
 
 router = APIRouter(prefix="/patient", tags=["patient"])
 
 
-@router.get("/consent")
+@router.get("/consent", response_model=bool)
 async def get_accepted(current_patient: Patient = Depends(get_current_patient)):
     """
     Check if a patient has accepted consent
@@ -39,11 +41,12 @@ async def get_accepted(current_patient: Patient = Depends(get_current_patient)):
     return current_patient.consent if current_patient.consent else False
 
 
-@router.get("/{id_patient}/has-ci-barona")
+@router.get("/{id_patient}/has-ci-barona", response_model=bool)
 async def has_ci_barona(
     id_patient: EmailStr,
     current_patient: Patient = Depends(get_current_patient),
-    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_read_session),
 ):
     """
     Check if a patient has accepted consent
@@ -56,18 +59,17 @@ async def has_ci_barona(
 
     """
     if current_patient.id_user != id_patient:
-        is_user_doc = UserManager.is_doctor(current_patient.user, session=session)
-        if not is_user_doc:
+        if not principal.is_doctor:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    patient = PatientManager.get_patient(id_patient, session=session)
+    patient = await run_db(session, PatientManager.get_patient, id_patient)
     return patient.has_ci_barona if patient.has_ci_barona else False
 
 
 @router.get("/{id_patient}", response_model=PatientOutput)
 async def get_patient(
     id_patient: str,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_read_session),
 ):
     """
     Get a patient by id
@@ -84,17 +86,16 @@ async def get_patient(
 
     """
     #     Check user is admin or patient
-    if current_user.email != id_patient:
-        is_user_admin = UserManager.is_admin(current_user, session=session)
-        if not is_user_admin:
+    if principal.email != id_patient:
+        if not principal.is_admin:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    return PatientManager.get_patient_output(id_patient, session=session)
+    return await run_db(session, PatientManager.get_patient_output, id_patient)
 
 
-@router.get("/{id_patient}/ci-barona")
+@router.get("/{id_patient}/ci-barona", response_model=Optional[Union[float, str]])
 async def get_ci_barona(
     id_patient: str,
-    current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     session: Session = Depends(get_session),
 ):
     """
@@ -112,16 +113,13 @@ async def get_ci_barona(
 
     """
     #     Check user is admin or patient
-    if current_user.email != id_patient:
-        is_user_admin = UserManager.is_admin(
-            current_user, session=session
-        ) or UserManager.is_doctor(current_user, session=session)
-        if not is_user_admin:
+    if principal.email != id_patient:
+        if not principal.is_admin and not principal.is_doctor:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    return PatientManager.get_ci_barona(id_patient, session=session)
+    return await run_db(session, PatientManager.get_ci_barona, id_patient)
 
 
-@router.post("/activate")
+@router.post("/activate", response_model=UserBase)
 async def activate(token: Token, *, session: Session = Depends(get_session)):
     """
     Activate a user account with a token sent to email address when user was created
@@ -137,13 +135,15 @@ async def activate(token: Token, *, session: Session = Depends(get_session)):
         User object if user was activated successfully
 
     """
-    user = UserManager.activate_user_to_patient(token.access_token, session=session)
+    user = await run_db(
+        session, UserManager.activate_user_to_patient, token.access_token
+    )
     if user:
         return user
     raise HTTPException(status_code=400, detail="Invalid token")
 
 
-@router.post("/{id_patient}/accept-consent")
+@router.post("/{id_patient}/accept-consent", response_model=Patient)
 async def accept_consent(
     *,
     id_patient,
@@ -167,20 +167,21 @@ async def accept_consent(
     """
     if get_current_patient.id_user != id_patient:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    user = PatientManager.accept_consent(
+    user = await run_db(
+        session,
+        PatientManager.accept_consent,
         id=id_patient,
         consent=True,
         dni=consentField.dni,
         name=consentField.name,
         last_name=consentField.last_name,
-        session=session,
     )
     if user:
         return user
     raise HTTPException(status_code=400, detail="Invalid token")
 
 
-@router.post("/{id_patient}/barona")
+@router.post("/{id_patient}/barona", response_model=Optional[Union[float, str]])
 async def calculate_barona(
     id_patient,
     data: BaronaInput,
@@ -203,24 +204,19 @@ async def calculate_barona(
     if current_patient.id_user != id_patient:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    patient = PatientManager.get_patient(id_patient, session=session)
-    patient.gender = data.gender
-    patient.birth_date = data.age
-    patient.education_level = data.education_level
-    patient.region = data.region
-    patient.zone = data.zone
-    session.add(patient)
-    session.commit()
+    await run_db(session, PatientManager.update_demographics, id_patient, data)
 
-    return PatientManager.get_ci_barona(id_patient, session=session)
+    return await run_db(session, PatientManager.get_ci_barona, id_patient)
 
 
 @router.get("/{id_patient}/assignments", response_model=list[Assignment])
 async def get_questionnaires(
     *,
     id_patient,
-    get_current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    response: Response,
+    params: ListParams = Depends(list_params),
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_read_session)
 ):
     """
     Get questionnaires of a patient
@@ -229,28 +225,31 @@ async def get_questionnaires(
     ----------
     id_patient
         Patient id
+    params
+        Sort, page size and cursor from the query string
 
     Returns
     -------
     list[Questionnaire]
+        Assignments of the page, the `X-Total-Count` and `X-Next-Cursor`
+        headers carry the total and the cursor of the next page
 
     """
     #     Check user is admin or patient
-    if get_current_user.email != id_patient:
-        is_user_admin_or_doctor = UserManager.is_admin(
-            get_current_user, session=session
-        ) or UserManager.is_doctor(get_current_user, session=session)
-        if not is_user_admin_or_doctor:
+    if principal.email != id_patient:
+        if not principal.is_admin and not principal.is_doctor:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    return PatientManager.get_assignments(id_patient, session=session)
+    page = await run_db(session, PatientManager.list_assignments, id_patient, params)
+    set_page_headers(response, page)
+    return page.items
 
 
 @router.get("/has-assignment/{id_assignment}", response_model=bool)
 async def has_assignment(
     *,
     id_assignment: int,
-    get_current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_read_session)
 ):
     """
     Check if a current patient has an assignment
@@ -266,16 +265,16 @@ async def has_assignment(
         True if patient has an assignment
 
     """
-    is_doctor = UserManager.is_doctor(get_current_user, session=session)
-    is_patient = UserManager.is_patient(get_current_user, session=session)
+    is_doctor = principal.is_doctor
+    is_patient = principal.is_patient
 
     if not is_doctor and not is_patient:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    assignment = AssignmentManager.get_assignment(id_assignment, session=session)
+    assignment = await run_db(session, AssignmentManager.get_assignment, id_assignment)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    if is_doctor and assignment.doctor.id_user != get_current_user.email:
+    if is_doctor and assignment.id_doctor != principal.email:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    if is_patient and assignment.patient.id_user != get_current_user.email:
+    if is_patient and assignment.id_patient != principal.email:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return True
@@ -1,13 +1,22 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 
-from src.classes.question_manager import QuestionManager
-from src.utils.reuse import get_session
+from src.classes.question_manager import QuestionManager, QuestionOption
+from src.utils.etag import conditional
+from src.utils.reuse import get_read_session, run_db
 
 router = APIRouter(prefix="/question", tags=["Question"])
 
 
-@router.get("/{id_question}/{id_module}/type")
+@router.get(
+    "/{id_question}/{id_module}/type",
+    response_model=Optional[QuestionOption],
+    dependencies=[Depends(conditional("question-type", "private, max-age=60"))],
+)
 async def get_question_type(
-    id_question: int, id_module: int, session=Depends(get_session)
+    id_question: int, id_module: int, session=Depends(get_read_session)
 ):
-    return QuestionManager.get_question_options(id_question, id_module, session=session)
+    return await run_db(
+        session, QuestionManager.get_question_options, id_question, id_module
+    )
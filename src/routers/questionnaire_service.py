@@ -1,29 +1,72 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
 
-from src.classes.questionnaire_manager import QuestionnaireManager, QuestionnaireInput
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.classes.questionnaire_manager import (
+    QuestionnaireBundle,
+    QuestionnaireInput,
+    QuestionnaireManager,
+)
+from src.models import Module, Questionnaire
 from src.utils.authorization import is_doctor_or_admin, get_current_user
-from src.utils.reuse import get_session
+from src.utils.etag import conditional
+from src.utils.reuse import get_session, get_read_session, run_db
 
 router = APIRouter(prefix="/questionnaire", tags=["Questionnaire"])
 
 
-@router.get("/")
+@router.get("/", response_model=list[Questionnaire])
 async def get_questionnaires(
-    is_admin_or_doctor=Depends(is_doctor_or_admin), session=Depends(get_session)
+    is_admin_or_doctor=Depends(is_doctor_or_admin), session=Depends(get_read_session)
 ):
-    return QuestionnaireManager.get_questionnaires(session=session)
+    return await run_db(session, QuestionnaireManager.get_questionnaires)
 
 
-@router.get("/{id_questionnaire}/modules")
+@router.get(
+    "/{id_questionnaire}/modules",
+    response_model=list[Module],
+    dependencies=[Depends(conditional("questionnaire-modules", "private, no-cache"))],
+)
 async def get_modules_from_questionnaire(
-    id_questionnaire: int, session=Depends(get_session)
+    id_questionnaire: int, session=Depends(get_read_session)
 ):
-    return QuestionnaireManager.get_modules_from_questionnaire(
-        id_questionnaire, session=session
+    return await run_db(
+        session, QuestionnaireManager.get_modules_from_questionnaire, id_questionnaire
     )
 
 
-@router.post("/")
+@router.get(
+    "/{id_questionnaire}/bundle",
+    response_model=QuestionnaireBundle,
+    # The user is checked before a matching ETag answers 304
+    dependencies=[
+        Depends(get_current_user),
+        Depends(conditional("questionnaire-bundle", "private, no-cache")),
+    ],
+)
+async def get_questionnaire_bundle(
+    id_questionnaire: int,
+    session=Depends(get_read_session),
+    get_current_user=Depends(get_current_user),
+):
+    """
+    Get a questionnaire with its modules, questions, options and question types
+
+    Replaces a call to the modules of the questionnaire, the questions of each
+    module and the type of each question when rendering it.
+
+    Returns
+    -------
+    QuestionnaireBundle
+        Questionnaire with everything nested
+    """
+    bundle = await run_db(session, QuestionnaireManager.get_bundle, id_questionnaire)
+    if not bundle:
+        raise HTTPException(status_code=404, detail="Questionnaire not found")
+    return bundle
+
+
+@router.post("/", response_model=Questionnaire)
 async def create_questionnaire(
     data: QuestionnaireInput,
     session=Depends(get_session),
@@ -43,21 +86,32 @@ async def create_questionnaire(
     Questionnaire
         Questionnaire object created
     """
-    return QuestionnaireManager.create_questionnaire(
+    return await run_db(
+        session,
+        QuestionnaireManager.create_questionnaire,
         title=data.title,
         description=data.description,
         modules=data.modules,
         author=current_user.email,
-        session=session,
     )
 
 
-@router.get("/{id_questionnaire}")
+@router.get(
+    "/{id_questionnaire}",
+    response_model=Optional[Questionnaire],
+    # The user is checked before a matching ETag answers 304
+    dependencies=[
+        Depends(get_current_user),
+        Depends(conditional("questionnaire", "private, no-cache")),
+    ],
+)
 async def get_questionnaire(
     id_questionnaire: int,
-    session=Depends(get_session),
+    session=Depends(get_read_session),
     get_current_user=Depends(get_current_user),
 ):
-    return QuestionnaireManager.get_questionnaire(
-        id_questionnaire=id_questionnaire, session=session
+    return await run_db(
+        session,
+        QuestionnaireManager.get_questionnaire,
+        id_questionnaire=id_questionnaire,
     )
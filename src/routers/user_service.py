@@ -3,18 +3,21 @@ from typing import Annotated
 from fastapi import APIRouter, Body, Depends, HTTPException, status
 from sqlmodel import Session
 from src.classes.mail import email_manager
-from src.classes.user_manager import UserManager
+from src.classes.user_manager import UserManager, Principal, UserAlreadyExists
 from src.models import (
     UserBase,
     UserInput,
     UserRoles,
-    User,
     ListParams,
     UserBaseWithRole,
     DocOrAdminInput,
+    Message,
+    UserList,
 )
-from src.utils.authorization import is_doctor_or_admin, is_admin, get_current_user
-from src.utils.reuse import get_session
+from src.utils.authorization import is_doctor_or_admin, is_admin, get_principal
+from src.utils.hashing import password_hasher
+from src.utils.responses import model_response
+from src.utils.reuse import get_session, run_db
 
 router = APIRouter(prefix="/user", tags=["user"])
 
@@ -39,13 +42,13 @@ async def send_activate_account(
     Nothing
     """
 
-    user = UserManager.create_user(email=email, password="temp", session=session)
+    user = await run_db(session, UserManager.create_user, email=email)
     if user:
         return await email_manager.send_activate_account(to=email, token=user.token)
     raise HTTPException(status_code=400, detail="Email already exists")
 
 
-@router.post("/activate")
+@router.post("/activate", response_model=UserBase)
 async def activate(data: UserInput, *, session: Session = Depends(get_session)):
     """
     Activate a user account with a token sent to email address when user was created
@@ -66,7 +69,12 @@ async def activate(data: UserInput, *, session: Session = Depends(get_session)):
         If token is invalid
 
     """
-    user = UserManager.activate_user_to_patient(data, session=session)
+    # A request with a bad token must not take a hashing slot
+    await run_db(session, UserManager.get_user_to_activate, data.token)
+    hashed_password = await password_hasher.hash(data.password)
+    user = await run_db(
+        session, UserManager.activate_user_to_patient, data, hashed_password
+    )
     if user:
         return user
     raise HTTPException(status_code=400, detail="Invalid token")
@@ -97,9 +105,9 @@ async def register(
 
     """
     try:
-        user = UserManager.get_user(email, session=session)
+        user = await run_db(session, UserManager.get_user, email)
         if user:
-            UserManager.set_user_role(user, role, session=session)
+            await run_db(session, UserManager.set_user_role, user, role)
             await email_manager.send_activate_account(to=user.email, token=user.token)
         return user
     except Exception as e:
@@ -108,7 +116,9 @@ async def register(
         )
 
 
-@router.post("/request-register", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/request-register", response_model=Message, status_code=status.HTTP_201_CREATED
+)
 async def request_register(
     email: Annotated[str, Body(embed=True)],
     role: UserRoles,
@@ -129,15 +139,18 @@ async def request_register(
 
     """
     try:
-        user = UserManager.create_user(
-            email=email, password="temp", status="pending", session=session
+        user = await run_db(
+            session,
+            UserManager.create_user,
+            email=email,
+            status="pending",
         )
         if user:
             try:
-                UserManager.set_user_role(user, role, session=session)
+                await run_db(session, UserManager.set_user_role, user, role)
                 return {"message": "User created successfully"}
             except Exception as e:
-                UserManager.delete_user(user, session=session)
+                await run_db(session, UserManager.delete_user, user)
                 raise e
 
     except Exception as e:
@@ -159,27 +172,23 @@ async def restore_password(
     HTTP status code 200 if email was sent successfully
 
     """
-    user = UserManager.get_user(email, session=session)
+    user = await run_db(session, UserManager.get_user, email)
     if user:
-        user.create_activation_token()
-        session.add(user)
-        session.commit()
+        await run_db(session, UserManager.refresh_token, user)
         return await email_manager.send_restore_password(to=email, token=user.token)
     raise HTTPException(status_code=400, detail="Email not found")
 
 
-@router.post("/change-password")
+@router.post("/change-password", response_model=Message)
 async def change_password(data: UserInput, *, session: Session = Depends(get_session)):
     """
     Change password for a user
     """
-    user = UserManager.get_user_by_token(data.token, session=session)
+    user = await run_db(session, UserManager.get_user_by_token, data.token)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid token")
-    user.hashed_password = user.hash_password(data.password)
-    user.token = None
-    session.add(user)
-    session.commit()
+    hashed_password = await password_hasher.hash(data.password)
+    await run_db(session, UserManager.change_password, user, hashed_password)
     return {"message": "Password changed successfully"}
 
 
@@ -199,7 +208,7 @@ async def activate_pending_user(
         User object if user was activated successfully
 
     """
-    user = UserManager.activate_pending_user(email, session=session)
+    user = await run_db(session, UserManager.activate_pending_user, email)
     if user:
         return user
     raise HTTPException(
@@ -209,7 +218,7 @@ async def activate_pending_user(
 
 @router.get("/is-admin", response_model=bool)
 async def is_user_admin(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
 ):
     """
     Check if the current user is admin
@@ -219,12 +228,12 @@ async def is_user_admin(
         True if user is admin
 
     """
-    return UserManager.is_admin(user, session=session)
+    return principal.is_admin
 
 
 @router.get("/is-doctor", response_model=bool)
 async def is_user_doctor(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
 ):
     """
     Check if the current user is doctor
@@ -234,12 +243,12 @@ async def is_user_doctor(
         True if user is doctor
 
     """
-    return UserManager.is_doctor(user, session=session)
+    return principal.is_doctor
 
 
 @router.get("/is-patient", response_model=bool)
 async def is_user_patient(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
 ):
     """
     Check if the current user is patient
@@ -249,23 +258,23 @@ async def is_user_patient(
         True if user is patient
 
     """
-    return UserManager.is_patient(user, session=session)
+    return principal.is_patient
 
 
-@router.post("/list")
+@router.post("/list", response_model=UserList)
 async def list_users(
     params: ListParams = None,
     *,
     session: Session = Depends(get_session),
     _=Depends(is_admin),
-) -> dict:
+):
     """
     List users
 
     Parameters
     ----------
     params
-        ListParams object with limit, offset and sort fields
+        ListParams object with filters, sort, page size and cursor
 
     Returns
     -------
@@ -273,19 +282,31 @@ async def list_users(
         List of users
     total
         number of users with the given filters
+    next_cursor
+        Cursor of the next page, None on the last page
     """
     try:
-        result, total = UserManager.list_users(params, session=session)
-        users = []
-        for user in result:
-            rol = UserManager.get_role_user(user, session=session)
-            users.append(UserBaseWithRole.from_orm(user, {"rol": rol}))
-        return {"users": users, "total": total}
+        page = await run_db(session, UserManager.list_users, params)
+        roles = await run_db(
+            session, UserManager.get_roles, [user.email for user in page.items]
+        )
+        # from_orm with an update dict reads every relationship of the user
+        users = [
+            UserBaseWithRole(
+                **user.dict(include=set(UserBase.__fields__)), rol=roles[user.email]
+            )
+            for user in page.items
+        ]
+        return model_response(
+            UserList(users=users, total=page.total, next_cursor=page.next_cursor)
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing users: {e}")
 
 
-@router.delete("/{user_id}")
+@router.delete("/{user_id}", response_model=Message)
 async def delete_user(
     user_id, *, session: Session = Depends(get_session), _=Depends(is_doctor_or_admin)
 ):
@@ -301,10 +322,10 @@ async def delete_user(
     Nothing
     """
     try:
-        user = UserManager.get_user(user_id, session=session)
+        user = await run_db(session, UserManager.get_user, user_id)
         if not user:
             raise HTTPException(status_code=400, detail="User not found")
-        UserManager.delete_user(user, session=session)
+        await run_db(session, UserManager.delete_user, user)
         return {"message": "User deleted successfully"}
     except HTTPException as e:
         raise e
@@ -313,7 +334,7 @@ async def delete_user(
 
 
 # TODO: Implementar bien el request delete
-@router.put("/request-delete")
+@router.put("/request-delete", response_model=Message)
 async def request_delete(
     email: str,
     *,
@@ -334,17 +355,17 @@ async def request_delete(
 
     """
     try:
-        user = UserManager.get_user(email=email, session=session)
+        user = await run_db(session, UserManager.get_user, email=email)
         if user:
             user.status = "pending-delete"
-            session.commit()
+            await run_db(session, UserManager.update_user, user)
             return {"message": "User deleted successfully"}
         raise HTTPException(status_code=400, detail="User not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting user: {e}")
 
 
-@router.post("/request-activate", status_code=201)
+@router.post("/request-activate", response_model=Message, status_code=201)
 async def request_activate(
     data: DocOrAdminInput, *, session: Session = Depends(get_session)
 ):
@@ -362,6 +383,9 @@ async def request_activate(
     HTTP status code 201 if user was created successfully
 
     """
-    UserManager.request_activate(data, session=session)
+    if await run_db(session, UserManager.get_user, data.email):
+        raise UserAlreadyExists()
+    hashed_password = await password_hasher.hash(data.password)
+    await run_db(session, UserManager.request_activate, data, hashed_password)
     # Return 201
     return {"message": "Record saved"}
@@ -1,8 +1,37 @@
+from functools import lru_cache
+
+from dotenv import load_dotenv
 from pydantic import ConfigDict, BaseSettings, AnyHttpUrl
 
+from src.utils.keyring import KeyRing
+
 
 class Settings(BaseSettings):
     token_secret: str
+    # Extra signing keys as `kid:secret` pairs separated by commas
+    token_keys: str = ""
+    # Key used to sign new tokens, `default` is token_secret
+    token_active_kid: str = None
+    access_token_expire_minutes: int = 1440
+    # Seconds a user token version is trusted before checking the database again
+    token_version_ttl: int = 30
+    # Processes hashing passwords, operations running at once and waiting
+    password_hash_workers: int = 2
+    password_hash_concurrency: int = 4
+    password_hash_max_queue: int = 100
+    # Passlib scheme and rounds of new hashes, older hashes are updated on login
+    password_hash_scheme: str = "pbkdf2_sha256"
+    password_hash_rounds: int = None
+    # Queue autosaved answers in a journal and write them to the database in batches
+    answer_write_behind: bool = False
+    answer_flush_interval: float = 0.5
+    answer_flush_size: int = 200
+    answer_journal_dir: str = "answer_journal"
+    # Entries of the questionnaire structure cache and seconds its version is trusted
+    structure_cache_size: int = 1024
+    structure_cache_ttl: float = 5
+    # Seconds the cohort statistics of a module are served before computing them again
+    cohort_cache_ttl: float = 300
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -10,3 +39,39 @@ class FrontURL(BaseSettings):
     ACTIVATE_ACCOUNT_URL: AnyHttpUrl
     RESET_PASSWORD_URL: AnyHttpUrl
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Settings of the process, parsed once until ``reload_settings`` is called
+    """
+    return Settings()
+
+
+@lru_cache
+def get_front_url() -> FrontURL:
+    """
+    Front URLs of the process, parsed once until ``reload_settings`` is called
+    """
+    return FrontURL()
+
+
+@lru_cache
+def get_key_ring() -> KeyRing:
+    """
+    Signing keys of the tokens, built once until ``reload_settings`` is called
+    """
+    return KeyRing.from_settings(get_settings())
+
+
+def reload_settings():
+    """
+    Read the `.env` file again and drop the cached settings and signing keys
+
+    Used to rotate the signing keys without restarting the process.
+    """
+    load_dotenv(override=True)
+    get_settings.cache_clear()
+    get_front_url.cache_clear()
+    get_key_ring.cache_clear()
@@ -0,0 +1,320 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+
+from src.classes.answer_manager import (
+    AnswerBatch,
+    AnswerInput,
+    AnswerItem,
+    AnswerManager,
+    AssignmentFinished,
+    AssignmentNotFound,
+    InvalidAnswers,
+)
+from src.database import engine
+from src.settings import get_settings
+from src.utils.metrics import registry, Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Key of the coalesced answers
+Key = tuple[int, int, int]
+
+buffer_pending = registry.register(
+    Gauge("answer_buffer_pending", "Answers waiting to be written")
+)
+buffer_written = registry.register(
+    Counter("answer_buffer_written_total", "Answers written by the buffer")
+)
+buffer_dropped = registry.register(
+    Counter("answer_buffer_dropped_total", "Answers rejected when written")
+)
+buffer_flush = registry.register(
+    Histogram(
+        "answer_buffer_flush_seconds",
+        "Seconds of a flush of the buffer",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+)
+
+
+def _key(answer: AnswerInput) -> Key:
+    return (
+        answer.id_assignment,
+        answer.id_question_module_id,
+        answer.id_question_question_id,
+    )
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer of the autosaved answers
+
+    An answer is acknowledged once it is appended and synced to the journal of
+    the process. The answers are coalesced per (assignment, module, question),
+    only the latest one is written, and flushed with the bulk upsert every
+    ``interval`` seconds or as soon as ``size`` answers are pending.
+
+    Each worker process writes its own journal and holds a lock on it. A worker
+    starting later replays the journals whose lock is free, left by a worker
+    that stopped before flushing, and its own journal when it was restarted
+    with the same PID. ``flush`` of an assignment also reads the
+    journals of the other workers, so finishing an assignment sees every
+    answer whatever worker received it.
+    """
+
+    def __init__(
+        self, engine, directory: str, interval: float, size: int, enabled: bool
+    ):
+        self.engine = engine
+        self.directory = Path(directory)
+        self.interval = interval
+        self.size = size
+        self.enabled = enabled
+        self._pending: dict[Key, tuple[datetime, AnswerInput]] = {}
+        # Guards the pending answers and the journal
+        self._lock = threading.Lock()
+        # One flush at a time
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._lock_file = None
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    @property
+    def journal_path(self) -> Path:
+        return self.directory / f"answers-{os.getpid()}.log"
+
+    @staticmethod
+    def _read_journal(path: Path) -> list[tuple[datetime, AnswerInput]]:
+        entries = []
+        try:
+            with open(path) as journal:
+                for line in journal:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        # Last line of a journal cut by a crash
+                        continue
+                    entries.append(
+                        (
+                            datetime.fromisoformat(data["ts"]),
+                            AnswerInput(**data["answer"]),
+                        )
+                    )
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _append(self, entries: list[tuple[datetime, AnswerInput]]):
+        for ts, answer in entries:
+            line = json.dumps({"ts": ts.isoformat(), "answer": answer.dict()})
+            self._journal.write(line + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _coalesce(self, entries, into: dict):
+        for ts, answer in entries:
+            key = _key(answer)
+            if key not in into or into[key][0] <= ts:
+                into[key] = (ts, answer)
+
+    def open(self):
+        """
+        Lock the journal of the process and replay it and the ones left by
+        others
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.journal_path.with_suffix(".lock"), "w")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # A restarted worker can get the PID of the one that wrote this journal,
+        # its answers are still pending
+        entries = self._read_journal(self.journal_path)
+        with self._lock:
+            self._coalesce(entries, self._pending)
+            buffer_pending.set(len(self._pending))
+        self._journal = open(self.journal_path, "a")
+        for lock_path in self.directory.glob("answers-*.lock"):
+            if lock_path == self.journal_path.with_suffix(".lock"):
+                continue
+            with open(lock_path, "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # The worker of the journal is alive
+                    continue
+                journal_path = lock_path.with_suffix(".log")
+                entries = self._read_journal(journal_path)
+                with self._lock:
+                    self._append(entries)
+                    self._coalesce(entries, self._pending)
+                journal_path.unlink(missing_ok=True)
+                lock_path.unlink(missing_ok=True)
+
+    def put(self, answer: AnswerInput):
+        """
+        Queue an answer, it is durable when this returns
+        """
+        entry = (datetime.utcnow(), answer)
+        with self._lock:
+            self._append([entry])
+            self._coalesce([entry], self._pending)
+            buffer_pending.set(len(self._pending))
+            full = len(self._pending) >= self.size
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def get(self, id_assignment: int, id_module: int, id_question: int):
+        """
+        Get a queued answer not written yet
+
+        Returns
+        -------
+        AnswerInput | None
+            Latest queued answer of the question
+        """
+        entry = self._pending.get((id_assignment, id_module, id_question))
+        return entry[1] if entry else None
+
+    def _foreign_entries(self, id_assignment: int):
+        entries = []
+        for journal_path in self.directory.glob("answers-*.log"):
+            if journal_path == self.journal_path:
+                continue
+            entries += [
+                entry
+                for entry in self._read_journal(journal_path)
+                if entry[1].id_assignment == id_assignment
+            ]
+        return entries
+
+    def flush(self, id_assignment: Optional[int] = None):
+        """
+        Write the queued answers, only the ones of ``id_assignment`` if given
+
+        The answers of the assignment queued by other workers are written too.
+        Answers rejected by the database, of a finished assignment or of a
+        question outside the questionnaire, are dropped. When the database
+        fails the answers stay queued.
+        """
+        with self._flush_lock, buffer_flush.time():
+            with self._lock:
+                if id_assignment is None:
+                    taken, self._pending = self._pending, {}
+                else:
+                    taken = {
+                        key: self._pending.pop(key)
+                        for key in list(self._pending)
+                        if key[0] == id_assignment
+                    }
+            if id_assignment is not None:
+                self._coalesce(self._foreign_entries(id_assignment), taken)
+            try:
+                self._write(taken)
+            except Exception:
+                with self._lock:
+                    self._coalesce(taken.values(), self._pending)
+                raise
+            with self._lock:
+                self._rewrite_journal()
+                buffer_pending.set(len(self._pending))
+
+    def _rewrite_journal(self):
+        # Keep only the answers still pending, the journal is replaced at once
+        temporary = self.journal_path.with_suffix(".tmp")
+        with open(temporary, "w") as journal:
+            for ts, answer in self._pending.values():
+                line = json.dumps({"ts": ts.isoformat(), "answer": answer.dict()})
+                journal.write(line + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.journal_path)
+        self._journal.close()
+        self._journal = open(self.journal_path, "a")
+
+    def _write(self, taken: dict[Key, tuple[datetime, AnswerInput]]):
+        batches = defaultdict(list)
+        for ts, answer in taken.values():
+            batches[answer.id_assignment].append(
+                AnswerItem(**answer.dict(exclude={"id_assignment"}), date=ts)
+            )
+        with Session(self.engine) as session:
+            for id_assignment, answers in batches.items():
+                batch = AnswerBatch(id_assignment=id_assignment, answers=answers)
+                try:
+                    try:
+                        saved = AnswerManager.save_answers(batch, session=session)
+                    except InvalidAnswers as e:
+                        invalid = {
+                            (error["id_module"], error["id_question"])
+                            for error in e.errors
+                        }
+                        batch.answers = [
+                            answer
+                            for answer in answers
+                            if (
+                                answer.id_question_module_id,
+                                answer.id_question_question_id,
+                            )
+                            not in invalid
+                        ]
+                        buffer_dropped.inc(len(answers) - len(batch.answers))
+                        saved = AnswerManager.save_answers(batch, session=session)
+                except (AssignmentNotFound, AssignmentFinished) as e:
+                    # Writing them again would not fix it
+                    logger.warning(
+                        f"Dropped answers of assignment {id_assignment}: {e}"
+                    )
+                    buffer_dropped.inc(len(batch.answers))
+                    continue
+                buffer_written.inc(saved)
+
+    async def run(self):
+        """
+        Flush the buffer every ``interval`` seconds or when it is full
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    logger.warning(f"Could not flush the answer buffer: {e}")
+
+    def start(self):
+        self.open()
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await run_in_threadpool(self.flush)
+        self._journal.close()
+        self._lock_file.close()
+
+
+answer_buffer = AnswerBuffer(
+    engine,
+    directory=get_settings().answer_journal_dir,
+    interval=get_settings().answer_flush_interval,
+    size=get_settings().answer_flush_size,
+    enabled=get_settings().answer_write_behind,
+)
@@ -1,76 +1,109 @@
-import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidSignatureError, InvalidTokenError
-from sqlmodel import Session, select
+from sqlmodel import Session
 
-from src.classes.user_manager import UserManager
-from src.database import engine
+from src.classes.doctor_manager import DoctorManager
+from src.classes.patient_manager import PatientManager
+from src.classes.user_manager import UserManager, Principal, token_versions
 from src.models import User, Patient, Doctor
-from src.settings import Settings
-from src.utils.reuse import get_session
+from src.settings import get_key_ring
+from src.utils.reuse import get_session, run_db
+from src.utils.token_versions import MISSING
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_principal(
+    token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
+) -> Principal:
+    """
+    Resolve the user of the token with its roles
+
+    Access tokens carry the roles and the token version of the user, they are
+    trusted without a query while the cached version matches. Tokens without
+    those claims are resolved with a single joined query. FastAPI caches the
+    dependency, so it runs once per request.
+    """
     try:
-        payload = jwt.decode(token, Settings().token_secret, algorithms=["HS256"])
+        payload = get_key_ring().decode(token)
         email = payload["email"]
-        with Session(engine) as session:
-            user = session.exec(select(User).where(User.email == email)).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            return user
-    except (InvalidSignatureError, InvalidTokenError):
+    except (InvalidSignatureError, InvalidTokenError, KeyError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    if "ver" in payload and "roles" in payload:
+        version = token_versions.get(email)
+        if version is MISSING:
+            version = await run_db(session, UserManager.get_token_version, email)
+            token_versions.set(email, version)
+        if version is None or version != payload["ver"]:
+            raise HTTPException(status_code=401, detail="Token revoked")
+        return Principal(email, payload["roles"])
+
+    principal = await run_db(session, UserManager.get_principal, email)
+    if not principal:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_session),
+) -> User:
+    if principal.user is None:
+        principal.user = await run_db(session, UserManager.get_user, principal.email)
+        if not principal.user:
+            raise HTTPException(status_code=404, detail="User not found")
+    return principal.user
+
 
 async def get_current_patient(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_session),
 ) -> Patient:
-    patient = session.exec(select(Patient).where(Patient.id_user == user.email)).first()
-    if not patient:
+    if not principal.is_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient
+    if principal.patient is None:
+        principal.patient = await run_db(
+            session, PatientManager.get_patient, principal.email
+        )
+        if not principal.patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+    return principal.patient
 
 
 async def get_current_doctor(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
+    principal: Principal = Depends(get_principal),
+    session: Session = Depends(get_session),
 ) -> Doctor:
-    doctor = session.exec(select(Doctor).where(Doctor.id_user == user.email)).first()
-    if not doctor:
+    if not principal.is_doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return doctor
+    if principal.doctor is None:
+        principal.doctor = await run_db(
+            session, DoctorManager.get_doctor, principal.email
+        )
+        if not principal.doctor:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+    return principal.doctor
 
 
-async def is_doctor(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
-):
-    if not UserManager().is_doctor(user, session=session):
+async def is_doctor(principal: Principal = Depends(get_principal)):
+    if not principal.is_doctor:
         raise HTTPException(status_code=401, detail="User is not a doctor")
     return True
 
 
-async def is_patient(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
-):
-    if not UserManager().is_patient(user, session=session):
+async def is_patient(principal: Principal = Depends(get_principal)):
+    if not principal.is_patient:
         raise HTTPException(status_code=401, detail="User is not a patient")
     return True
 
 
-async def is_admin(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
-):
-    if not UserManager().is_admin(user, session=session):
+async def is_admin(principal: Principal = Depends(get_principal)):
+    if not principal.is_admin:
         raise HTTPException(status_code=401, detail="User is not an admin")
     return True
 
 
-async def is_doctor_or_admin(
-    user: User = Depends(get_current_user), session: Session = Depends(get_session)
-):
-    return UserManager().is_admin(user, session=session) or UserManager().is_doctor(
-        user, session=session
-    )
+async def is_doctor_or_admin(principal: Principal = Depends(get_principal)):
+    return principal.is_admin or principal.is_doctor
@@ -0,0 +1,47 @@
+from fastapi import Depends, HTTPException, Request, Response
+
+from src.utils.reuse import get_read_session, run_db
+from src.utils.structure_cache import structure_cache
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an ``If-None-Match`` header against an ETag, with the weak comparison
+    the header uses
+    """
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def conditional(kind: str, cache_control: str):
+    """
+    Dependency answering conditional requests of a questionnaire structure route
+
+    The strong ETag is built from the path of the request and the version of the
+    questionnaire structure, no body is serialized or hashed. A request whose
+    ``If-None-Match`` matches gets a ``304 Not Modified`` before the route runs.
+    Otherwise the ETag and ``Cache-Control`` headers are added to the response.
+
+    Parameters
+    ----------
+    kind
+        Name of the payload, part of the ETag
+    cache_control
+        ``Cache-Control`` header of the route
+    """
+
+    async def dependency(
+        request: Request, response: Response, session=Depends(get_read_session)
+    ):
+        version = await run_db(session, structure_cache.version)
+        ids = "-".join(str(value) for value in request.path_params.values())
+        etag = f'"{kind}-{ids}-v{version}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,220 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.settings import get_settings
+from src.utils.metrics import registry, Counter, Gauge, Histogram
+
+# Stored instead of a hash for users without a password, nothing verifies it
+UNUSABLE_PASSWORD = "!"
+
+# Schemes the stored hashes may use, whatever the current policy is
+KNOWN_SCHEMES = ("pbkdf2_sha256", "pbkdf2_sha512", "sha512_crypt", "bcrypt", "argon2")
+
+
+@lru_cache
+def get_context(scheme: str, rounds: Optional[int] = None) -> CryptContext:
+    """
+    Build the passlib context of a hash policy
+
+    New hashes use ``scheme`` with ``rounds`` (the passlib default when None).
+    Hashes of other schemes, or of the same scheme with other rounds, still
+    verify but are reported as needing an update.
+
+    Parameters
+    ----------
+    scheme
+        Passlib scheme of the new hashes
+    rounds
+        Rounds of the new hashes
+
+    Returns
+    -------
+    CryptContext
+        Context hashing with the policy
+    """
+    schemes = [scheme] + [known for known in KNOWN_SCHEMES if known != scheme]
+    options = {}
+    if rounds:
+        options = {
+            f"{scheme}__default_rounds": rounds,
+            f"{scheme}__min_rounds": rounds,
+            f"{scheme}__max_rounds": rounds,
+        }
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
+
+
+def get_policy() -> tuple[str, Optional[int]]:
+    """
+    Scheme and rounds of the new hashes, from ``PASSWORD_HASH_SCHEME`` and
+    ``PASSWORD_HASH_ROUNDS``
+    """
+    settings = get_settings()
+    return settings.password_hash_scheme, settings.password_hash_rounds
+
+
+def hash_password(
+    password: str, scheme: str = "pbkdf2_sha256", rounds: Optional[int] = None
+) -> str:
+    return get_context(scheme, rounds).hash(password)
+
+
+def verify_password(
+    password: str,
+    hashed_password: str,
+    scheme: str = "pbkdf2_sha256",
+    rounds: Optional[int] = None,
+) -> bool:
+    if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD):
+        return False
+    return get_context(scheme, rounds).verify(password, hashed_password)
+
+
+def verify_and_update(
+    password: str,
+    hashed_password: str,
+    scheme: str = "pbkdf2_sha256",
+    rounds: Optional[int] = None,
+) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password and hash it again when its hash does not follow the policy
+
+    Returns
+    -------
+    tuple[bool, Optional[str]]
+        Whether the password matches and the new hash to store, if any
+    """
+    if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD):
+        return False, None
+    return get_context(scheme, rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords in a process pool
+
+    PBKDF2 takes tens of milliseconds of CPU, running it on the event loop
+    blocks every other request. The hash policy is read from the settings on
+    every call, so ``reload_settings`` changes it without restarting the pool.
+    At most ``concurrency`` operations run at once, the rest wait in a queue of
+    up to ``max_queue`` operations and later ones are rejected with a 503.
+    """
+
+    def __init__(self, workers: int, concurrency: int, max_queue: int):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._executor = None
+        self._semaphore = None
+        self._loop = None
+
+        self.queue_depth = registry.register(
+            Gauge("password_hash_queue_depth", "Password operations waiting")
+        )
+        self.in_flight = registry.register(
+            Gauge("password_hash_in_flight", "Password operations running")
+        )
+        self.operations = registry.register(
+            Counter("password_hash_operations_total", "Password operations done")
+        )
+        self.rejected = registry.register(
+            Counter(
+                "password_hash_rejected_total", "Password operations over the queue"
+            )
+        )
+        self.duration = registry.register(
+            Histogram(
+                "password_hash_seconds",
+                "Seconds of a password operation, including the wait",
+                (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+            )
+        )
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        if self.queue_depth.value() >= self.max_queue:
+            self.rejected.inc(operation=operation)
+            raise HTTPException(
+                status_code=503, detail="Too many password operations, try again"
+            )
+        with self.duration.time():
+            self.queue_depth.inc()
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.queue_depth.dec()
+            self.in_flight.inc()
+            try:
+                return await loop.run_in_executor(self.executor, fn, *args)
+            finally:
+                self.in_flight.dec()
+                self._semaphore.release()
+                self.operations.inc(operation=operation)
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password in the pool
+
+        Returns
+        -------
+        str
+            Hashed password
+        """
+        return await self._run("hash", hash_password, password, *get_policy())
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Verify a password against its hash in the pool
+
+        Returns
+        -------
+        bool
+            True if the password matches
+        """
+        if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD):
+            return False
+        return await self._run(
+            "verify", verify_password, password, hashed_password, *get_policy()
+        )
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """
+        Verify a password in the pool and rehash it if the policy changed
+
+        Returns
+        -------
+        tuple[bool, Optional[str]]
+            Whether the password matches and the new hash to store, if any
+        """
+        if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD):
+            return False, None
+        return await self._run(
+            "verify", verify_and_update, password, hashed_password, *get_policy()
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=get_settings().password_hash_workers,
+    concurrency=get_settings().password_hash_concurrency,
+    max_queue=get_settings().password_hash_max_queue,
+)
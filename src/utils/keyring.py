@@ -0,0 +1,60 @@
+import jwt
+from jwt import InvalidTokenError
+
+DEFAULT_KID = "default"
+
+
+class KeyRing:
+    """
+    Signing keys of the tokens, identified by the ``kid`` header
+
+    New tokens are signed with the active key, tokens signed with any other key
+    of the ring are still valid. Tokens without a ``kid`` header were signed
+    before the key ring existed and use the default key.
+    """
+
+    algorithm = "HS256"
+
+    def __init__(self, keys: dict[str, str], active_kid: str = DEFAULT_KID):
+        if active_kid not in keys:
+            raise ValueError(f"Active signing key {active_kid} is not in the key ring")
+        self.keys = keys
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_settings(cls, settings) -> "KeyRing":
+        """
+        Build the key ring with ``token_secret`` as the default key and the
+        ``kid:secret`` pairs of ``token_keys``
+        """
+        keys = {DEFAULT_KID: settings.token_secret}
+        for item in settings.token_keys.split(","):
+            if item.strip():
+                kid, secret = item.strip().split(":", 1)
+                keys[kid] = secret
+        return cls(keys, settings.token_active_kid or DEFAULT_KID)
+
+    def encode(self, payload: dict) -> str:
+        """
+        Sign a payload with the active key
+        """
+        return jwt.encode(
+            payload,
+            self.keys[self.active_kid],
+            algorithm=self.algorithm,
+            headers={"kid": self.active_kid},
+        )
+
+    def decode(self, token: str, **kwargs) -> dict:
+        """
+        Verify a token with the key of its ``kid`` header and return its payload
+
+        Raises
+        ------
+        InvalidTokenError
+            If the token is not valid or its key is not in the ring
+        """
+        kid = jwt.get_unverified_header(token).get("kid", DEFAULT_KID)
+        if kid not in self.keys:
+            raise InvalidTokenError(f"Unknown signing key {kid}")
+        return jwt.decode(token, self.keys[kid], algorithms=[self.algorithm], **kwargs)
@@ -0,0 +1,217 @@
+import base64
+import json
+from datetime import datetime
+from enum import Enum
+from functools import partial
+from typing import Any, Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, false, func, text
+from sqlmodel import select
+
+from src.models import ListParams
+
+InvalidCursor = partial(HTTPException, status_code=400, detail="Invalid cursor")
+
+
+class Page:
+    """
+    Page of a listing with the total of rows and the cursor of the next page
+    """
+
+    def __init__(self, items: list, total: int, next_cursor: Optional[str] = None):
+        self.items = items
+        self.total = total
+        self.next_cursor = next_cursor
+
+
+def list_params(
+    sort: str = None, page: int = 0, per_page: int = 0, cursor: str = None
+) -> ListParams:
+    """
+    Read the list parameters of a GET listing from the query string
+    """
+    return ListParams(sort=sort, page=page, per_page=per_page, cursor=cursor)
+
+
+def set_page_headers(response: Response, page: Page):
+    """
+    Send the total and the next cursor of a listing whose body is the list
+    """
+    response.headers["X-Total-Count"] = str(page.total)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+
+
+def parse_sort(model, sort: Optional[str]) -> list[tuple[Any, bool]]:
+    """
+    Get the columns of a sort string like ``+address|-name|-year``
+
+    Unknown fields are ignored. The primary key is always appended, so rows
+    with the same values are returned in a stable order and a cursor points to
+    a single row.
+
+    Returns
+    -------
+    list[tuple[Column, bool]]
+        Columns to sort by and whether each one is descending
+    """
+    columns = model.__table__.columns
+    keys = []
+    for token in (sort or "").split("|"):
+        # A `+` in the query string arrives as a space
+        token = token.strip()
+        descending = token.startswith("-")
+        name = token.lstrip("+-")
+        if name in columns and name not in [column.key for column, _ in keys]:
+            keys.append((columns[name], descending))
+    for column in model.__table__.primary_key.columns:
+        if column.key not in [key.key for key, _ in keys]:
+            keys.append((column, False))
+    return keys
+
+
+def apply_filters(statement, model, filters):
+    columns = model.__table__.columns
+    for filter_item in filters or []:
+        if filter_item.field in columns:
+            statement = statement.where(columns[filter_item.field] == filter_item.value)
+    return statement
+
+
+def count(statement, model=None, *, estimate: bool = False, session) -> int:
+    """
+    Count the rows of a statement in the database
+
+    With ``estimate`` an unfiltered count of ``model`` reads the row estimate of
+    the planner instead of scanning the table. It falls back to the exact count
+    when the table has not been analyzed yet.
+    """
+    if estimate and model is not None and statement.whereclause is None:
+        estimated = session.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+            params={"t": model.__tablename__},
+        )
+        if estimated is not None and estimated >= 0:
+            return estimated
+    return session.exec(
+        select(func.count()).select_from(statement.order_by(None).subquery())
+    ).one()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if issubclass(python_type, datetime):
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def _sort_signature(keys) -> list:
+    return [[column.key, descending] for column, descending in keys]
+
+
+def encode_cursor(row, keys) -> str:
+    data = {
+        "sort": _sort_signature(keys),
+        "values": [_encode_value(getattr(row, column.key)) for column, _ in keys],
+    }
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor: str, keys) -> list:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if data["sort"] != _sort_signature(keys):
+            raise InvalidCursor(detail="The cursor belongs to another sort")
+        return [
+            _decode_value(column, value)
+            for (column, _), value in zip(keys, data["values"], strict=True)
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+
+
+def _after(column, descending: bool, value):
+    # Rows are sorted with NULLs last in both directions
+    if value is None:
+        return false()
+    return or_(column < value if descending else column > value, column.is_(None))
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def keyset_after(keys, values):
+    """
+    Condition of the rows sorted after the row with the given key values
+    """
+    conditions = []
+    for index, ((column, descending), value) in enumerate(zip(keys, values)):
+        equal = [_equal(key, key_value) for (key, _), key_value in zip(keys, values)]
+        conditions.append(and_(*equal[:index], _after(column, descending, value)))
+    return or_(*conditions)
+
+
+def paginate(statement, model, params: Optional[ListParams], *, session) -> Page:
+    """
+    Filter, count, sort and page a select of ``model``
+
+    The next page starts after the row of ``params.cursor`` (keyset
+    pagination), so deep pages cost the same as the first one. Without a
+    cursor ``params.page`` still skips rows with OFFSET.
+
+    Parameters
+    ----------
+    statement
+        Select of ``model`` rows with the conditions of the listing
+    model
+        Table model of the rows
+    params
+        Filters, sort and page of the request
+
+    Returns
+    -------
+    Page
+        Rows of the page, total of rows with the filters and next cursor
+    """
+    params = params or ListParams()
+    statement = apply_filters(statement, model, params.filters)
+    total = count(statement, model, estimate=params.estimate_total, session=session)
+
+    keys = parse_sort(model, params.sort)
+    statement = statement.order_by(
+        *[
+            (column.desc() if descending else column.asc()).nulls_last()
+            for column, descending in keys
+        ]
+    )
+    if params.cursor:
+        statement = statement.where(
+            keyset_after(keys, decode_cursor(params.cursor, keys))
+        )
+    elif params.page > 0 and params.per_page > 0:
+        statement = statement.offset(params.page * params.per_page)
+    if params.per_page > 0:
+        # One more row tells whether there is a next page
+        statement = statement.limit(params.per_page + 1)
+
+    items = session.exec(statement).all()
+    next_cursor = None
+    if params.per_page > 0 and len(items) > params.per_page:
+        items = items[: params.per_page]
+        next_cursor = encode_cursor(items[-1], keys)
+    return Page(items, total, next_cursor)
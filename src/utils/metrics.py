@@ -0,0 +1,154 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """
+    Gauge set by the code or read from ``function`` on every scrape
+
+    Functions added with ``track`` are read on every scrape too, each one as a
+    sample with its own labels.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, description: str, function: Optional[Callable] = None
+    ):
+        super().__init__(name, description)
+        self.function = function
+        self._value = 0
+        self._functions: dict[tuple, Callable] = {}
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    def dec(self, amount: float = 1):
+        self._value -= amount
+
+    def track(self, function: Callable, **labels):
+        self._functions[tuple(sorted(labels.items()))] = function
+
+    def value(self) -> float:
+        return self.function() if self.function else self._value
+
+    def samples(self):
+        if self._functions:
+            return [
+                (self.name, labels, function())
+                for labels, function in self._functions.items()
+            ]
+        return [(self.name, (), self.value())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...]):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        # Bucket counts, count and sum of every label set
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.setdefault(key, [[0] * len(self.buckets), 0, 0.0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series[1] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the seconds spent inside the ``with`` block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        for labels, (counts, count, total) in self._series.items():
+            samples.extend(
+                (f"{self.name}_bucket", labels + (("le", bound),), bucket)
+                for bound, bucket in zip(self.buckets, counts)
+            )
+            samples.append((f"{self.name}_bucket", labels + (("le", "+Inf"),), count))
+            samples.append((f"{self.name}_count", labels, count))
+            samples.append((f"{self.name}_sum", labels, total))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text format
+        """
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# Metrics of the process, scraped from /metrics
+registry = Registry()
@@ -0,0 +1,90 @@
+import asyncio
+
+from sqlalchemy.pool import QueuePool
+
+from src.utils.metrics import registry, Gauge, Histogram
+
+pool_wait = registry.register(
+    Histogram(
+        "db_pool_wait_seconds",
+        "Seconds waiting to check out a database connection",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+)
+pool_size = registry.register(Gauge("db_pool_size", "Connections of the pool"))
+pool_checked_out = registry.register(
+    Gauge("db_pool_checked_out", "Connections in use by a request")
+)
+pool_checked_in = registry.register(
+    Gauge("db_pool_checked_in", "Idle connections of the pool")
+)
+pool_overflow = registry.register(
+    Gauge("db_pool_overflow", "Connections open over the pool size")
+)
+
+
+def timed_pool(pool_class: type[QueuePool], name: str) -> type[QueuePool]:
+    """
+    Subclass a queue pool to observe the time waiting for a connection
+
+    Parameters
+    ----------
+    pool_class
+        ``QueuePool`` or ``AsyncAdaptedQueuePool``
+    name
+        Label of the engine in the metrics
+
+    Returns
+    -------
+    type[QueuePool]
+        Pool class to pass as ``poolclass`` to the engine
+    """
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            with pool_wait.time(engine=name):
+                return super()._do_get()
+
+    return TimedPool
+
+
+def track_pool(pool: QueuePool, name: str):
+    """
+    Expose the statistics of a pool on every scrape of /metrics
+    """
+    pool_size.track(pool.size, engine=name)
+    pool_checked_out.track(pool.checkedout, engine=name)
+    pool_checked_in.track(pool.checkedin, engine=name)
+    pool_overflow.track(lambda: max(pool.overflow(), 0), engine=name)
+
+
+def warm_pool(engine, size: int):
+    """
+    Open ``size`` connections of the engine and return them to the pool
+    """
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def warm_async_pool(engine, size: int):
+    """
+    Open ``size`` connections of the async engine and return them to the pool
+
+    The connections that opened are returned even when others fail, then the
+    first error is raised.
+    """
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(size)), return_exceptions=True
+    )
+    connections = [
+        result for result in results if not isinstance(result, BaseException)
+    ]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    await asyncio.gather(*(connection.close() for connection in connections))
+    if errors:
+        raise errors[0]
@@ -0,0 +1,32 @@
+import time
+
+
+class RecentWrites:
+    """
+    In-process record of the users that wrote to the primary recently
+
+    A replica may lag behind the primary, a user reading right after a write
+    could miss it. The reads of a user go to the primary for ``window``
+    seconds after each of its writes. Writes made through other processes are
+    not seen, the replica lag is expected to be shorter than the time a client
+    takes to move to another worker.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._writes: dict[str, float] = {}
+
+    def mark(self, email: str):
+        self._writes[email] = time.monotonic() + self.window
+
+    def is_recent(self, email: str) -> bool:
+        expires_at = self._writes.get(email)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._writes[email]
+            return False
+        return True
+
+    def clear(self):
+        self._writes.clear()
@@ -0,0 +1,30 @@
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _plain(content):
+    if isinstance(content, BaseModel):
+        return content.dict()
+    if isinstance(content, list):
+        return [_plain(item) for item in content]
+    return content
+
+
+def model_response(content, **kwargs) -> ORJSONResponse:
+    """
+    Render the body of a route straight with orjson
+
+    FastAPI validates the returned value against the response model of the
+    route and walks it with ``jsonable_encoder`` before rendering it. Routes
+    with large bodies already built as their response model return this
+    instead, the response model still documents the route.
+
+    Parameters
+    ----------
+    content
+        Models, lists of models or plain data with the shape of the response
+        model
+    kwargs
+        Arguments of ``ORJSONResponse``, like ``status_code`` or ``headers``
+    """
+    return ORJSONResponse(_plain(content), **kwargs)
@@ -1,8 +1,126 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from jwt import InvalidTokenError
+from sqlalchemy import event
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.database import (
+    engine,
+    async_engine,
+    read_engine,
+    async_read_engine,
+    DB_READ_YOUR_WRITES,
+)
+from src.settings import get_key_ring
+from src.utils.recent_writes import RecentWrites
+
+# Users whose reads go to the primary after a write
+recent_writes = RecentWrites(window=DB_READ_YOUR_WRITES)
+
+
+def _request_email(request: Request) -> Optional[str]:
+    """
+    Email of the bearer token of the request, None if there is no valid token
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return get_key_ring().decode(token)["email"]
+    except (InvalidTokenError, KeyError):
+        return None
+
+
+@asynccontextmanager
+async def _open_session(sync_engine, asynchronous_engine):
+    if asynchronous_engine is not None:
+        async with AsyncSession(asynchronous_engine, expire_on_commit=False) as session:
+            yield session
+    else:
+        with Session(sync_engine, expire_on_commit=False) as session:
+            yield session
+
+
+async def get_session(request: Request):
+    """
+    Yield the database session of the request
 
-from src.database import engine
+    When ``DB_ASYNC`` is enabled the session is an ``AsyncSession`` bound to the
+    asyncpg engine, otherwise a regular ``Session``. Objects are not expired on
+    commit, so reading them after a manager call does not hit the database again.
+    A commit sends the next reads of the user to the primary for a while. The
+    user is marked when the commit happens, the exit of the dependency runs
+    after the response is sent, too late for a read that follows right away.
 
+    Yields
+    ------
+    Session | AsyncSession
+        Session to pass to ``run_db``
+    """
+    email = _request_email(request)
+    async with _open_session(engine, async_engine) as session:
+        if email:
+            sync_session = session.sync_session if async_engine is not None else session
+            event.listen(
+                sync_session, "after_commit", lambda _: recent_writes.mark(email)
+            )
+        yield session
+
+
+async def get_read_session(request: Request):
+    """
+    Yield the database session of a read-only route
 
-def get_session():
-    with Session(engine) as session:
+    The session is bound to the replica, or to the primary when there is no
+    replica or the user of the request wrote recently. Writes on a replica
+    session fail.
+
+    Yields
+    ------
+    Session | AsyncSession
+        Session to pass to ``run_db``
+    """
+    if read_engine is not engine:
+        email = _request_email(request)
+        if not email or not recent_writes.is_recent(email):
+            async with _open_session(read_engine, async_read_engine) as session:
+                yield session
+            return
+    async with _open_session(engine, async_engine) as session:
         yield session
+
+
+async def run_db(session, fn, *args, **kwargs):
+    """
+    Run a manager call without blocking the event loop
+
+    The call receives the synchronous session as the ``session`` keyword. With an
+    ``AsyncSession`` it runs through ``run_sync`` on the asyncpg connection, so
+    lazy loads inside the manager work too. With a regular ``Session`` it runs in
+    the threadpool.
+
+    Parameters
+    ----------
+    session
+        Session returned by ``get_session`` or ``get_read_session``
+    fn
+        Manager method to call
+    args
+        Positional arguments of the call
+    kwargs
+        Keyword arguments of the call
+
+    Returns
+    -------
+    Any
+        Result of the call
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(
+            lambda sync_session: fn(*args, session=sync_session, **kwargs)
+        )
+    return await run_in_threadpool(fn, *args, session=session, **kwargs)
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+from sqlmodel import Session, SQLModel
+
+from src.models import StructureVersion
+from src.settings import get_settings
+from src.utils.metrics import registry, Counter, Gauge
+
+cache_hits = registry.register(
+    Counter("structure_cache_hits_total", "Structure reads served from the cache")
+)
+cache_misses = registry.register(
+    Counter("structure_cache_misses_total", "Structure reads loaded from the database")
+)
+cache_size = registry.register(Gauge("structure_cache_size", "Entries of the cache"))
+
+
+def detach(row: SQLModel) -> SQLModel:
+    """
+    Copy a row without its session, so it can be shared between requests
+    """
+    return type(row)(**row.dict())
+
+
+class StructureCache:
+    """
+    In-process LRU cache of the questionnaires, modules, questions, options and
+    outputs
+
+    Entries are keyed by ``(kind, id)`` and stamped with the structure version
+    they were loaded at. Database triggers bump the version whenever a
+    structure table changes, an entry of an older version is loaded again. The
+    version is read at most every ``ttl`` seconds, so changes made by other
+    processes are seen within ``ttl`` seconds. Changes made by this process
+    call ``invalidate`` at once.
+
+    Cached values are shared by every request and must not be modified or
+    added to a session.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    def version(self, session: Session, fresh: bool = False) -> int:
+        """
+        Get the current structure version, read again once ``ttl`` has passed
+        or when ``fresh``
+        """
+        if (
+            fresh
+            or self._version is None
+            or time.monotonic() - self._checked_at >= self.ttl
+        ):
+            structure_version = session.get(StructureVersion, 1)
+            self._version = structure_version.version if structure_version else 0
+            self._checked_at = time.monotonic()
+        return self._version
+
+    def _lookup(self, key: Hashable, version: int):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: Hashable, version: int, value):
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        cache_size.set(len(self._entries))
+
+    def get(self, key: tuple, load: Callable, *, session: Session):
+        """
+        Get an entry, calling ``load`` when it is missing or stale
+
+        A None loaded is returned but not cached.
+        """
+        version = self.version(session)
+        with self._lock:
+            value = self._lookup(key, version)
+        if value is not None:
+            cache_hits.inc(kind=key[0])
+            return value
+        cache_misses.inc(kind=key[0])
+        value = load()
+        if value is not None:
+            with self._lock:
+                self._store(key, version, value)
+        return value
+
+    def get_many(
+        self, kind: str, ids: Iterable[int], load: Callable, default, *, session
+    ) -> dict:
+        """
+        Get the entries of many ids, loading the missing ones with one call
+
+        Parameters
+        ----------
+        kind
+            Kind of the entries
+        ids
+            Ids of the entries
+        load
+            Called with the missing ids, returns a dict with the value of each
+        default
+            Cached for the ids that ``load`` does not return
+
+        Returns
+        -------
+        dict
+            Value of each id
+        """
+        version = self.version(session)
+        values, missing = {}, []
+        with self._lock:
+            for id_ in ids:
+                value = self._lookup((kind, id_), version)
+                if value is None:
+                    missing.append(id_)
+                else:
+                    values[id_] = value
+        if values:
+            cache_hits.inc(len(values), kind=kind)
+        if missing:
+            cache_misses.inc(len(missing), kind=kind)
+            loaded = load(missing)
+            with self._lock:
+                for id_ in missing:
+                    values[id_] = loaded.get(id_, default)
+                    self._store((kind, id_), version, values[id_])
+        return values
+
+    def invalidate(self, *keys: tuple):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            cache_size.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            cache_size.set(0)
+
+
+structure_cache = StructureCache(
+    max_size=get_settings().structure_cache_size,
+    ttl=get_settings().structure_cache_ttl,
+)
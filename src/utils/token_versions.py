@@ -0,0 +1,43 @@
+import time
+
+MISSING = object()
+
+
+class TokenVersions:
+    """
+    In-process cache of the token version of each user
+
+    Access tokens carry the token version of the user when they were signed, a
+    token is revoked as soon as the version changes. The cache keeps the
+    current version for ``ttl`` seconds so most requests do not query the
+    database. Changes made by this process are applied at once, other processes
+    see them when their entry expires.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._versions: dict[str, tuple[int | None, float]] = {}
+
+    def get(self, email: str):
+        """
+        Get the cached token version of a user
+
+        Returns
+        -------
+        int | None
+            Token version, None if the user was deleted, ``MISSING`` if the
+            version is not cached or has expired
+        """
+        version, expires_at = self._versions.get(email, (MISSING, 0.0))
+        if expires_at < time.monotonic():
+            return MISSING
+        return version
+
+    def set(self, email: str, version: int | None):
+        """
+        Cache the token version of a user, None marks the user as deleted
+        """
+        self._versions[email] = (version, time.monotonic() + self.ttl)
+
+    def clear(self):
+        self._versions.clear()
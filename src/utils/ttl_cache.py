@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    In-process cache whose entries are served for ``ttl`` seconds
+
+    For values that are expensive to compute and may be stale for a while,
+    nothing invalidates an entry before it expires. The least recently used
+    entries are dropped beyond ``max_size``.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable):
+        expires_at, value = self._entries.get(key, (0.0, MISSING))
+        if expires_at < time.monotonic():
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: Iterable[Hashable], load: Callable) -> dict:
+        """
+        Get the values of several keys, loading the missing ones at once
+
+        Parameters
+        ----------
+        keys
+            Keys of the values
+        load
+            Called with the list of missing keys, returns their values by key
+
+        Returns
+        -------
+        dict
+            Value of each key
+        """
+        values, missing = {}, []
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key)
+                if value is MISSING:
+                    missing.append(key)
+                else:
+                    values[key] = value
+        if missing:
+            loaded = load(missing)
+            with self._lock:
+                for key in missing:
+                    values[key] = loaded[key]
+                    self._store(key, values[key])
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
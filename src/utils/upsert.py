@@ -0,0 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+
+def upsert(session: Session, model):
+    """
+    ``INSERT`` into the table of ``model`` that supports ``on_conflict_do_update``
+
+    Both dialects support ``INSERT ... ON CONFLICT``, SQLite is used by the tests.
+    """
+    dialect = session.get_bind().dialect.name
+    return (sqlite if dialect == "sqlite" else postgresql).insert(model)
@@ -0,0 +1,275 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from benchmarks.dataset import seed
+from main import app
+from src.classes.answer_manager import (
+    AnswerBatch,
+    AnswerInput,
+    AnswerItem,
+    AnswerManager,
+    InvalidAnswers,
+)
+from src.models import Answer, Assignment, OptionAnswer, StatusQuestionnaire
+from src.utils.answer_buffer import answer_buffer
+from src.utils.reuse import get_session
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def answered(session):
+    seed(session, modules=2, questions=3)
+
+
+def option(session, id_module, id_question, score):
+    return session.exec(
+        select(OptionAnswer)
+        .where(OptionAnswer.id_question_module_id == id_module)
+        .where(OptionAnswer.id_question_question_id == id_question)
+        .where(OptionAnswer.score == score)
+    ).one()
+
+
+def test_bulk_upsert(session):
+    answers = [
+        AnswerItem(
+            id_question_module_id=2,
+            id_question_question_id=id_question,
+            id_option=option(session, 2, id_question, 3).id,
+        )
+        for id_question in (1, 2, 3)
+    ]
+    # The last answer of a repeated question wins
+    answers.append(
+        AnswerItem(
+            id_question_module_id=2,
+            id_question_question_id=3,
+            id_option=option(session, 2, 3, 0).id,
+        )
+    )
+
+    commits = []
+    event.listen(session, "after_commit", commits.append)
+    saved = AnswerManager.save_answers(
+        AnswerBatch(id_assignment=1, answers=answers), session=session
+    )
+
+    assert saved == 3
+    # The answers and the results of the batch are committed together
+    assert len(commits) == 1
+    scores = {
+        answer.id_question_question_id: answer.option.score
+        for answer in session.exec(
+            select(Answer)
+            .where(Answer.id_assignment == 1)
+            .where(Answer.id_question_module_id == 2)
+        ).all()
+    }
+    assert scores == {1: 3, 2: 3, 3: 0}
+    assert session.get(Assignment, 1).status == "draft"
+
+
+def test_single_answer_keeps_newer_answer(session):
+    queued_at = datetime.utcnow()
+    AnswerManager.create_or_update_answer(
+        AnswerInput(
+            id_assignment=1,
+            id_question_module_id=1,
+            id_question_question_id=1,
+            id_option=option(session, 1, 1, 2).id,
+        ),
+        session=session,
+    )
+    # An answer queued before the one saved directly arrives late
+    AnswerManager.save_answers(
+        AnswerBatch(
+            id_assignment=1,
+            answers=[
+                AnswerItem(
+                    id_question_module_id=1,
+                    id_question_question_id=1,
+                    id_option=option(session, 1, 1, 0).id,
+                    date=queued_at,
+                )
+            ],
+        ),
+        session=session,
+    )
+    assert session.get(Answer, (1, 1, 1)).option.score == 2
+
+
+def test_new_single_answer_commits_once(session):
+    session.delete(session.get(Answer, (1, 1, 1)))
+    session.commit()
+    commits = []
+    event.listen(session, "after_commit", commits.append)
+
+    saved = AnswerManager.create_or_update_answer(
+        AnswerInput(
+            id_assignment=1,
+            id_question_module_id=1,
+            id_question_question_id=1,
+            id_option=option(session, 1, 1, 2).id,
+        ),
+        session=session,
+    )
+
+    assert len(commits) == 1
+    assert saved.option.score == 2
+    assert session.get(Assignment, 1).status == "draft"
+
+
+def test_answers_of_missing_or_finished_assignment(engine, session):
+    def override_session():
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+    session.get(Assignment, 1).status = StatusQuestionnaire.finished
+    session.commit()
+    answer = {"id_question_module_id": 1, "id_question_question_id": 1}
+    app.dependency_overrides[get_session] = override_session
+    try:
+        missing = client.post(
+            "/answer/bulk", json={"id_assignment": 9, "answers": [answer]}
+        )
+        finished = client.post("/answer/", json={"id_assignment": 1, **answer})
+    finally:
+        app.dependency_overrides.clear()
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "Assignment not found"
+    assert finished.status_code == 400
+    assert finished.json()["detail"] == "Assignment already finished"
+
+
+def test_buffered_answer_is_validated_before_it_is_queued(engine, session):
+    def override_session():
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+    answer = {"id_assignment": 1, "id_question_module_id": 1}
+    app.dependency_overrides[get_session] = override_session
+    try:
+        with patch.object(answer_buffer, "enabled", True), patch.object(
+            answer_buffer, "put"
+        ) as put:
+            wrong_option = client.post(
+                "/answer/",
+                json={
+                    **answer,
+                    "id_question_question_id": 2,
+                    "id_option": option(session, 1, 1, 1).id,
+                },
+            )
+            assert put.call_count == 0
+            good = client.post(
+                "/answer/",
+                json={
+                    **answer,
+                    "id_question_question_id": 1,
+                    "id_option": option(session, 1, 1, 1).id,
+                },
+            )
+            assert put.call_count == 1
+    finally:
+        app.dependency_overrides.clear()
+    assert wrong_option.status_code == 400
+    assert wrong_option.json()["detail"]["errors"][0]["detail"] == (
+        "Option not in the question"
+    )
+    assert good.status_code == 200
+
+
+def test_bulk_rejects_the_whole_batch(session):
+    good = AnswerItem(
+        id_question_module_id=1,
+        id_question_question_id=1,
+        id_option=option(session, 1, 1, 2).id,
+    )
+    wrong_option = AnswerItem(
+        id_question_module_id=1,
+        id_question_question_id=2,
+        id_option=option(session, 1, 1, 1).id,
+    )
+    unknown_question = AnswerItem(id_question_module_id=1, id_question_question_id=9)
+    before = session.get(Answer, (1, 1, 1)).id_option
+
+    with pytest.raises(InvalidAnswers) as error:
+        AnswerManager.save_answers(
+            AnswerBatch(
+                id_assignment=1, answers=[good, wrong_option, unknown_question]
+            ),
+            session=session,
+        )
+
+    assert [(e["id_question"], e["detail"]) for e in error.value.errors] == [
+        (2, "Option not in the question"),
+        (9, "Question not in the questionnaire"),
+    ]
+    assert session.get(Answer, (1, 1, 1)).id_option == before
+
+
+def test_buffer_writes_the_latest_answer(session, tmp_path):
+    from src.utils.answer_buffer import AnswerBuffer
+
+    session.delete(session.get(Answer, (1, 1, 1)))
+    session.commit()
+    buffer = AnswerBuffer(session.get_bind(), tmp_path, 1, 100, enabled=True)
+    buffer.open()
+    for score in (1, 3):
+        buffer.put(
+            AnswerInput(
+                id_assignment=1,
+                id_question_module_id=1,
+                id_question_question_id=1,
+                id_option=option(session, 1, 1, score).id,
+            )
+        )
+    assert buffer.get(1, 1, 1).id_option == option(session, 1, 1, 3).id
+    assert AnswerManager.get_answer(1, 1, 1, session=session) is None
+
+    # A worker stopped before flushing, its journal is replayed by the next one
+    buffer._lock_file.close()
+    buffer.journal_path.rename(tmp_path / "answers-0.log")
+    (tmp_path / "answers-0.lock").touch()
+    replayed = AnswerBuffer(session.get_bind(), tmp_path, 1, 100, enabled=True)
+    replayed.open()
+    replayed.flush(1)
+
+    answer = AnswerManager.get_answer(1, 1, 1, session=session)
+    assert answer.option.score == 3
+    assert replayed.get(1, 1, 1) is None
+    assert [path.name for path in tmp_path.glob("answers-*.log")] == [
+        replayed.journal_path.name
+    ]
+
+
+def test_buffer_replays_its_own_journal_after_restart(session, tmp_path):
+    from src.utils.answer_buffer import AnswerBuffer
+
+    session.delete(session.get(Answer, (1, 1, 1)))
+    session.commit()
+    buffer = AnswerBuffer(session.get_bind(), tmp_path, 1, 100, enabled=True)
+    buffer.open()
+    buffer.put(
+        AnswerInput(
+            id_assignment=1,
+            id_question_module_id=1,
+            id_question_question_id=1,
+            id_option=option(session, 1, 1, 2).id,
+        )
+    )
+    buffer._lock_file.close()
+
+    # The restarted worker has the same PID and takes over the same journal
+    restarted = AnswerBuffer(session.get_bind(), tmp_path, 1, 100, enabled=True)
+    restarted.open()
+    restarted.flush()
+
+    answer = AnswerManager.get_answer(1, 1, 1, session=session)
+    assert answer.option.score == 2
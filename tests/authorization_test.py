@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from jwt import InvalidTokenError
+
+from src.classes.auth import Auth
+from src.classes.user_manager import Principal, token_versions
+from src.settings import get_key_ring
+from src.utils.authorization import get_principal
+from src.utils.keyring import KeyRing, DEFAULT_KID
+
+
+@pytest.fixture
+def doctor_token():
+    token_versions.clear()
+    yield Auth.create_access_token(Principal("doc@example.com", ["doctor"]), 3)
+    token_versions.clear()
+
+
+def test_access_token_claims(doctor_token):
+    payload = get_key_ring().decode(doctor_token)
+
+    assert payload["email"] == "doc@example.com"
+    assert payload["roles"] == ["doctor"]
+    assert payload["ver"] == 3
+    assert "exp" in payload
+
+
+def test_principal_from_claims_without_query(doctor_token):
+    token_versions.set("doc@example.com", 3)
+    session = MagicMock()
+
+    principal = asyncio.run(get_principal(doctor_token, session))
+
+    assert principal.is_doctor
+    assert not principal.is_admin
+    assert principal.user is None
+    session.exec.assert_not_called()
+
+
+def test_revoked_token(doctor_token):
+    token_versions.set("doc@example.com", 4)
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(get_principal(doctor_token, MagicMock()))
+    assert e.value.status_code == 401
+
+
+def test_deleted_user_token(doctor_token):
+    token_versions.set("doc@example.com", None)
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(get_principal(doctor_token, MagicMock()))
+    assert e.value.status_code == 401
+
+
+def test_key_ring_rotation():
+    old_ring = KeyRing({DEFAULT_KID: "old-secret"})
+    new_ring = KeyRing({DEFAULT_KID: "old-secret", "2024": "new-secret"}, "2024")
+    old_token = old_ring.encode({"email": "doc@example.com"})
+    new_token = new_ring.encode({"email": "doc@example.com"})
+
+    assert new_ring.decode(old_token)["email"] == "doc@example.com"
+    assert new_ring.decode(new_token)["email"] == "doc@example.com"
+    with pytest.raises(InvalidTokenError):
+        old_ring.decode(new_token)
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from src.classes.patient_manager import PatientManager
+from src.models import BaronaInput, Patient
+
+PATIENTS = [
+    # Up to 65 and over 65 years old, in every age group
+    dict(
+        gender=1,
+        education_level=2,
+        region=1,
+        zone=1,
+        birth_date=datetime(2010, 5, 1),
+    ),
+    dict(
+        gender=2,
+        education_level=3,
+        region=2,
+        zone=2,
+        birth_date=datetime(1995, 1, 1),
+    ),
+    dict(
+        gender=1,
+        education_level=4,
+        region=3,
+        zone=1,
+        birth_date=datetime(1970, 1, 1),
+    ),
+    dict(
+        gender=2,
+        education_level=1,
+        region=4,
+        zone=2,
+        birth_date=datetime(1958, 1, 1),
+    ),
+    dict(
+        gender=1,
+        education_level=5,
+        region=1,
+        zone=2,
+        birth_date=datetime(1940, 1, 1),
+    ),
+]
+
+
+@pytest.fixture(autouse=True)
+def patients(session):
+    for index, demographics in enumerate(PATIENTS):
+        session.add(Patient(id_user=f"patient{index}@example.com", **demographics))
+    # Incomplete demographics are left out
+    session.add(Patient(id_user="incomplete@example.com", gender=1))
+    session.commit()
+
+
+def test_refresh_matches_per_patient_computation(engine):
+    with Session(engine) as session:
+        expected = [
+            PatientManager.get_ci_barona(f"patient{index}@example.com", session)
+            for index in range(len(PATIENTS))
+        ]
+        for patient in session.exec(select(Patient)).all():
+            patient.has_ci_barona = False
+            patient.ci_barona = None
+        session.commit()
+
+    with Session(engine) as session:
+        assert PatientManager.refresh_ci_barona(session=session) == len(PATIENTS)
+    with Session(engine) as session:
+        for index, value in enumerate(expected):
+            patient = session.get(Patient, f"patient{index}@example.com")
+            assert patient.has_ci_barona
+            assert patient.ci_barona == pytest.approx(value)
+        assert session.get(Patient, "incomplete@example.com").ci_barona is None
+
+
+def test_demographics_change_clears_ci_barona(engine):
+    email = "patient1@example.com"
+    with Session(engine) as session:
+        first = PatientManager.get_ci_barona(email, session)
+        demographics = PATIENTS[1]
+        data = BaronaInput(
+            gender=demographics["gender"],
+            age=demographics["birth_date"],
+            education_level=demographics["education_level"],
+            region=demographics["region"],
+            zone=demographics["zone"],
+        )
+        PatientManager.update_demographics(email, data, session=session)
+        assert session.get(Patient, email).ci_barona == first
+
+        data.education_level = 5
+        PatientManager.update_demographics(email, data, session=session)
+        assert not session.get(Patient, email).has_ci_barona
+        assert PatientManager.get_ci_barona(email, session) > first
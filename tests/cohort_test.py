@@ -0,0 +1,132 @@
+import statistics
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from benchmarks.dataset import seed
+from src.classes.cohort_manager import (
+    CohortFilters,
+    CohortManager,
+    cohort_cache,
+    describe,
+)
+from src.classes.result_manager import ResultManager
+from src.models import (
+    Assignment,
+    AssignmentResult,
+    Patient,
+    ScoringVersion,
+    StatusQuestionnaire,
+)
+
+SCORES = [3, 7, 7, 10, 12, 12, 12, 20]
+
+
+def test_describe_matches_the_scores():
+    frequencies = sorted((score, SCORES.count(score)) for score in set(SCORES))
+    result = describe(frequencies, bins=4)
+    assert result["count"] == len(SCORES)
+    assert result["mean"] == pytest.approx(statistics.mean(SCORES))
+    assert result["stddev"] == pytest.approx(statistics.stdev(SCORES))
+    assert (result["min"], result["max"]) == (3, 20)
+    quartiles = statistics.quantiles(SCORES, n=4, method="inclusive")
+    assert [result["p25"], result["p50"], result["p75"]] == pytest.approx(quartiles)
+    assert [bin["count"] for bin in result["histogram"]] == [3, 1, 3, 1]
+    assert describe([], bins=4) == {"count": 0, "histogram": []}
+
+
+@pytest.fixture
+def results(session):
+    seed(session, modules=2, questions=3)
+    for index, score in enumerate(SCORES):
+        email = f"patient{index}@example.com"
+        session.add(
+            Patient(
+                id_user=email,
+                consent=index != 0,
+                gender=index % 2,
+                birth_date=datetime(1950 + index, 1, 1),
+            )
+        )
+        assignment = Assignment(
+            id_questionnaire=1,
+            id_patient=email,
+            status=StatusQuestionnaire.finished,
+        )
+        session.add(assignment)
+        session.flush()
+        for position, id_module in enumerate((1, 2)):
+            session.add(
+                AssignmentResult(
+                    id_assignment=assignment.id,
+                    id_module=id_module,
+                    position=position,
+                    punctuation=score * id_module,
+                )
+            )
+    session.commit()
+
+
+def test_module_cohort_filters_and_cache(engine, results):
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        cohort = CohortManager.get_module_cohort(
+            1, CohortFilters(), bins=4, session=session
+        )
+        # The patient without consent is left out
+        assert cohort["count"] == len(SCORES) - 1
+        assert cohort["min"] == 7
+        assert len(statements) == 1
+        CohortManager.get_module_cohort(1, CohortFilters(), bins=4, session=session)
+        assert len(statements) == 1
+
+        women = CohortManager.get_module_cohort(
+            1, CohortFilters(gender=0), bins=4, session=session
+        )
+        assert women["count"] == 3
+        born = CohortManager.get_module_cohort(
+            1, CohortFilters(birth_year_from=1955), bins=4, session=session
+        )
+        assert born["count"] == 3
+
+
+def test_assignment_cohort_ranks_the_scores(engine, results):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 5)
+        cohorts = CohortManager.get_assignment_cohort(
+            assignment, CohortFilters(), bins=4, session=session
+        )
+    assert [cohort["id_module"] for cohort in cohorts] == [1, 2]
+    # Score 10, two patients below it of the seven with consent
+    assert cohorts[0]["punctuation"] == 10
+    assert cohorts[0]["percentile_rank"] == pytest.approx(2.5 / 7 * 100)
+    assert cohorts[1]["punctuation"] == 20
+
+
+def test_outdated_and_missing_results_are_refreshed(session, results):
+    def count():
+        cohort_cache.clear()
+        return CohortManager.get_module_cohort(
+            1, CohortFilters(), bins=4, session=session
+        )["count"]
+
+    # The results were stored with version 0, the scoring rules changed since
+    session.add(ScoringVersion(id_questionnaire=1, version=1))
+    session.commit()
+    assert count() == 0
+    assert ResultManager.refresh_finished(session=session) == len(SCORES)
+    assert count() == len(SCORES) - 1
+
+    # Finished before the results were stored
+    for result in session.exec(select(AssignmentResult)).all():
+        session.delete(result)
+    session.commit()
+    assert count() == 0
+    assert ResultManager.refresh_finished(session=session, batch_size=3) == len(SCORES)
+    assert count() == len(SCORES) - 1
+    assert ResultManager.refresh_finished(session=session) == 0
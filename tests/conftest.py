@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+from src.classes.cohort_manager import cohort_cache
+from src.utils.structure_cache import structure_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_structure_cache():
+    # Every test has its own database, the ids of the cached rows repeat
+    structure_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cohort_cache():
+    cohort_cache.clear()
+    yield
+
+
+@pytest.fixture
+def engine():
+    # One connection shared by the threads the routes run their queries in
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from main import app
+from src.models import User, Doctor, Patient, Assignment, StatusQuestionnaire
+from src.utils.authorization import get_current_doctor
+from src.utils.reuse import get_read_session
+
+client = TestClient(app)
+
+DOCTOR = "doctor@example.com"
+
+
+@pytest.fixture
+def roster_engine(engine):
+    with Session(engine) as session:
+        session.add(User(email=DOCTOR, hashed_password="!"))
+        session.add(Doctor(id_user=DOCTOR))
+        for index in range(20):
+            email = f"patient{index:02}@example.com"
+            session.add(User(email=email, name=f"Name {index}", hashed_password="!"))
+            session.add(Patient(id_user=email))
+            # Two assignments per patient, the second one finished for odd ones
+            session.add(Assignment(id_doctor=DOCTOR, id_patient=email))
+            session.add(
+                Assignment(
+                    id_doctor=DOCTOR,
+                    id_patient=email,
+                    status=StatusQuestionnaire.finished
+                    if index % 2
+                    else StatusQuestionnaire.active,
+                )
+            )
+        session.commit()
+
+    def override_session():
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_read_session] = override_session
+    app.dependency_overrides[get_current_doctor] = lambda: Doctor(id_user=DOCTOR)
+    yield engine
+    app.dependency_overrides.clear()
+
+
+def test_roster_pages_with_constant_queries(roster_engine):
+    statements = []
+    event.listen(
+        roster_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    patients = []
+    cursor = None
+    while True:
+        statements.clear()
+        params = {"per_page": 8, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/doctor/{DOCTOR}/patients", params=params)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "20"
+        # The page and its COUNT, whatever the page size
+        assert len(statements) == 2
+        patients += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert [patient["email"] for patient in patients] == [
+        f"patient{index:02}@example.com" for index in range(20)
+    ]
+    assert patients[3]["name"] == "Name 3"
+
+
+def test_roster_filters_by_status(roster_engine):
+    response = client.get(f"/doctor/{DOCTOR}/patients", params={"status": "finished"})
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "10"
+    assert all(int(patient["email"][7:9]) % 2 for patient in response.json())
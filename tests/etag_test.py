@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from benchmarks.dataset import seed
+from main import app
+from src.models import User
+from src.settings import get_key_ring
+from src.utils.etag import etag_matches
+from src.utils.reuse import get_read_session, get_session
+from src.utils.structure_cache import structure_cache
+
+client = TestClient(app)
+
+
+def test_etag_matches():
+    etag = '"questionnaire-1-v3"'
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"questionnaire-1-v2", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"questionnaire-1-v2"', etag)
+
+
+@pytest.fixture
+def questionnaire_client(engine, session):
+    seed(session, modules=2, questions=3)
+    session.add(User(email="test@example.com", hashed_password="!"))
+    session.commit()
+
+    def override_session():
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path", ["/questionnaire/1", "/questionnaire/1/bundle"])
+def test_not_modified_after_the_user_is_checked(engine, questionnaire_client, path):
+    token = get_key_ring().encode({"email": "test@example.com"})
+    auth = {"Authorization": f"Bearer {token}"}
+    response = questionnaire_client.get(path, headers=auth)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    # The route would load the questionnaire again
+    structure_cache.clear()
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    response = questionnaire_client.get(path, headers={**auth, "If-None-Match": etag})
+    assert response.status_code == 304
+    # The user and the structure version, the questionnaire is not loaded
+    assert not [
+        statement for statement in statements if "FROM questionnaire" in statement
+    ]
+
+    response = questionnaire_client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 401
@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from benchmarks.dataset import seed
+from src.classes.export_manager import (
+    ANSWER_FACTS,
+    ANSWERS,
+    PATIENTS,
+    ExportFormat,
+    ExportManager,
+    pseudonym,
+)
+from src.models import Assignment, Patient
+
+
+def export(engine, export_format, after=None, chunk_size=4):
+    return b"".join(
+        ExportManager.stream(ANSWERS, export_format, after, chunk_size, engine)
+    )
+
+
+def test_export_streams_and_resumes(engine, session):
+    id_assignment = seed(session, modules=2, questions=5)
+    session.add(
+        Patient(
+            id_user="patient@example.com",
+            consent=True,
+            gender=1,
+            birth_date=datetime(1980, 5, 17),
+        )
+    )
+    session.get(Assignment, id_assignment).id_patient = "patient@example.com"
+    session.commit()
+
+    rows = list(csv.DictReader(io.StringIO(export(engine, ExportFormat.csv).decode())))
+    assert len(rows) == 10
+    assert {row["patient"] for row in rows} == {pseudonym("patient@example.com")}
+    assert {row["birth_year"] for row in rows} == {"1980"}
+    assert "patient@example.com" not in str(rows)
+
+    records = [
+        json.loads(line)
+        for line in export(engine, ExportFormat.ndjson).decode().splitlines()
+    ]
+    assert [record["cursor"] for record in records] == [row["cursor"] for row in rows]
+
+    after = ExportManager.decode_cursor(ANSWERS, records[3]["cursor"])
+    resumed = [
+        json.loads(line)
+        for line in export(engine, ExportFormat.ndjson, after).decode().splitlines()
+    ]
+    assert resumed == records[4:]
+
+
+def test_export_skips_patients_without_consent(engine, session):
+    id_assignment = seed(session, modules=1, questions=2)
+    session.add(Patient(id_user="patient@example.com", consent=False))
+    session.get(Assignment, id_assignment).id_patient = "patient@example.com"
+    session.commit()
+
+    assert export(engine, ExportFormat.ndjson) == b""
+
+
+def test_columnar_export_in_row_groups(engine, session):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    id_assignment = seed(session, modules=2, questions=5)
+    session.add(Patient(id_user="patient@example.com", consent=True, gender=2))
+    session.get(Assignment, id_assignment).id_patient = "patient@example.com"
+    session.commit()
+
+    parquet = b"".join(
+        ExportManager.stream_columnar(
+            ANSWER_FACTS, ExportFormat.parquet, None, 4, engine
+        )
+    )
+    answers = pq.ParquetFile(pa.BufferReader(parquet))
+    assert answers.metadata.num_rows == 10
+    assert answers.metadata.num_row_groups == 3
+    assert answers.schema_arrow.field("score").type == pa.int64()
+    assert answers.schema_arrow.field("date").type == pa.timestamp("us")
+
+    arrow = b"".join(
+        ExportManager.stream_columnar(PATIENTS, ExportFormat.arrow, None, 4, engine)
+    )
+    patients = pa.ipc.open_stream(arrow).read_all().to_pylist()
+    assert patients == [
+        {
+            "patient": pseudonym("patient@example.com"),
+            "gender": 2,
+            "education_level": None,
+            "region": None,
+            "zone": None,
+            "birth_year": None,
+            "ci_barona": None,
+        }
+    ]
@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.utils.hashing import (
+    PasswordHasher,
+    UNUSABLE_PASSWORD,
+    hash_password,
+    verify_and_update,
+)
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, concurrency=1, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_in_pool(hasher):
+    async def run():
+        hashed = await hasher.hash("secret")
+        return (
+            await hasher.verify("secret", hashed),
+            await hasher.verify("wrong", hashed),
+        )
+
+    assert asyncio.run(run()) == (True, False)
+    assert hasher.operations.value(operation="hash") == 1
+    assert hasher.operations.value(operation="verify") == 2
+
+
+def test_unusable_password_skips_pool(hasher):
+    assert not asyncio.run(hasher.verify("temp", UNUSABLE_PASSWORD))
+    assert hasher._executor is None
+
+
+def test_queue_limit(hasher):
+    async def run():
+        return await asyncio.gather(
+            hasher.hash("a"),
+            hasher.hash("b"),
+            hasher.hash("c"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 503
+
+
+def test_verify_and_update_same_policy():
+    hashed = hash_password("secret", "pbkdf2_sha256", 1000)
+    assert verify_and_update("secret", hashed, "pbkdf2_sha256", 1000) == (True, None)
+    assert verify_and_update("wrong", hashed, "pbkdf2_sha256", 1000) == (False, None)
+
+
+def test_verify_and_update_other_rounds():
+    hashed = hash_password("secret", "pbkdf2_sha256", 1000)
+    verified, new_hash = verify_and_update("secret", hashed, "pbkdf2_sha256", 2000)
+    assert verified
+    assert new_hash.startswith("$pbkdf2-sha256$2000$")
+
+
+def test_verify_and_update_other_scheme():
+    hashed = hash_password("secret", "pbkdf2_sha512", 1000)
+    verified, new_hash = verify_and_update("secret", hashed, "pbkdf2_sha256", 1000)
+    assert verified
+    assert new_hash.startswith("$pbkdf2-sha256$1000$")
+
+
+def test_pool_uses_policy(hasher):
+    with patch("src.utils.hashing.get_policy", return_value=("pbkdf2_sha256", 1000)):
+        hashed = asyncio.run(hasher.hash("secret"))
+    assert hashed.startswith("$pbkdf2-sha256$1000$")
@@ -0,0 +1,78 @@
+import pytest
+from fastapi import HTTPException
+from sqlmodel import select
+
+from src.models import User, ListParams, QueryFilterSchema, StatusUser
+from src.utils.listing import paginate
+
+
+@pytest.fixture(autouse=True)
+def users(session):
+    names = ["b", "a", None, "b", "c", None, "a"]
+    for index, name in enumerate(names):
+        session.add(
+            User(
+                email=f"user{index}@example.com",
+                name=name,
+                hashed_password="!",
+                status=StatusUser.active if index % 2 else StatusUser.disabled,
+            )
+        )
+    session.commit()
+
+
+def walk(session, params):
+    pages = []
+    while True:
+        page = paginate(select(User), User, params, session=session)
+        pages.append([user.email for user in page.items])
+        if not page.next_cursor:
+            return pages, page.total
+        params = params.copy(update={"cursor": page.next_cursor})
+
+
+@pytest.mark.parametrize("sort", ["+name|-email", "-name|+email", "name", None])
+def test_keyset_pages_match_full_sort(session, sort):
+    full = paginate(select(User), User, ListParams(sort=sort), session=session)
+    pages, total = walk(session, ListParams(sort=sort, per_page=2))
+
+    assert total == 7
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert sum(pages, []) == [user.email for user in full.items]
+
+
+def test_multi_column_sort(session):
+    page = paginate(
+        select(User), User, ListParams(sort="+name|-email"), session=session
+    )
+    assert [user.email for user in page.items] == [
+        "user6@example.com",
+        "user1@example.com",
+        "user3@example.com",
+        "user0@example.com",
+        "user4@example.com",
+        "user5@example.com",
+        "user2@example.com",
+    ]
+
+
+def test_filters_and_count(session):
+    params = ListParams(
+        per_page=1, filters=[QueryFilterSchema(field="status", value="active")]
+    )
+    page = paginate(select(User), User, params, session=session)
+    assert page.total == 3
+    assert len(page.items) == 1
+
+
+def test_cursor_of_another_sort(session):
+    page = paginate(
+        select(User), User, ListParams(sort="name", per_page=2), session=session
+    )
+    with pytest.raises(HTTPException):
+        paginate(
+            select(User),
+            User,
+            ListParams(sort="-name", per_page=2, cursor=page.next_cursor),
+            session=session,
+        )
@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from src.utils.metrics import registry
+from src.utils.pool import (
+    timed_pool,
+    track_pool,
+    warm_async_pool,
+    warm_pool,
+    pool_wait,
+)
+
+
+def test_pool_metrics_and_warm():
+    engine = create_engine(
+        "sqlite://", poolclass=timed_pool(QueuePool, "test"), pool_size=3
+    )
+    track_pool(engine.pool, "test")
+
+    warm_pool(engine, 3)
+
+    assert engine.pool.checkedin() == 3
+    assert pool_wait.count(engine="test") == 3
+    rendered = registry.render()
+    assert 'db_pool_checked_in{engine="test"} 3' in rendered
+    assert 'db_pool_checked_out{engine="test"} 0' in rendered
+    assert 'db_pool_wait_seconds_count{engine="test"} 3' in rendered
+
+
+def test_async_warm_returns_the_opened_connections():
+    started, closed = [], []
+
+    class Connection:
+        async def start(self):
+            started.append(self)
+            # The second connection is refused, the others open
+            if len(started) == 2:
+                raise ConnectionRefusedError("database down")
+            return self
+
+        async def close(self):
+            closed.append(self)
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(warm_async_pool(Mock(connect=Connection), 3))
+    assert closed == [started[0], started[2]]
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from benchmarks.dataset import seed
+from src.classes.question_manager import QuestionManager
+from src.classes.questionnaire_manager import QuestionnaireManager
+from src.models import Assignment, Question, QuestionType
+
+
+@pytest.mark.parametrize("modules,questions", [(1, 2), (5, 16)])
+def test_bundle_with_constant_queries(engine, session, modules, questions):
+    id_questionnaire = session.get(
+        Assignment, seed(session, modules, questions)
+    ).id_questionnaire
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        bundle = QuestionnaireManager.get_bundle(id_questionnaire, session=session)
+        # The structure version, the questionnaire, modules, questions and options
+        assert len(statements) == 5
+        cached = QuestionnaireManager.get_bundle(id_questionnaire, session=session)
+        assert cached is bundle
+        assert len(statements) == 5
+
+    assert len(bundle.modules) == modules
+    for module in bundle.modules:
+        assert [question.id for question in module.questions] == list(
+            range(1, questions + 1)
+        )
+        for question in module.questions:
+            assert question.type_opt == QuestionType.MULTIPLE
+            assert [option.score for option in question.options] == [0, 1, 2, 3]
+
+
+def test_module_question_types_in_one_query(engine, session):
+    seed(session, modules=1, questions=4, options=2)
+    session.add(Question(id=5, id_module=1, content="Open"))
+    session.commit()
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        types = QuestionManager.get_module_question_options(1, session=session)
+    # The structure version and the questions with their options
+    assert len(statements) == 2
+    assert [(item.id_question, item.type_opt) for item in types] == [
+        (1, QuestionType.YN),
+        (2, QuestionType.YN),
+        (3, QuestionType.YN),
+        (4, QuestionType.YN),
+        (5, QuestionType.TEXT),
+    ]
+    assert [len(item.options) for item in types] == [2, 2, 2, 2, 0]
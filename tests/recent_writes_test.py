@@ -0,0 +1,41 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+from sqlmodel import create_engine
+
+from src.settings import get_key_ring
+from src.utils import reuse
+from src.utils.recent_writes import RecentWrites
+
+
+def test_recent_write_expires():
+    recent_writes = RecentWrites(window=5)
+    with patch("src.utils.recent_writes.time.monotonic", return_value=100):
+        recent_writes.mark("test@example.com")
+        assert recent_writes.is_recent("test@example.com")
+        assert not recent_writes.is_recent("other@example.com")
+    with patch("src.utils.recent_writes.time.monotonic", return_value=106):
+        assert not recent_writes.is_recent("test@example.com")
+
+
+def test_commit_marks_the_user_before_the_dependency_exits():
+    email = "test@example.com"
+    token = get_key_ring().encode({"email": email})
+    request = Mock(headers={"Authorization": f"Bearer {token}"})
+
+    async def write():
+        sessions = reuse.get_session(request)
+        session = await sessions.__anext__()
+        assert not reuse.recent_writes.is_recent(email)
+        session.commit()
+        # The response is sent before the dependency exits, the next read of
+        # the user must already go to the primary
+        assert reuse.recent_writes.is_recent(email)
+        await sessions.aclose()
+
+    reuse.recent_writes.clear()
+    with patch.object(reuse, "engine", create_engine("sqlite://")), patch.object(
+        reuse, "async_engine", None
+    ):
+        asyncio.run(write())
+    reuse.recent_writes.clear()
@@ -0,0 +1,24 @@
+import json
+from datetime import datetime
+
+from src.models import PatientOutput, UserBaseWithRole, UserList, UserRoles
+from src.utils.responses import model_response
+
+
+def test_model_response_matches_response_model():
+    users = UserList(
+        users=[UserBaseWithRole(email="a@example.com", rol=UserRoles.doctor)],
+        total=1,
+        next_cursor=None,
+    )
+    assert json.loads(model_response(users).body) == json.loads(users.json())
+
+    patients = [
+        PatientOutput(
+            id_user="b@example.com",
+            email="b@example.com",
+            birth_date=datetime(1980, 5, 17),
+        )
+    ]
+    body = json.loads(model_response(patients, headers={"X-Total-Count": "1"}).body)
+    assert body == [json.loads(patients[0].json())]
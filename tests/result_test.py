@@ -0,0 +1,148 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from benchmarks.dataset import seed
+from src.classes.answer_manager import AnswerInput, AnswerManager
+from src.classes.assignment_manager import AssignmentManager, UnansweredQuestions
+from src.classes.result_manager import ResultManager
+from src.classes.scoring_manager import ScoringManager
+from src.models import (
+    Answer,
+    Assignment,
+    OptionAnswer,
+    ScoringVersion,
+    StatusQuestionnaire,
+)
+
+
+@pytest.fixture(autouse=True)
+def answered(session):
+    session.add(ScoringVersion(id_questionnaire=1, version=0))
+    session.commit()
+    seed(session, modules=3, questions=6)
+
+
+def test_results_are_stored_and_served(engine):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        expected = ScoringManager.get_analytics(assignment, session=session)
+        assert ResultManager.get_analytics(assignment, session=session) == expected
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        statements.clear()
+        assert ResultManager.get_analytics(assignment, session=session) == expected
+    # The scoring version and the stored results
+    assert len(statements) == 2
+
+
+def test_results_recomputed_on_new_scoring_version(engine):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        ResultManager.get_analytics(assignment, session=session)
+        # What the database triggers do when an option score changes
+        for option in session.exec(select(OptionAnswer)).all():
+            option.score += 10
+            session.add(option)
+        session.get(ScoringVersion, 1).version += 1
+        session.commit()
+
+        analytics = ResultManager.get_analytics(assignment, session=session)
+        assert analytics == ScoringManager.get_analytics(assignment, session=session)
+        assert {
+            result.scoring_version
+            for result in ResultManager.get_results(1, session=session)
+        } == {1}
+
+
+def test_results_kept_on_new_version_of_another_questionnaire(engine):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        ResultManager.get_analytics(assignment, session=session)
+        session.add(ScoringVersion(id_questionnaire=2, version=1))
+        session.commit()
+        session.refresh(assignment)
+
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+        )
+        ResultManager.get_analytics(assignment, session=session)
+    # The scoring version and the stored results
+    assert len(statements) == 2
+
+
+def test_concurrent_refresh_replaces_the_results(engine):
+    with Session(engine) as session:
+        ResultManager.get_analytics(session.get(Assignment, 1), session=session)
+
+    # Another view stored the results after this one looked for them
+    with Session(engine) as session, patch.object(
+        ResultManager, "get_results", return_value=[]
+    ):
+        analytics = ResultManager.refresh(session.get(Assignment, 1), session=session)
+        session.commit()
+
+    with Session(engine) as session:
+        results = ResultManager.get_results(1, session=session)
+    assert [result.as_analytics() for result in results] == analytics
+
+
+def test_draft_answer_updates_its_module(engine):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        assignment.status = StatusQuestionnaire.draft
+        session.add(assignment)
+        session.commit()
+        ResultManager.get_analytics(assignment, session=session)
+        option = session.exec(
+            select(OptionAnswer)
+            .where(OptionAnswer.id_question_module_id == 2)
+            .where(OptionAnswer.id_question_question_id == 1)
+            .where(OptionAnswer.score == 3)
+        ).one()
+
+        AnswerManager.create_or_update_answer(
+            AnswerInput(
+                id_assignment=1,
+                id_question_question_id=1,
+                id_question_module_id=2,
+                id_option=option.id,
+            ),
+            session=session,
+        )
+
+        assert ResultManager.get_analytics(
+            assignment, session=session
+        ) == ScoringManager.get_analytics(assignment, session=session)
+
+
+def test_finish_reports_unanswered_questions(engine):
+    with Session(engine) as session:
+        assignment = session.get(Assignment, 1)
+        for id_module, id_question in [(1, 2), (3, 5)]:
+            session.delete(session.get(Answer, (1, id_question, id_module)))
+        session.commit()
+
+        with pytest.raises(UnansweredQuestions) as error:
+            AssignmentManager.finish_assignment(assignment, session=session)
+        assert error.value.missing == [(1, 2), (3, 5)]
+
+        for id_module, id_question in [(1, 2), (3, 5)]:
+            session.add(
+                Answer(
+                    id_assignment=1,
+                    id_question_question_id=id_question,
+                    id_question_module_id=id_module,
+                )
+            )
+        session.commit()
+        AssignmentManager.finish_assignment(assignment, session=session)
+        assert assignment.status == StatusQuestionnaire.finished
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from benchmarks.dataset import per_module_analytics, seed
+from src.classes.scoring_manager import ScoringManager
+from src.models import Assignment
+from src.utils.structure_cache import structure_cache
+
+
+def scored(engine, modules, questions):
+    # A new questionnaire, the cache can hold the structure of the previous one
+    structure_cache.clear()
+    with Session(engine) as session:
+        id_assignment = seed(session, modules, questions)
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    with Session(engine) as session:
+        assignment = session.get(Assignment, id_assignment)
+        statements.clear()
+        analytics = ScoringManager.get_analytics(assignment, session=session)
+    # The reference implementation runs queries per module, not counted
+    event.remove(engine, "before_cursor_execute", count)
+    with Session(engine) as session:
+        expected = per_module_analytics(
+            session.get(Assignment, id_assignment), session=session
+        )
+    return analytics, expected, len(statements)
+
+
+@pytest.mark.parametrize("modules,questions", [(1, 3), (4, 9)])
+def test_analytics_match_per_module_implementation(engine, modules, questions):
+    analytics, expected, _ = scored(engine, modules, questions)
+    assert json.dumps(analytics) == json.dumps(expected)
+
+
+def test_analytics_queries_do_not_grow(engine):
+    _, _, small = scored(engine, 1, 3)
+    _, _, large = scored(engine, 10, 12)
+    assert small == large
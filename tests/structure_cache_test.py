@@ -0,0 +1,27 @@
+from src.models import StructureVersion
+from src.utils.structure_cache import StructureCache, cache_hits, cache_misses
+
+
+def test_lru_and_version(session):
+    cache = StructureCache(max_size=2, ttl=0)
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return f"value {key}"
+
+    session.add(StructureVersion(id=1, version=0))
+    session.commit()
+    hits = cache_hits.value(kind="test")
+    misses = cache_misses.value(kind="test")
+    for id_ in (1, 2, 1, 3, 1, 2):
+        cache.get(("test", id_), lambda: load(id_), session=session)
+    # 2 is evicted when 3 is loaded, 1 was used last
+    assert loads == [1, 2, 3, 2]
+    assert cache_hits.value(kind="test") - hits == 2
+    assert cache_misses.value(kind="test") - misses == 4
+
+    session.get(StructureVersion, 1).version += 1
+    session.commit()
+    assert cache.get(("test", 2), lambda: load(2), session=session)
+    assert loads == [1, 2, 3, 2, 2]
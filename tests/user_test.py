@@ -1,9 +1,16 @@
+import asyncio
+
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
 from main import app
 from src.classes.auth import IncorrectPassword, Auth, UserNotFound, UserNotStatusValid
-from src.models import StatusUser
+from src.models import StatusUser, User, Admin, Doctor, Patient, UserRoles
+from src.settings import get_key_ring
+from src.utils.authorization import is_admin
+from src.utils.reuse import get_session
 
 client = TestClient(app)
 
@@ -12,15 +19,25 @@ client = TestClient(app)
 def mock_authenticated_user():
     mock_user = Mock()
     mock_user.email = "test@example.com"
-    mock_user.verify_password.return_value = True
     mock_user.status = StatusUser.active
     mock_user.disabled = False
 
     mock_session = MagicMock()
-    mock_session.__enter__.return_value.exec.return_value.first.return_value = mock_user
+    mock_session.__enter__.return_value.exec.return_value.first.return_value = (
+        mock_user,
+        None,
+        None,
+        None,
+    )
+
+    mock_key_ring = Mock()
+    mock_key_ring.encode.return_value = "fake_token"
 
     with patch("src.classes.auth.Session", return_value=mock_session), patch(
-        "src.classes.auth.jwt.encode", return_value="fake_token"
+        "src.classes.auth.get_key_ring", return_value=mock_key_ring
+    ), patch(
+        "src.classes.auth.password_hasher.verify_and_update",
+        AsyncMock(return_value=(True, None)),
     ):
         yield
 
@@ -38,13 +55,20 @@ def mock_user_not_found():
 def mock_user_incorrect_password():
     mock_user = Mock()
     mock_user.email = "test@example.com"
-    mock_user.verify_password.return_value = False
     mock_user.disabled = False
 
     mock_session = MagicMock()
-    mock_session.__enter__.return_value.exec.return_value.first.return_value = mock_user
+    mock_session.__enter__.return_value.exec.return_value.first.return_value = (
+        mock_user,
+        None,
+        None,
+        None,
+    )
 
-    with patch("src.classes.auth.Session", return_value=mock_session):
+    with patch("src.classes.auth.Session", return_value=mock_session), patch(
+        "src.classes.auth.password_hasher.verify_and_update",
+        AsyncMock(return_value=(False, None)),
+    ):
         yield
 
 
@@ -52,13 +76,20 @@ def mock_user_incorrect_password():
 def mock_user_disabled():
     mock_user = Mock()
     mock_user.email = "test@example.com"
-    mock_user.verify_password.return_value = True
     mock_user.status = "disabled"
 
     mock_session = MagicMock()
-    mock_session.__enter__.return_value.exec.return_value.first.return_value = mock_user
+    mock_session.__enter__.return_value.exec.return_value.first.return_value = (
+        mock_user,
+        None,
+        None,
+        None,
+    )
 
-    with patch("src.classes.auth.Session", return_value=mock_session):
+    with patch("src.classes.auth.Session", return_value=mock_session), patch(
+        "src.classes.auth.password_hasher.verify_and_update",
+        AsyncMock(return_value=(True, None)),
+    ):
         yield
 
 
@@ -69,7 +100,7 @@ def test_login_success(mock_authenticated_user):
     email = "test@example.com"
 
     password = "test_password"
-    response = Auth.login(email, password)
+    response = asyncio.run(Auth.login(email, password))
 
     assert "access_token" in response
 
@@ -78,18 +109,98 @@ def test_login_user_not_found(mock_user_not_found):
     email = "nonexistent@example.com"
     password = "test_password"
     with pytest.raises(UserNotFound):
-        Auth.login(email, password)
+        asyncio.run(Auth.login(email, password))
 
 
 def test_login_incorrect_password(mock_user_incorrect_password):
     email = "test@example.com"
     password = "wrong_password"
     with pytest.raises(IncorrectPassword):
-        Auth.login(email, password)
+        asyncio.run(Auth.login(email, password))
 
 
 def test_login_user_disabled(mock_user_disabled):
     email = "test@example.com"
     password = "test_password"
     with pytest.raises(UserNotStatusValid):
-        Auth.login(email, password)
+        asyncio.run(Auth.login(email, password))
+
+
+def test_login_rehashes_outdated_password(mock_authenticated_user):
+    mock_user = Mock()
+    mock_user.email = "test@example.com"
+    mock_user.status = StatusUser.active
+    mock_user.hashed_password = "old_hash"
+    mock_session = MagicMock()
+    mock_session.exec.return_value.first.return_value = (mock_user, None, None, None)
+
+    with patch(
+        "src.classes.auth.password_hasher.verify_and_update",
+        AsyncMock(return_value=(True, "new_hash")),
+    ):
+        response = asyncio.run(
+            Auth.login("test@example.com", "test_password", session=mock_session)
+        )
+
+    assert "access_token" in response
+    assert mock_user.hashed_password == "new_hash"
+    mock_session.commit.assert_called_once()
+
+
+@pytest.fixture
+def user_list_engine(engine):
+    with Session(engine) as session:
+        for index in range(30):
+            email = f"user{index:02}@example.com"
+            session.add(User(email=email, hashed_password="!"))
+            role = [Admin, Doctor, Patient, None][index % 4]
+            if role:
+                session.add(role(id_user=email))
+        session.commit()
+
+    def override_session():
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[is_admin] = lambda: True
+    yield engine
+    app.dependency_overrides.clear()
+
+
+def test_list_users_constant_queries(user_list_engine):
+    statements = []
+    event.listen(
+        user_list_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    query_counts = []
+    for per_page in (2, 25):
+        statements.clear()
+        response = client.post("/user/list", json={"per_page": per_page})
+        assert response.status_code == 200
+        assert len(response.json()["users"]) == per_page
+        query_counts.append(len(statements))
+
+    assert query_counts[0] == query_counts[1] == 3
+    users = response.json()["users"]
+    assert users[0]["rol"] == UserRoles.admin
+    assert users[1]["rol"] == UserRoles.doctor
+    assert users[2]["rol"] == UserRoles.patient
+    assert users[3]["rol"] == UserRoles.user
+
+
+def test_bad_activation_does_not_hash_password(user_list_engine):
+    token = get_key_ring().encode({"email": "user00@example.com"})
+    with patch("src.routers.user_service.password_hasher.hash", AsyncMock()) as hash:
+        response = client.post(
+            "/user/activate", json={"token": token, "password": "password"}
+        )
+        assert response.status_code == 400
+        response = client.post(
+            "/user/request-activate",
+            json={"email": "user00@example.com", "password": "password"},
+        )
+        assert response.status_code == 400
+    hash.assert_not_called()